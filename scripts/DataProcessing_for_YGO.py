@@ -7,16 +7,30 @@ Used to prepare data before ML training.
 Usage:
   python scripts/DataProcessing_for_YGO.py
   python scripts/DataProcessing_for_YGO.py --csv data/matches.csv --features-out data/features.csv
+  python scripts/DataProcessing_for_YGO.py --profile   # stage timings -> data/profile_DataProcessing_for_YGO.json
+  python scripts/DataProcessing_for_YGO.py --turn-features 2   # + per-turn play features (turn_features.py)
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import os
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Sequence
 
+import numpy as np
 import pandas as pd
 
+from card_index import card_index_matches, default_card_index_path, files_using_cards, load_card_index
+from pipeline_profiling import NULL_PROFILER, Profiler, add_profile_arguments, profiler_from_args
+from replay_io import iter_plays, resolve_replay
+from turn_features import build_turn_features
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 # Filter by deck choice - assuming player1 is our data provider
@@ -50,28 +64,118 @@ def using_wrong_deck(
 ) -> bool:
     """
     Returns True if wrong deck (no targeted plays/cards found), False if correct deck.
+    The replay is streamed and reading stops at the first targeted play.
     """
-    file_name_json = dataset.loc[index_file, "file"]
-    replay_path = (replays_dir / str(file_name_json)).expanduser().resolve()
-    if not replay_path.exists():
-        print(f"⚠️  Fichier introuvable: {replay_path} — ligne ignorée (vérifiez --replays-dir)")
+    file_name_json = str(dataset.loc[index_file, "file"])
+    # The replay may be stored compressed (<name>.gz / .zst), see replay_io.py
+    replay_path = resolve_replay(replays_dir.expanduser().resolve(), file_name_json)
+    if replay_path is None:
+        print(
+            f"⚠️  Fichier introuvable: {replays_dir / file_name_json} — ligne ignorée (vérifiez --replays-dir)"
+        )
         return True
+    plays = iter_plays(replay_path)
     try:
-        with open(replay_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except (OSError, json.JSONDecodeError) as e:
+        for play in plays:
+            if (
+                (play["play"] in LIST_PLAYS)
+                and (play.get("card", {}).get("name") in TARGETED_CARDS)
+                and (play.get("username") == data_provider_username)
+            ):
+                return False
+    except (OSError, EOFError, json.JSONDecodeError) as e:  # EOFError: truncated .gz
         print(f"⚠️  Erreur lecture {replay_path.name}: {e} — ligne ignorée")
         return True
-    for play in data.get("plays", []):
-        if (
-            (play["play"] in LIST_PLAYS)
-            and (play.get("card", {}).get("name") in TARGETED_CARDS)
-            and (play.get("username") == data_provider_username)
-        ):
-            return False
+    finally:
+        plays.close()
     return True
 
 
+def parse_hand(hand: object) -> list[str]:
+    """Split a '%%%%'-separated hand string (see get_start_hands) into at most 5 card names."""
+    return str(hand).split("%%%%")[0:5]
+
+
+def encode_starting_hands(
+    hands: Sequence[list[str]],
+    *,
+    vocabulary: Sequence[str] | None = None,
+    sparse: bool = False,
+) -> tuple[np.ndarray | csr_matrix, list[str]]:
+    """
+    Count matrix (n_hands x n_cards) of starting hands, built in one shot.
+
+    The vocabulary is the distinct card names in order of first appearance, unless one is given
+    (cards outside it are then ignored). Empty names are skipped. With sparse=True a scipy CSR matrix
+    is returned instead of a dense int64 array.
+    """
+    lengths = np.fromiter((len(hand) for hand in hands), dtype=np.int64, count=len(hands))
+    flat = [card for hand in hands for card in hand]
+    rows = np.repeat(np.arange(len(hands)), lengths)
+    if vocabulary is None:
+        codes, uniques = pd.factorize(pd.Series(flat, dtype=object).replace("", None))
+        vocab = [str(card) for card in uniques]
+    else:
+        vocab = list(vocabulary)
+        codes = pd.Index(vocab).get_indexer(flat)
+    keep = codes >= 0
+    rows, codes = rows[keep], codes[keep]
+
+    if sparse:
+        try:
+            from scipy.sparse import csr_matrix
+        except ImportError as e:
+            raise RuntimeError("scipy is not installed. Install it with: pip install scipy") from e
+        data = np.ones(len(codes), dtype=np.int64)
+        matrix = csr_matrix((data, (rows, codes)), shape=(len(hands), len(vocab)))
+        matrix.sum_duplicates()
+        return matrix, vocab
+
+    counts = np.zeros((len(hands), len(vocab)), dtype=np.int64)
+    np.add.at(counts, (rows, codes), 1)
+    return counts, vocab
+
+
+def hands_to_frame(
+    hands: Sequence[list[str]],
+    suffix: str,
+    *,
+    vocabulary: Sequence[str] | None = None,
+    sparse: bool = False,
+    index: pd.Index | None = None,
+) -> pd.DataFrame:
+    """Encoded hands as a DataFrame with one '<card> (<suffix>)' count column per card."""
+    matrix, vocab = encode_starting_hands(hands, vocabulary=vocabulary, sparse=sparse)
+    columns = [f"{card} ({suffix})" for card in vocab]
+    if sparse:
+        frame = pd.DataFrame.sparse.from_spmatrix(matrix, columns=columns)
+        if index is not None:
+            frame.index = index
+        return frame
+    return pd.DataFrame(matrix, columns=columns, index=index)
+
+
+def files_with_targeted_plays(
+    *,
+    data_provider_username: str,
+    card_index: pd.DataFrame | None = None,
+    warehouse: Path | None = None,
+) -> set[str]:
+    """
+    Replay files where the provider used a targeted card, queried from the card-usage index
+    (card_index.py) or from the warehouse plays table.
+    """
+    if card_index is None:
+        from replay_warehouse import load_plays
+
+        card_index = load_plays(
+            warehouse,
+            columns=["file", "username", "play", "card_name"],
+            filters=[("play", "in", LIST_PLAYS), ("username", "==", data_provider_username)],
+        )
+    return files_using_cards(card_index, username=data_provider_username, plays=LIST_PLAYS, cards=TARGETED_CARDS)
+
+
 def build_features(
     dataset: pd.DataFrame,
     replays_dir: Path,
@@ -79,7 +183,22 @@ def build_features(
     drop_indices: list[int] | None = None,
     filter_wrong_deck: bool = True,
     data_provider_username: str = DATA_PROVIDER_USERNAME,
+    warehouse: Path | None = None,
+    card_index: pd.DataFrame | None = None,
+    encode_player2: bool = False,
+    sparse: bool = False,
+    turn_features: int = 0,
+    workers: int = 1,
+    profiler: Profiler = NULL_PROFILER,
 ) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    With card_index (or warehouse), the deck filter is a vectorized query over the card-usage index
+    (or the Parquet plays table) instead of reopening each replay JSON.
+    Player 2's hand is encoded too with encode_player2=True; sparse=True returns the card
+    columns with a pandas sparse dtype.
+    turn_features=N adds the per-turn play features of the first N turns of game 1 (turn_features.py),
+    read from the warehouse if given, else from the replays (parsed by `workers` processes).
+    """
     dataset = dataset.copy()
     dataset = dataset.dropna(subset=["file"]).reset_index(drop=True)
 
@@ -91,32 +210,43 @@ def build_features(
         if existing:
             dataset = dataset.drop(index=existing).reset_index(drop=True)
 
-    if filter_wrong_deck:
-        to_drop = [
-            idx
-            for idx in dataset.index
-            if using_wrong_deck(dataset, idx, replays_dir, data_provider_username=data_provider_username)
-        ]
-        dataset = dataset.drop(index=to_drop).reset_index(drop=True)
-
-    dataset["starting_hand_player1"] = dataset["starting_hand_player1"].apply(lambda x: str(x).split("%%%%")[0:5])
-    dataset["starting_hand_player2"] = dataset["starting_hand_player2"].apply(lambda x: str(x).split("%%%%")[0:5])
-
-    unique_cards_p1: list[str] = []
-    for hand in dataset["starting_hand_player1"]:
-        for card in hand:
-            if card and card not in unique_cards_p1:
-                unique_cards_p1.append(card)
-    for card in unique_cards_p1:
-        dataset[f"{card} (player1)"] = 0
-
-    for i in range(len(dataset["starting_hand_player1"])):
-        for card in dataset.loc[i, "starting_hand_player1"]:
-            dataset.loc[i, f"{card} (player1)"] += 1
-
-    X = dataset.drop(
+    if filter_wrong_deck and (card_index is not None or warehouse is not None):
+        with profiler.stage("deck_filter"):
+            correct_deck = files_with_targeted_plays(
+                data_provider_username=data_provider_username, card_index=card_index, warehouse=warehouse
+            )
+            dataset = dataset[dataset["file"].isin(correct_deck)].reset_index(drop=True)
+    elif filter_wrong_deck:
+        with profiler.stage("deck_filter"):
+            check = partial(
+                using_wrong_deck, dataset, replays_dir=replays_dir, data_provider_username=data_provider_username
+            )
+            wrong_deck = profiler.map_timed(
+                check,
+                list(dataset.index),
+                lambda fn, indices: [fn(idx) for idx in indices],
+                names=dataset["file"].astype(str).tolist(),
+            )
+            to_drop = [idx for idx, wrong in zip(dataset.index, wrong_deck) if wrong]
+            dataset = dataset.drop(index=to_drop).reset_index(drop=True)
+
+    with profiler.stage("encode"):
+        hands_p1 = [parse_hand(x) for x in dataset["starting_hand_player1"]]
+        hands_p2 = [parse_hand(x) for x in dataset["starting_hand_player2"]]
+
+        encoded = [hands_to_frame(hands_p1, "player1", sparse=sparse, index=dataset.index)]
+        if encode_player2:
+            encoded.append(hands_to_frame(hands_p2, "player2", sparse=sparse, index=dataset.index))
+
+    if turn_features > 0:
+        with profiler.stage("turn_features"):
+            source = warehouse if warehouse is not None else replays_dir
+            encoded.append(build_turn_features(dataset, source, max_turns=turn_features, workers=workers))
+
+    base = dataset.drop(
         columns=["game1_winner", "file", "starting_hand_player1", "starting_hand_player2", "player1", "player2"]
     )
+    X = pd.concat([base, *encoded], axis=1)
     y = dataset["game1_winner"]
     return X, y
 
@@ -154,23 +284,78 @@ def main(argv: list[str] | None = None) -> int:
         help="Disable the deck-specific 'wrong deck' filter.",
     )
     parser.add_argument("--provider", type=str, default=DATA_PROVIDER_USERNAME, help="Username for deck filtering")
+    parser.add_argument(
+        "--warehouse",
+        type=Path,
+        default=None,
+        help="Parquet warehouse (replay_warehouse.py) used by the deck filter instead of the replay JSONs",
+    )
+    parser.add_argument(
+        "--card-index",
+        type=Path,
+        default=None,
+        help=(
+            "Card-usage index written by get_csv_from_json.py "
+            "(default: <csv>_card_usage.csv if it exists and was saved with this matches CSV)"
+        ),
+    )
+    parser.add_argument(
+        "--encode-player2",
+        action="store_true",
+        help="Also encode player 2's starting hand as '<card> (player2)' count columns",
+    )
+    parser.add_argument(
+        "--turn-features",
+        type=int,
+        default=0,
+        metavar="TURNS",
+        help="Add per-turn play features (summons, GY, LP, time) of the first TURNS turns of game 1 (0 = off)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Replay parsing processes for --turn-features (0 = one per CPU)"
+    )
+    add_profile_arguments(parser)
     args = parser.parse_args(argv)
+    profiler = profiler_from_args(args, "DataProcessing_for_YGO")
 
-    dataset = load_dataset(args.csv)
-    X, y = build_features(
-        dataset,
-        args.replays_dir,
-        drop_indices=args.drop_index or None,
-        filter_wrong_deck=not args.no_deck_filter,
-        data_provider_username=args.provider,
-    )
+    with profiler.stage("load"):
+        dataset = load_dataset(args.csv)
+        card_index = None
+        if not args.no_deck_filter and args.warehouse is None:
+            if args.card_index is not None:
+                card_index_path = args.card_index
+            else:
+                # The default index is only used if it was saved with this matches CSV
+                card_index_path = default_card_index_path(args.csv)
+                if card_index_path.exists() and not card_index_matches(card_index_path, dataset["file"]):
+                    print(f"⚠️  {card_index_path} ne correspond pas à ce CSV de matches - ignoré (scan des replays)")
+                    card_index_path = None
+            if card_index_path is not None and Path(card_index_path).exists():
+                print(f"Deck filter: card-usage index {card_index_path}")
+                card_index = load_card_index(card_index_path)
+    with profiler.stage("build_features"):
+        X, y = build_features(
+            dataset,
+            args.replays_dir,
+            drop_indices=args.drop_index or None,
+            filter_wrong_deck=not args.no_deck_filter,
+            data_provider_username=args.provider,
+            warehouse=args.warehouse,
+            card_index=card_index,
+            encode_player2=args.encode_player2,
+            turn_features=args.turn_features,
+            workers=args.workers if args.workers > 0 else (os.cpu_count() or 1),
+            profiler=profiler,
+        )
 
-    args.features_out.parent.mkdir(parents=True, exist_ok=True)
-    X.to_csv(args.features_out, index=False)
-    print(f"✅ Features CSV saved to: {args.features_out} (shape={X.shape})")
+    with profiler.stage("write"):
+        args.features_out.parent.mkdir(parents=True, exist_ok=True)
+        X.to_csv(args.features_out, index=False)
+        print(f"✅ Features CSV saved to: {args.features_out} (shape={X.shape})")
 
-    y.to_csv(args.target_out, index=False, header=["game1_winner"])
-    print(f"✅ Target variable CSV saved to: {args.target_out} (shape={y.shape})")
+        y.to_csv(args.target_out, index=False, header=["game1_winner"])
+        print(f"✅ Target variable CSV saved to: {args.target_out} (shape={y.shape})")
+    profiler.write()
     return 0
 
 
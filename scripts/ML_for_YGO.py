@@ -8,90 +8,256 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Sequence
 
 import matplotlib
 matplotlib.use("Agg")  # Non-interactive backend (works headless)
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import RepeatedStratifiedKFold, train_test_split
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 
+from pipeline_profiling import NULL_PROFILER, Profiler, add_profile_arguments, profiler_from_args
+
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
-def train_and_score_models(X: pd.DataFrame, y: pd.Series, *, test_size: float = 0.2, random_state: int = 1) -> dict[str, float]:
+MODEL_NAMES = (
+    "knn",
+    "logistic_regression",
+    "decision_tree",
+    "random_forest",
+    "svc",
+    "gradient_boosting",
+    "adaboost",
+    "naive_bayes",
+    "mlp",
+)
+
+
+def build_models(
+    *,
+    n_train: int,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    params: dict[str, dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    """
+    The model zoo, in reporting order. `n_jobs` is passed to the estimators that support it and
+    `params` (model name -> hyperparameters, e.g. from --tune) overrides the defaults below.
+    """
+    # KNN requires n_neighbors <= n_train
+    n_neighbors = min(11, n_train)
+    n_neighbors = max(1, n_neighbors)
+    models = {
+        "knn": KNeighborsClassifier(n_neighbors=n_neighbors, n_jobs=n_jobs),
+        "logistic_regression": LogisticRegression(max_iter=200),
+        "decision_tree": DecisionTreeClassifier(criterion="entropy", max_depth=10, random_state=random_state),
+        "random_forest": RandomForestClassifier(
+            criterion="entropy", n_estimators=200, max_depth=10, random_state=random_state, n_jobs=n_jobs
+        ),
+        "svc": SVC(kernel="rbf", random_state=random_state),
+        "gradient_boosting": GradientBoostingClassifier(n_estimators=100, max_depth=3, random_state=random_state),
+        "adaboost": AdaBoostClassifier(n_estimators=50, random_state=random_state),
+        "naive_bayes": GaussianNB(),
+        "mlp": MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=500, random_state=random_state),
+    }
+    for name, overrides in (params or {}).items():
+        if name in models:
+            models[name].set_params(**overrides)
+    if models["knn"].n_neighbors > n_train:
+        models["knn"].set_params(n_neighbors=max(1, n_train))
+    return models
+
+
+def load_model_params(path: Path) -> dict[str, dict[str, Any]]:
+    """Best hyperparameters saved by --tune (model name -> params); empty if the file does not exist."""
+    path = Path(path).expanduser().resolve()
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    # JSON has no tuples (e.g. MLP hidden_layer_sizes)
+    return {
+        name: {k: tuple(v) if isinstance(v, list) else v for k, v in entry["params"].items()}
+        for name, entry in saved.items()
+    }
+
+
+def fit_and_score(model: Any, X_train, y_train, X_test, y_test) -> float:
+    return fit_and_score_timed(model, X_train, y_train, X_test, y_test)[0]
+
+
+def fit_and_score_timed(model: Any, X_train, y_train, X_test, y_test) -> tuple[float, float, float]:
+    # (accuracy, fit seconds, score seconds); top-level so it can run in a worker process
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    t1 = time.perf_counter()
+    score = float(model.score(X_test, y_test))
+    return score, t1 - t0, time.perf_counter() - t1
+
+
+def train_and_score_models(
+    X: pd.DataFrame,
+    y: pd.Series,
+    *,
+    test_size: float = 0.2,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    params: dict[str, dict[str, Any]] | None = None,
+    models: Sequence[str] | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> dict[str, float]:
+    """
+    Fit every model (or only those named in `models`) on the same train/test split and return
+    their test accuracy. With n_jobs > 1 the models are fitted concurrently in a process pool;
+    scores are identical to the serial run since every model has a fixed random_state.
+    """
     if len(X) == 0:
         raise ValueError("No samples available after feature building (X is empty).")
     if len(X) < 2:
         raise ValueError(f"Not enough samples to train/test split (n_samples={len(X)}).")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
 
-    scores: dict[str, float] = {}
-
-    # KNN requires n_neighbors <= n_train
-    n_neighbors = min(11, len(X_train))
-    n_neighbors = max(1, n_neighbors)
-    knn = KNeighborsClassifier(n_neighbors=n_neighbors)
-    knn.fit(X_train, y_train)
-    scores["knn"] = float(knn.score(X_test, y_test))
-
-    # Some models require at least 2 classes in the training set
+    # In parallel mode each model gets its own process; cores left over go to the estimators that
+    # parallelize internally (random forest, KNN), the random forest being the slowest to fit.
+    inner_jobs = max(1, n_jobs - len(MODEL_NAMES) + 1) if n_jobs > 1 else 1
+    zoo = build_models(n_train=len(X_train), random_state=random_state, n_jobs=inner_jobs, params=params)
+    selected = {name: model for name, model in zoo.items() if models is None or name in models}
+    # Some models require at least 2 classes in the training set: only KNN is kept, if it was asked for
     if getattr(y_train, "nunique", None) is not None and int(y_train.nunique()) < 2:
-        return scores
-
-    logistic_regression = LogisticRegression(max_iter=200)
-    logistic_regression.fit(X_train, y_train)
-    scores["logistic_regression"] = float(logistic_regression.score(X_test, y_test))
-
-    decision_tree = DecisionTreeClassifier(criterion="entropy", max_depth=10, random_state=random_state)
-    decision_tree.fit(X_train, y_train)
-    scores["decision_tree"] = float(decision_tree.score(X_test, y_test))
-
-    random_forest = RandomForestClassifier(criterion="entropy", n_estimators=200, max_depth=10, random_state=random_state)
-    random_forest.fit(X_train, y_train)
-    scores["random_forest"] = float(random_forest.score(X_test, y_test))
-
-    svc = SVC(kernel="rbf", random_state=random_state)
-    svc.fit(X_train, y_train)
-    scores["svc"] = float(svc.score(X_test, y_test))
-
-    gradient_boosting = GradientBoostingClassifier(n_estimators=100, max_depth=3, random_state=random_state)
-    gradient_boosting.fit(X_train, y_train)
-    scores["gradient_boosting"] = float(gradient_boosting.score(X_test, y_test))
-
-    adaboost = AdaBoostClassifier(n_estimators=50, random_state=random_state)
-    adaboost.fit(X_train, y_train)
-    scores["adaboost"] = float(adaboost.score(X_test, y_test))
-
-    naive_bayes = GaussianNB()
-    naive_bayes.fit(X_train, y_train)
-    scores["naive_bayes"] = float(naive_bayes.score(X_test, y_test))
-
-    mlp = MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=500, random_state=random_state)
-    mlp.fit(X_train, y_train)
-    scores["mlp"] = float(mlp.score(X_test, y_test))
-
-    return scores
-
-
-def plot_model_scores(scores: dict[str, float], out_path: Path | None = None) -> None:
-    """Plot model accuracy scores as a horizontal bar chart."""
+        selected = {name: model for name, model in selected.items() if name == "knn"}
+        if not selected:
+            raise ValueError(
+                f"Only one class in the training set: none of the selected models ({', '.join(models)}) can be fitted."
+            )
+
+    if n_jobs <= 1 or len(selected) < 2:
+        outputs = {
+            name: fit_and_score_timed(model, X_train, y_train, X_test, y_test) for name, model in selected.items()
+        }
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(selected))) as pool:
+            futures = {
+                name: pool.submit(fit_and_score_timed, model, X_train, y_train, X_test, y_test)
+                for name, model in selected.items()
+            }
+            outputs = {name: futures[name].result() for name in futures}
+    for name, (_, fit_s, score_s) in outputs.items():
+        profiler.record_model(name, fit_s=fit_s, score_s=score_s)
+    return {name: score for name, (score, _, _) in outputs.items()}
+
+
+# Cross-validation data, set once per worker process by _init_cv_worker
+_CV_DATA: tuple[np.ndarray, np.ndarray, list[tuple[np.ndarray, np.ndarray]]] | None = None
+
+
+def _init_cv_worker(X: np.ndarray, y: np.ndarray, folds: list[tuple[np.ndarray, np.ndarray]]) -> None:
+    global _CV_DATA
+    _CV_DATA = (X, y, folds)
+
+
+def _fit_fold(model: Any, fold: int) -> tuple[float, float, float]:
+    # Returns (accuracy, fit seconds, score seconds) of `model` on one cached fold
+    X, y, folds = _CV_DATA
+    train_idx, test_idx = folds[fold]
+    t0 = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    t1 = time.perf_counter()
+    score = float(model.score(X[test_idx], y[test_idx]))
+    return score, t1 - t0, time.perf_counter() - t1
+
+
+def make_cv_folds(
+    y: pd.Series, *, n_splits: int = 5, n_repeats: int = 1, random_state: int = 1
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """(train, test) index arrays of a repeated stratified k-fold, computed once and shared by all models."""
+    counts = pd.Series(y).value_counts()
+    if len(counts) < 2 or int(counts.min()) < n_splits:
+        raise ValueError(
+            f"Stratified {n_splits}-fold CV needs at least {n_splits} samples of each class (got {counts.to_dict()})."
+        )
+    cv = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    return list(cv.split(np.zeros(len(y)), y))
+
+
+def cross_validate_models(
+    X: pd.DataFrame,
+    y: pd.Series,
+    *,
+    n_splits: int = 5,
+    n_repeats: int = 1,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    params: dict[str, dict[str, Any]] | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> dict[str, dict[str, Any]]:
+    """
+    Evaluate every model on the same cached folds; (model, fold) pairs run in a process pool
+    when n_jobs > 1. Returns, per model: mean, std, scores, fit_times and score_times (per fold).
+    """
+    folds = make_cv_folds(y, n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    X_arr = X.to_numpy(dtype=float)
+    y_arr = pd.Series(y).to_numpy()
+    n_train = min(len(train_idx) for train_idx, _ in folds)
+    models = build_models(n_train=n_train, random_state=random_state, params=params)
+    tasks = [(name, fold) for name in models for fold in range(len(folds))]
+
+    if n_jobs <= 1:
+        _init_cv_worker(X_arr, y_arr, folds)
+        outputs = [_fit_fold(models[name], fold) for name, fold in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(tasks)), initializer=_init_cv_worker, initargs=(X_arr, y_arr, folds)
+        ) as pool:
+            futures = [pool.submit(_fit_fold, models[name], fold) for name, fold in tasks]
+            outputs = [f.result() for f in futures]
+
+    results: dict[str, dict[str, Any]] = {}
+    for name in models:
+        rows = [out for (task_name, _), out in zip(tasks, outputs) if task_name == name]
+        scores = [r[0] for r in rows]
+        results[name] = {
+            "mean": float(np.mean(scores)),
+            "std": float(np.std(scores)),
+            "scores": scores,
+            "fit_times": [r[1] for r in rows],
+            "score_times": [r[2] for r in rows],
+        }
+        # Totals over the folds
+        profiler.record_model(name, fit_s=sum(r[1] for r in rows), score_s=sum(r[2] for r in rows))
+    return results
+
+
+def plot_model_scores(
+    scores: dict[str, float],
+    out_path: Path | None = None,
+    *,
+    errors: dict[str, float] | None = None,
+) -> None:
+    """Plot model accuracy scores as a horizontal bar chart (with error bars if `errors` is given)."""
     models = list(scores.keys())
     accuracies = [scores[m] for m in models]
     colors = plt.cm.viridis([a / max(accuracies) if accuracies else 0 for a in accuracies])
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    ax.barh(models, accuracies, color=colors)
+    xerr = [errors.get(m, 0.0) for m in models] if errors else None
+    ax.barh(models, accuracies, color=colors, xerr=xerr, capsize=4 if xerr else 0)
     ax.set_xlabel("Accuracy")
     ax.set_xlim(0, 1)
     ax.axvline(x=0.5, color="gray", linestyle="--", alpha=0.5)
-    ax.set_title("Model comparison (test accuracy)")
+    ax.set_title("Model comparison (cross-validated accuracy, mean ± std)" if errors else "Model comparison (test accuracy)")
     fig.tight_layout()
 
     if out_path:
@@ -124,21 +290,175 @@ def main(argv: list[str] | None = None) -> int:
         help="Save bar chart of model scores to this path",
     )
     parser.add_argument("--no-plot", action="store_true", help="Skip visualization (for headless/CI)")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Fit models concurrently in this many processes (0 = one per CPU). Scores do not depend on it.",
+    )
+    parser.add_argument(
+        "--cv",
+        type=int,
+        default=0,
+        help="Use stratified k-fold cross-validation with this many folds instead of a single split",
+    )
+    parser.add_argument("--cv-repeats", type=int, default=1, help="Number of repetitions of the k-fold (with --cv)")
+    parser.add_argument(
+        "--params",
+        type=Path,
+        default=_PROJECT_ROOT / "data/best_params.json",
+        help="Tuned hyperparameters (written by --tune, used by later runs if the file exists)",
+    )
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help="Search hyperparameters with successive halving (see model_tuning.py) and save them to --params first",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="Wall-clock budget of --tune, in seconds (running trials are stopped when it runs out)",
+    )
+    parser.add_argument("--tune-candidates", type=int, default=27, help="Configurations drawn per model by --tune")
+    parser.add_argument(
+        "--save-model",
+        type=Path,
+        default=None,
+        help="Refit a model on all samples and save it as a versioned artifact for predict_hands.py",
+    )
+    parser.add_argument(
+        "--save-model-name",
+        choices=MODEL_NAMES,
+        default=None,
+        help="Model to save with --save-model (default: the best-scoring one)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Out-of-core training: incremental learners fitted chunk by chunk (see streaming_training.py)",
+    )
+    parser.add_argument(
+        "--memmap",
+        type=Path,
+        default=None,
+        help="With --stream, read the features from this memory-mapped copy instead of the CSVs",
+    )
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows per chunk with --stream")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the training rows with --stream")
+    add_profile_arguments(parser)
     args = parser.parse_args(argv)
-
-    X = pd.read_csv(Path(args.features).expanduser().resolve())
-    y = pd.read_csv(Path(args.target).expanduser().resolve()).squeeze("columns")
+    profiler = profiler_from_args(args, "ML_for_YGO")
+    if args.memmap is not None and not args.stream:
+        parser.error("--memmap needs --stream")
+    if args.stream and (args.cv or args.tune or args.save_model):
+        parser.error("--stream does not support --cv, --tune or --save-model")
+
+    if args.stream:
+        from streaming_training import FeatureStream, train_and_score_streaming
+
+        if args.memmap is not None:
+            stream = FeatureStream.from_memmap(args.memmap, chunk_size=args.chunk_size)
+        else:
+            stream = FeatureStream.from_csv(args.features, args.target, chunk_size=args.chunk_size)
+        params = load_model_params(args.params)
+        print(f"Streaming {len(stream.columns)} feature columns in chunks of {args.chunk_size} rows")
+        with profiler.stage("train"):
+            scores = train_and_score_streaming(
+                stream,
+                test_size=args.test_size,
+                random_state=args.random_state,
+                epochs=args.epochs,
+                params=params,
+                profiler=profiler,
+            )
+        for k, v in scores.items():
+            print(f"{k}: {v}")
+        if not args.no_plot:
+            with profiler.stage("plot"):
+                plot_model_scores(scores, out_path=args.plot_out)
+        profiler.write()
+        return 0
+
+    with profiler.stage("load"):
+        X = pd.read_csv(Path(args.features).expanduser().resolve())
+        y = pd.read_csv(Path(args.target).expanduser().resolve()).squeeze("columns")
     if y.name is None:
         y.name = "game1_winner"
 
     print(f"Loaded X: {X.shape}, y: {y.shape}")
-    scores = train_and_score_models(X, y, test_size=args.test_size, random_state=args.random_state)
-    for k, v in scores.items():
-        print(f"{k}: {v}")
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    if args.tune:
+        from model_tuning import save_best_params, tune_models
+
+        with profiler.stage("tune"):
+            best = tune_models(
+                X,
+                y,
+                n_candidates=args.tune_candidates,
+                random_state=args.random_state,
+                n_jobs=jobs,
+                time_budget=args.time_budget,
+            )
+        for k, entry in best.items():
+            print(f"{k}: {entry['score']:.4f} with {entry['params']}")
+        print(f"✅ Best parameters saved to: {save_best_params(best, args.params)}")
+
+    params = load_model_params(args.params)
+    if params:
+        print(f"Using tuned hyperparameters from {args.params} ({', '.join(params)})")
+
+    errors = None
+    if args.cv:
+        with profiler.stage("cross_validate"):
+            cv_results = cross_validate_models(
+                X,
+                y,
+                n_splits=args.cv,
+                n_repeats=args.cv_repeats,
+                random_state=args.random_state,
+                n_jobs=jobs,
+                params=params,
+                profiler=profiler,
+            )
+        scores = {k: r["mean"] for k, r in cv_results.items()}
+        errors = {k: r["std"] for k, r in cv_results.items()}
+        for k, r in cv_results.items():
+            print(
+                f"{k}: {r['mean']:.4f} ± {r['std']:.4f} "
+                f"(fit {np.mean(r['fit_times']):.3f}s/fold, score {np.mean(r['score_times']):.3f}s/fold)"
+            )
+    else:
+        with profiler.stage("train"):
+            scores = train_and_score_models(
+                X,
+                y,
+                test_size=args.test_size,
+                random_state=args.random_state,
+                n_jobs=jobs,
+                params=params,
+                profiler=profiler,
+            )
+        for k, v in scores.items():
+            print(f"{k}: {v}")
 
     if not args.no_plot:
-        plot_model_scores(scores, out_path=args.plot_out)
+        with profiler.stage("plot"):
+            plot_model_scores(scores, out_path=args.plot_out, errors=errors)
+
+    if args.save_model:
+        from model_artifact import save_model_artifact
+
+        name = args.save_model_name or max(scores, key=scores.get)
+        with profiler.stage("save_model"):
+            model = build_models(n_train=len(X), random_state=args.random_state, n_jobs=jobs, params=params)[name]
+            # Fitted on a plain array: predict_hands.py builds its input as arrays in the same column order
+            model.fit(X.to_numpy(dtype=float), y)
+            path = save_model_artifact(model, args.save_model, model_name=name, X=X, y=y)
+        print(f"✅ Model '{name}' saved to: {path}")
 
+    profiler.write()
     return 0
 
 
@@ -0,0 +1,301 @@
+"""
+Concurrent replay fetcher (get_db_match_selenium_clean.py --async).
+
+Replays are fetched by asyncio tasks sharing one pooled requests.Session (blocking calls run in a
+thread pool sized to the concurrency limit):
+  - at most `concurrency` replays are in flight (one task each, taking links as it frees up),
+  - API POSTs go through a token bucket (`rate` requests/s, bursts of `burst`), to stay polite to DuelingBook,
+  - failed attempts are retried with exponential backoff and full jitter; "Invalid Token" answers,
+    connection errors, 429 and 5xx are retried, "must be logged in" and other API errors are not.
+
+reCAPTCHA tokens come from a token source with a mint(replay_url, action_name) method returning
+(token, cookies, browser_session_or_None): a BrowserSessionPool for DuelingBook, or StaticTokenSource
+with --api-base pointing at a local stand-in server (see replay_api_stub.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from typing import Any, Callable, Iterable, Protocol
+
+from get_db_match_selenium_clean import (
+    DUELINGBOOK_URL,
+    RECAPTCHA_ACTIONS,
+    add_selenium_cookies,
+    api_form_data,
+    build_api_request,
+    get_replay_id,
+    normalize_replay_url,
+)
+from replay_dedup import KnownContent
+from replay_io import replay_path, save_replay
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 2.0  # API requests per second
+DEFAULT_BURST = 2
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF_BASE = 1.0  # seconds
+DEFAULT_BACKOFF_CAP = 60.0
+
+
+class ReplayFetchError(Exception):
+    pass
+
+
+class LoginRequiredError(ReplayFetchError):
+    pass
+
+
+class TokenSource(Protocol):
+    def mint(self, replay_url: str, action_name: str) -> tuple[str, list[dict], Any]: ...
+
+
+class StaticTokenSource:
+    """Same token for every request and no cookies: for a local stand-in API server."""
+
+    def __init__(self, token: str = "stand-in-token"):
+        self.token = token
+
+    def mint(self, replay_url: str, action_name: str) -> tuple[str, list[dict], None]:
+        return self.token, [], None
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` acquisitions per second on average, `burst` at once (rate <= 0: no limit)."""
+
+    def __init__(self, rate: float, burst: int = 1, *, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.capacity)
+        self._last = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock, so they are served in arrival order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+def backoff_delay(
+    attempt: int,
+    *,
+    base: float = DEFAULT_BACKOFF_BASE,
+    cap: float = DEFAULT_BACKOFF_CAP,
+    rng: random.Random | None = None,
+) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return (rng or random).uniform(0, min(cap, base * 2**attempt))
+
+
+@dataclass
+class FetchResult:
+    link: str
+    replay_id: str | None
+    seconds: float
+    path: Path | None = None
+    error: str | None = None
+    attempts: int = 0
+    duplicate_of: str | None = None  # replay already holding the same plays (nothing saved)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AsyncReplayFetcher:
+    def __init__(
+        self,
+        token_source: TokenSource,
+        *,
+        api_base: str = DUELINGBOOK_URL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_cap: float = DEFAULT_BACKOFF_CAP,
+        timeout: float = 30.0,
+        strip_user_prefix: bool = True,
+        compression: str = "json",
+        known_content: KnownContent | None = None,
+        seed: int | None = None,
+    ):
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+        except ImportError as e:
+            raise RuntimeError(
+                "requests is not installed. Install dependencies with: pip install -r requirements.txt"
+            ) from e
+
+        self.token_source = token_source
+        self.api_base = api_base
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.strip_user_prefix = strip_user_prefix
+        self.compression = compression
+        self.known_content = known_content
+        self._rng = random.Random(seed)
+        self._requests = requests
+        self._executor: ThreadPoolExecutor | None = None
+
+        # One keep-alive connection pool shared by all tasks. Cookies come from the token source with
+        # every request; the session itself stores none, so browsers' cookies never get mixed up.
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _post(self, url: str, headers: dict[str, str], token: str, cookies: list[dict]) -> dict:
+        jar = self._requests.cookies.RequestsCookieJar()
+        add_selenium_cookies(jar, cookies)
+        response = self.session.post(url, data=api_form_data(token), headers=headers, cookies=jar, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args))
+
+    async def fetch(self, link: str, bucket: TokenBucket) -> tuple[str, dict, int]:
+        """(replay_url, replay JSON, attempts) of one link; raises ReplayFetchError when it cannot be fetched."""
+        replay_url = normalize_replay_url(link, strip_user_prefix=self.strip_user_prefix)
+        url, headers = build_api_request(replay_url, api_base=self.api_base)
+        last_error = "no attempt"
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(
+                    backoff_delay(attempt - 1, base=self.backoff_base, cap=self.backoff_cap, rng=self._rng)
+                )
+            action_name = RECAPTCHA_ACTIONS[min(attempt, len(RECAPTCHA_ACTIONS) - 1)]
+            try:
+                token, cookies, browser = await self._call(self.token_source.mint, replay_url, action_name)
+            except RuntimeError:
+                raise  # missing dependency: retrying will not help
+            except Exception as e:
+                last_error = "token: " + str(e)
+                continue
+
+            await bucket.acquire()
+            try:
+                data = await self._call(self._post, url, headers, token, cookies)
+            except self._requests.exceptions.RequestException as e:
+                status = getattr(e.response, "status_code", None)
+                if status is not None and status < 500 and status != 429:
+                    raise ReplayFetchError(f"Erreur de requete: {e}") from e
+                last_error = "Erreur de requete: " + str(e)
+                continue
+
+            if data.get("action") != "Error":
+                if browser is not None:
+                    browser.token_accepted()
+                return replay_url, data, attempt + 1
+
+            error_msg = str(data.get("message", "Erreur inconnue"))
+            if "invalid token" in error_msg.lower():
+                if browser is not None:
+                    browser.token_rejected()
+                last_error = "Erreur API: " + error_msg
+                continue
+            if "logged in" in error_msg.lower():
+                raise LoginRequiredError("Erreur API: " + error_msg)
+            raise ReplayFetchError("Erreur API: " + error_msg)
+
+        raise ReplayFetchError(f"{last_error} (after {self.max_attempts} attempts)")
+
+    async def _fetch_and_save(self, link: str, out_dir: Path, bucket: TokenBucket) -> FetchResult:
+        start = time.perf_counter()
+        replay_id = None
+        try:
+            replay_id = get_replay_id(normalize_replay_url(link, strip_user_prefix=self.strip_user_prefix))
+            replay_url, data, attempts = await self.fetch(link, bucket)
+            if self.known_content is not None:
+                duplicate_of = await self._call(self.known_content.claim, f"{replay_id}.json", data.get("plays") or [])
+                if duplicate_of is not None:
+                    print(f"Doublon: {replay_id} a les memes plays que {duplicate_of} - non sauvegarde")
+                    return FetchResult(
+                        link, replay_id, time.perf_counter() - start, attempts=attempts, duplicate_of=duplicate_of
+                    )
+            out_path = replay_path(out_dir, replay_id, self.compression)
+            try:
+                await self._call(save_replay, data, out_path)
+            except BaseException:
+                # Not saved: a later copy of the same plays must not be skipped as a duplicate of this one
+                if self.known_content is not None:
+                    self.known_content.release(f"{replay_id}.json", data.get("plays") or [])
+                raise
+        except ReplayFetchError as e:
+            print(f"Erreur ({link}): {e}")
+            return FetchResult(link, replay_id, time.perf_counter() - start, error=str(e))
+        except Exception as e:
+            print(f"Erreur ({link}): {e}")
+            return FetchResult(link, replay_id, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+        print("OK: JSON sauvegarde -> " + str(out_path))
+        return FetchResult(link, replay_id, time.perf_counter() - start, path=out_path, attempts=attempts)
+
+    async def fetch_all(
+        self,
+        links: Iterable[str],
+        out_dir: Path,
+        *,
+        on_result: Callable[[FetchResult], None] | None = None,
+    ) -> list[FetchResult]:
+        """
+        Fetch every link into out_dir/<replay_id>.json (.json.gz / .json.zst when compressed), except the
+        replays whose plays known_content already holds; results are
+        in the order of links. `concurrency` tasks take links from the iterable as they free up, so a lazy
+        source (journal claims) is not drained up front. on_result is called with each result as soon as
+        it is known.
+        """
+        out_dir = out_dir.expanduser().resolve()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        bucket = TokenBucket(self.rate, self.burst)
+        iterator = iter(enumerate(links))
+        results: dict[int, FetchResult] = {}
+
+        async def _worker() -> None:
+            for index, link in iterator:
+                result = await self._fetch_and_save(link, out_dir, bucket)
+                if on_result is not None:
+                    on_result(result)
+                results[index] = result
+
+        # Token minting and POSTs of the in-flight replays block a thread each
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            await asyncio.gather(*(_worker() for _ in range(self.concurrency)))
+        finally:
+            self._executor.shutdown(wait=True)
+        return [results[i] for i in range(len(results))]
+
+    def run(
+        self, links: Iterable[str], out_dir: Path, *, on_result: Callable[[FetchResult], None] | None = None
+    ) -> list[FetchResult]:
+        return asyncio.run(self.fetch_all(links, out_dir, on_result=on_result))
+
+    def close(self) -> None:
+        self.session.close()
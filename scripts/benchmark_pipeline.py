@@ -0,0 +1,292 @@
+"""
+End-to-end benchmark of the pipeline on synthetic replay archives (see generate_synthetic_replays.py).
+
+For each archive size, three stages are timed, each in a freshly spawned process so that its peak
+RSS is its own:
+  matches   get_csv_from_json.build_matches_and_card_index (no manifest: every replay is parsed)
+  features  DataProcessing_for_YGO.build_features (deck filter through the card-usage index)
+  train     ML_for_YGO.train_and_score_models
+
+Wall time, peak RSS and rows/s of every stage are written to a JSON results file and compared with a
+baseline file (same stage and size); the exit code is 1 when a stage is slower or uses more memory
+than the baseline by more than --tolerance. A baseline recorded with other settings (models, workers,
+jobs, compression, seed, provider) is not compared against. Record a baseline on the reference machine
+with --save-baseline. Synthetic archives are generated once and reused (they take ~320 KB per replay).
+
+Usage:
+  python scripts/benchmark_pipeline.py --sizes 1000 10000
+  python scripts/benchmark_pipeline.py --sizes 1000 10000 100000 --workers 0 --jobs 0 --save-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Sequence
+
+from DataProcessing_for_YGO import DATA_PROVIDER_USERNAME
+from generate_synthetic_replays import generate_replays
+from pipeline_profiling import peak_rss_mb
+from replay_io import COMPRESSIONS, list_replays
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+STAGES = ("matches", "features", "train")
+DEFAULT_SIZES = (1000, 10_000, 100_000)
+# Allowed slowdown / memory growth over the baseline before a stage is reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def _run_stage(
+    stage: str,
+    replays_dir: Path,
+    work_dir: Path,
+    *,
+    provider: str,
+    workers: int,
+    jobs: int,
+    models: Sequence[str] | None,
+) -> dict[str, Any]:
+    """Run one stage on inputs written by the previous ones; only the stage's own call is timed."""
+    # Each stage imports only what it uses, so its peak RSS does not include the other stages' modules
+    import pandas as pd
+
+    matches_csv = work_dir / "matches.csv"
+    card_index_csv = work_dir / "card_usage.csv"
+    features_csv = work_dir / "features.csv"
+    target_csv = work_dir / "target.csv"
+
+    # The pipeline functions report progress on stdout; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == "matches":
+            from card_index import save_card_index
+            from get_csv_from_json import build_matches_and_card_index
+
+            start = time.perf_counter()
+            df, card_index = build_matches_and_card_index(replays_dir, provider, workers=workers)
+            wall = time.perf_counter() - start
+            df.to_csv(matches_csv, index=False)
+            save_card_index(card_index, card_index_csv, matches_files=df["file"])
+            rows = len(df)
+        elif stage == "features":
+            from card_index import load_card_index
+            from DataProcessing_for_YGO import build_features
+
+            dataset = pd.read_csv(matches_csv)
+            card_index = load_card_index(card_index_csv)
+            start = time.perf_counter()
+            X, y = build_features(dataset, replays_dir, data_provider_username=provider, card_index=card_index)
+            wall = time.perf_counter() - start
+            X.to_csv(features_csv, index=False)
+            y.to_csv(target_csv, index=False)
+            rows = len(dataset)
+        elif stage == "train":
+            from ML_for_YGO import train_and_score_models
+
+            X = pd.read_csv(features_csv)
+            y = pd.read_csv(target_csv).squeeze("columns")
+            start = time.perf_counter()
+            train_and_score_models(X, y, n_jobs=jobs, models=models)
+            wall = time.perf_counter() - start
+            rows = len(X)
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+    return {
+        "stage": stage,
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": None if (rss := peak_rss_mb()) is None else round(rss, 1),
+        "rows": rows,
+        "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+    }
+
+
+def synthetic_archive(
+    work_dir: Path, n: int, *, seed: int, provider: str, workers: int, compression: str = "json"
+) -> Path:
+    """Directory holding n synthetic replays, generated on first use."""
+    replays_dir = work_dir / (f"replays_{n}_seed{seed}" + ("" if compression == "json" else f"_{compression}"))
+    if replays_dir.is_dir() and len(list_replays(replays_dir)) == n:
+        return replays_dir
+    print(f"Generating {n} synthetic replays in {replays_dir} ...")
+    generate_replays(replays_dir, n, seed=seed, provider=provider, workers=workers, compression=compression)
+    return replays_dir
+
+
+def run_benchmark(
+    sizes: Sequence[int],
+    *,
+    work_dir: Path,
+    stages: Sequence[str] = STAGES,
+    seed: int = 0,
+    provider: str = DATA_PROVIDER_USERNAME,
+    workers: int = 1,
+    jobs: int = 1,
+    models: Sequence[str] | None = None,
+    keep_replays: bool = True,
+    compression: str = "json",
+) -> dict[str, Any]:
+    work_dir = work_dir.expanduser().resolve()
+    # spawn: every stage starts from a clean interpreter, so peak RSS is not inherited from the parent
+    ctx = multiprocessing.get_context("spawn")
+    results: list[dict[str, Any]] = []
+    for n in sizes:
+        replays_dir = synthetic_archive(
+            work_dir, n, seed=seed, provider=provider, workers=workers, compression=compression
+        )
+        stage_dir = work_dir / f"outputs_{n}"
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(
+                    _run_stage,
+                    stage,
+                    replays_dir,
+                    stage_dir,
+                    provider=provider,
+                    workers=workers,
+                    jobs=jobs,
+                    models=models,
+                ).result()
+            result["n_replays"] = n
+            results.append(result)
+            print(
+                f"{n:>7} replays  {stage:<9} {result['wall_s']:>9.3f}s  "
+                f"{result['peak_rss_mb'] or float('nan'):>8.1f} MB  {result['rows_per_s'] or 0:>10.1f} rows/s"
+            )
+        if not keep_replays:
+            shutil.rmtree(replays_dir)
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "seed": seed,
+            "provider": provider,
+            "workers": workers,
+            "jobs": jobs,
+            "models": list(models) if models else None,
+            "compression": compression,
+        },
+        "results": results,
+    }
+
+
+def settings_mismatches(report: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """Run settings that differ between the report and the baseline, as "name: baseline -> run"."""
+    ours, theirs = report.get("settings", {}), baseline.get("settings", {})
+    return [
+        f"{key}: {theirs.get(key)!r} -> {ours.get(key)!r}"
+        for key in sorted(set(ours) | set(theirs))
+        if ours.get(key) != theirs.get(key)
+    ]
+
+
+def compare_to_baseline(
+    report: dict[str, Any], baseline: dict[str, Any], *, tolerance: float = DEFAULT_TOLERANCE
+) -> list[dict[str, Any]]:
+    """One entry per (stage, size) present in both runs, with wall time / peak RSS ratios and a regression flag."""
+    reference = {(r["stage"], r["n_replays"]): r for r in baseline.get("results", [])}
+    comparisons = []
+    for r in report["results"]:
+        base = reference.get((r["stage"], r["n_replays"]))
+        if base is None:
+            continue
+        entry = {"stage": r["stage"], "n_replays": r["n_replays"], "regression": False}
+        for metric in ("wall_s", "peak_rss_mb"):
+            if r.get(metric) is None or not base.get(metric):
+                continue
+            ratio = r[metric] / base[metric]
+            entry[f"{metric}_ratio"] = round(ratio, 3)
+            entry["regression"] |= ratio > 1 + tolerance
+        comparisons.append(entry)
+    return comparisons
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic replay archives.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Archive sizes (replays)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--work-dir", type=Path, default=_PROJECT_ROOT / "data/benchmark", help="Archives and outputs")
+    parser.add_argument("--out", type=Path, default=_PROJECT_ROOT / "data/benchmark_results.json")
+    parser.add_argument("--baseline", type=Path, default=_PROJECT_ROOT / "data/benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed ratio over the baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--provider", type=str, default=DATA_PROVIDER_USERNAME)
+    parser.add_argument("--workers", type=int, default=1, help="Replay parsing processes (0 = one per CPU)")
+    parser.add_argument("--jobs", type=int, default=1, help="Model fitting processes (0 = one per CPU)")
+    parser.add_argument("--models", nargs="+", default=None, help="Models fitted by the train stage (default: all)")
+    parser.add_argument("--no-keep-replays", action="store_true", help="Delete each synthetic archive after use")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="json", help="Storage format of the archives")
+    args = parser.parse_args(argv)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    report = run_benchmark(
+        args.sizes,
+        work_dir=args.work_dir,
+        stages=args.stages,
+        seed=args.seed,
+        provider=args.provider,
+        workers=workers,
+        jobs=jobs,
+        models=args.models,
+        keep_replays=not args.no_keep_replays,
+        compression=args.compression,
+    )
+
+    regressions = []
+    if args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("machine", {}).get("cpu_count") != report["machine"]["cpu_count"]:
+            print("⚠️  Baseline recorded on a machine with a different CPU count: ratios are indicative only")
+        report["baseline"] = str(args.baseline)
+        mismatches = settings_mismatches(report, baseline)
+        if mismatches:
+            # Timings measured with other models / worker counts / formats are not comparable
+            print(f"⚠️  Baseline recorded with other settings, not compared ({'; '.join(mismatches)})")
+            report["settings_mismatch"] = mismatches
+        report["comparison"] = [] if mismatches else compare_to_baseline(report, baseline, tolerance=args.tolerance)
+        for c in report["comparison"]:
+            flag = "⚠️  REGRESSION" if c["regression"] else "ok"
+            print(
+                f"{c['n_replays']:>7} replays  {c['stage']:<9} time x{c.get('wall_s_ratio', float('nan')):.2f}  "
+                f"rss x{c.get('peak_rss_mb_ratio', float('nan')):.2f}  {flag}"
+            )
+        regressions = [c for c in report["comparison"] if c["regression"]]
+    else:
+        print(f"No baseline at {args.baseline} (record one with --save-baseline)")
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark results saved to: {args.out}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {k: v for k, v in report.items() if k not in ("baseline", "comparison", "settings_mismatch")},
+                f,
+                indent=2,
+            )
+        print(f"✅ Baseline saved to: {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
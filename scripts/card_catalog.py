@@ -0,0 +1,234 @@
+"""
+Card catalog: one row per DuelingBook card `id`, built from the card objects embedded in the replays.
+
+Every "Declare", "To GY", "SS ATK", ... play carries the whole card (effect text, atk/def, limits, ...),
+repeated for each use of the card. The catalog keeps it once, so the play tables (play_events.py,
+replay_warehouse.py) only hold the integer `card_id` and card attributes come from a single lookup table.
+When the same id comes with different attributes (limits or errata changing over time), the version
+from the last replay in name order, i.e. the most recent one, is kept.
+
+Storage is a directory of .npy arrays (one per column, sorted by id) plus catalog.json; load() memory-maps
+the arrays, so opening the catalog reads nothing until a column is used. Text columns are one UTF-8 blob
+with offsets. "?" atk/def (and missing numbers) are stored as -1.
+
+Usage:
+  python scripts/card_catalog.py --replays-dir data/db_replays --out data/card_catalog
+  python scripts/play_events.py --replays-dir data/db_replays --catalog-out data/card_catalog  # same pass
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from replay_io import list_replays, load_replay
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+CATALOG_VERSION = 1
+CATALOG_FILE = "catalog.json"
+NUMERIC_COLUMNS = {
+    "level": np.int16,
+    "atk": np.int16,
+    "def": np.int16,
+    "scale": np.int16,
+    "is_effect": np.int8,
+    "pendulum": np.int8,
+    "flip": np.int8,
+    "tcg": np.int8,
+    "ocg": np.int8,
+    "rush": np.int8,
+    "custom": np.int8,
+    "tcg_limit": np.int8,
+    "ocg_limit": np.int8,
+}
+CATEGORY_COLUMNS = ["card_type", "type", "attribute", "monster_color", "ability", "arrows"]
+TEXT_COLUMNS = ["name", "treated_as", "serial_number", "effect", "pendulum_effect"]
+
+
+def default_catalog_path() -> Path:
+    return _PROJECT_ROOT / "data/card_catalog"
+
+
+def replay_cards(plays: list[dict[str, Any]]) -> dict[int, dict[str, Any]]:
+    """Card objects of one replay's plays (and of its "Pick first" hands), last version per id."""
+    cards: dict[int, dict[str, Any]] = {}
+    for play in plays:
+        card = play.get("card")
+        if isinstance(card, dict) and card.get("id") is not None:
+            cards[card["id"]] = card
+        for card in play.get("cards") or ():
+            if isinstance(card, dict) and card.get("id") is not None:
+                cards[card["id"]] = card
+    return cards
+
+
+def collect_cards(path: Path) -> dict[int, dict[str, Any]]:
+    """Top-level so it can be shipped to worker processes."""
+    return replay_cards(load_replay(path).get("plays", []))
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1  # "?" atk/def, link monsters without def, missing fields
+
+
+class CardCatalog:
+    def __init__(self, ids: np.ndarray, columns: dict[str, Any], categories: dict[str, list[str]]):
+        self.ids = ids
+        self._columns = columns  # numeric arrays, category codes, (blob, offsets) for text
+        self.categories = categories
+
+    @classmethod
+    def from_cards(cls, cards: dict[int, dict[str, Any]]) -> "CardCatalog":
+        ids = np.array(sorted(cards), dtype=np.int32)
+        rows = [cards[int(card_id)] for card_id in ids]
+        columns: dict[str, Any] = {}
+        for col, dtype in NUMERIC_COLUMNS.items():
+            columns[col] = np.array([_as_int(row.get(col)) for row in rows], dtype=dtype)
+        categories: dict[str, list[str]] = {}
+        for col in CATEGORY_COLUMNS:
+            values = pd.Categorical([row.get(col) for row in rows])
+            categories[col] = [str(c) for c in values.categories]
+            columns[col] = values.codes.astype(np.int16)
+        for col in TEXT_COLUMNS:
+            encoded = [str(row.get(col) or "").encode("utf-8") for row in rows]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            columns[col] = np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+        return cls(ids, columns, categories)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def columns(self) -> list[str]:
+        return [*NUMERIC_COLUMNS, *CATEGORY_COLUMNS, *TEXT_COLUMNS]
+
+    def positions(self, card_ids: Iterable[int] | np.ndarray | pd.Series) -> np.ndarray:
+        """Row of every card id in the catalog, -1 for unknown (or missing) ids."""
+        if isinstance(card_ids, pd.Series):
+            card_ids = card_ids.to_numpy(dtype=np.int64, na_value=-1)
+        card_ids = np.asarray(card_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(card_ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.ids, card_ids), len(self.ids) - 1)
+        return np.where(self.ids[pos] == card_ids, pos, -1)
+
+    def lookup(self, card_ids: Iterable[int] | np.ndarray | pd.Series, column: str) -> np.ndarray | pd.Categorical:
+        """
+        Vectorized attribute lookup, e.g. catalog.lookup(events["card_id"], "attribute"): numbers as an
+        array (-1 for unknown ids), categories as a pandas Categorical, text as an object array (None).
+        """
+        pos = self.positions(card_ids)
+        known = pos >= 0
+        if column in NUMERIC_COLUMNS:
+            return np.where(known, np.asarray(self._columns[column])[np.maximum(pos, 0)], -1)
+        if column in CATEGORY_COLUMNS:
+            codes = np.where(known, np.asarray(self._columns[column])[np.maximum(pos, 0)], -1)
+            return pd.Categorical.from_codes(codes, categories=self.categories[column])
+        if column in TEXT_COLUMNS:
+            return np.array([self.text(column, p) if p >= 0 else None for p in pos], dtype=object)
+        raise KeyError(f"Unknown catalog column: {column}")
+
+    def text(self, column: str, position: int) -> str:
+        blob, offsets = self._columns[column]
+        return bytes(blob[offsets[position] : offsets[position + 1]]).decode("utf-8")
+
+    def card(self, card_id: int) -> dict[str, Any] | None:
+        (pos,) = self.positions([card_id])
+        if pos < 0:
+            return None
+        row: dict[str, Any] = {"id": int(card_id)}
+        for col in NUMERIC_COLUMNS:
+            row[col] = int(self._columns[col][pos])
+        for col in CATEGORY_COLUMNS:
+            code = int(self._columns[col][pos])
+            row[col] = None if code < 0 else self.categories[col][code]
+        for col in TEXT_COLUMNS:
+            row[col] = self.text(col, pos)
+        return row
+
+    def to_frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """The catalog as a DataFrame indexed by card id (text columns decoded)."""
+        frame = pd.DataFrame(index=pd.Index(np.asarray(self.ids), name="id"))
+        for col in columns or self.columns:
+            frame[col] = self.lookup(self.ids, col)
+        return frame
+
+    def save(self, out_dir: Path) -> Path:
+        """Write the catalog directory (replaced as a whole)."""
+        out_dir = Path(out_dir).expanduser().resolve()
+        tmp = out_dir.with_name(out_dir.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "id.npy", self.ids)
+        for col in [*NUMERIC_COLUMNS, *CATEGORY_COLUMNS]:
+            np.save(tmp / f"{col}.npy", np.asarray(self._columns[col]))
+        for col in TEXT_COLUMNS:
+            blob, offsets = self._columns[col]
+            np.save(tmp / f"{col}.utf8.npy", np.asarray(blob))
+            np.save(tmp / f"{col}.offsets.npy", np.asarray(offsets))
+        with open(tmp / CATALOG_FILE, "w", encoding="utf-8") as f:
+            json.dump({"version": CATALOG_VERSION, "count": len(self), "categories": self.categories}, f)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp, out_dir)
+        return out_dir
+
+    @classmethod
+    def load(cls, path: Path, *, mmap: bool = True) -> "CardCatalog":
+        path = Path(path).expanduser().resolve()
+        with open(path / CATALOG_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported card catalog version in {path}: {meta.get('version')}")
+        mode = "r" if mmap else None
+        columns: dict[str, Any] = {}
+        for col in [*NUMERIC_COLUMNS, *CATEGORY_COLUMNS]:
+            columns[col] = np.load(path / f"{col}.npy", mmap_mode=mode)
+        for col in TEXT_COLUMNS:
+            columns[col] = (
+                np.load(path / f"{col}.utf8.npy", mmap_mode=mode),
+                np.load(path / f"{col}.offsets.npy", mmap_mode=mode),
+            )
+        return cls(np.load(path / "id.npy", mmap_mode=mode), columns, meta["categories"])
+
+
+def build_card_catalog(replays_dir: Path, *, workers: int = 1) -> CardCatalog:
+    from get_csv_from_json import map_replays
+
+    paths = list_replays(replays_dir.expanduser().resolve())
+    cards: dict[int, dict[str, Any]] = {}
+    for replay in map_replays(collect_cards, paths, workers):
+        cards.update(replay)
+    return CardCatalog.from_cards(cards)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the card catalog (one row per card id) of a replay archive.")
+    parser.add_argument("--replays-dir", type=Path, default=_PROJECT_ROOT / "data/db_replays")
+    parser.add_argument("--out", type=Path, default=default_catalog_path())
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of processes used to parse replays (0 = one per CPU)"
+    )
+    args = parser.parse_args(argv)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    catalog = build_card_catalog(args.replays_dir, workers=workers)
+    out = catalog.save(args.out)
+    size = sum(f.stat().st_size for f in out.iterdir())
+    print(f"✅ Catalogue de {len(catalog)} cartes sauvegardé dans: {out} ({size / 1e3:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+"""
+Inverted card-usage index of the replay archive.
+
+One row per distinct (file, username, play, card_name): which cards each player used with each play
+type in each replay. It is collected by get_csv_from_json.py while the replays are parsed anyway and
+saved next to the matches CSV, so the deck filter of DataProcessing_for_YGO.py becomes a vectorized
+query instead of reopening every replay JSON.
+
+The warehouse plays table (replay_warehouse.py) has the same columns and can be queried the same way.
+
+A small "<index>.json" sidecar records a digest of the `file` column of the matches CSV the index was
+built with, so a stale index (e.g. left over by an older run, --stream writes none) is not picked up
+for another matches CSV.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+INDEX_COLUMNS = ["file", "username", "play", "card_name"]
+
+
+def default_card_index_path(matches_csv: Path) -> Path:
+    matches_csv = Path(matches_csv)
+    return matches_csv.with_name(matches_csv.stem + "_card_usage.csv")
+
+
+def build_card_index(records: Iterable[tuple[str, str | None, str, str]]) -> pd.DataFrame:
+    """records: (file, username, play, card_name) tuples, duplicates allowed."""
+    index = pd.DataFrame(list(records), columns=INDEX_COLUMNS).drop_duplicates(ignore_index=True)
+    return index.astype("category")
+
+
+def _sidecar_path(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
+
+
+def files_digest(files: Iterable[object]) -> str:
+    """Digest of a set of replay file names (missing values ignored), e.g. the matches CSV `file` column."""
+    names = sorted({str(f) for f in pd.Series(list(files), dtype=object).dropna()})
+    return hashlib.sha256("\n".join(names).encode("utf-8")).hexdigest()
+
+
+def save_card_index(index: pd.DataFrame, path: Path, *, matches_files: Iterable[object] | None = None) -> Path:
+    """Write the index; with matches_files (the matches `file` column), record which matches it belongs to."""
+    path = Path(path).expanduser().resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index.to_csv(path, index=False)
+    sidecar = _sidecar_path(path)
+    if matches_files is None:
+        sidecar.unlink(missing_ok=True)
+    else:
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump({"matches_files": files_digest(matches_files)}, f)
+    return path
+
+
+def card_index_matches(path: Path, matches_files: Iterable[object]) -> bool:
+    """True if the index at `path` was saved for a matches table with these files."""
+    sidecar = _sidecar_path(Path(path).expanduser().resolve())
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            recorded = json.load(f).get("matches_files")
+    except (OSError, ValueError):
+        return False
+    return recorded == files_digest(matches_files)
+
+
+def load_card_index(path: Path) -> pd.DataFrame:
+    path = Path(path).expanduser().resolve()
+    return pd.read_csv(path, dtype={c: "category" for c in INDEX_COLUMNS})
+
+
+def files_using_cards(
+    index: pd.DataFrame,
+    *,
+    username: str,
+    plays: Iterable[str],
+    cards: Iterable[str],
+) -> set[str]:
+    """Files in which `username` used at least one of `cards` with one of the `plays` types."""
+    mask = (
+        (index["username"] == username)
+        & index["play"].isin(list(plays))
+        & index["card_name"].isin(list(cards))
+    )
+    return set(index.loc[mask, "file"].astype(str))
@@ -0,0 +1,86 @@
+"""
+One-shot migration of a replay archive to another storage format (see replay_io.py).
+
+Every replay of the directory that is not already in the target format is rewritten, checked (the new
+file must decode to the same JSON) and the original file is then deleted (kept with --keep-originals).
+Logical replay names do not change ("<replay>.json" in the matches CSV and card index), so existing
+CSVs stay valid; the replay manifest re-parses the archive once since the files changed.
+
+Usage:
+  python scripts/compress_replays.py --replays-dir data/db_replays                # -> .json.gz
+  python scripts/compress_replays.py --replays-dir data/db_replays --to zstd      # needs zstandard
+  python scripts/compress_replays.py --replays-dir data/db_replays --to json      # back to indented JSON
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from get_csv_from_json import map_replays
+from replay_io import COMPRESSIONS, list_replays, load_replay, replay_format, replay_name, replay_path, save_replay
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def convert_replay(path: Path, *, to: str, keep_original: bool = False) -> tuple[int, int]:
+    """
+    Rewrite one replay in format `to`; returns (old size, new size) in bytes.
+    Top-level so it can be shipped to worker processes.
+    """
+    data = load_replay(path)
+    target = replay_path(path.parent, replay_name(path)[: -len(".json")], to)
+    save_replay(data, target)
+    if load_replay(target) != data:
+        target.unlink()
+        raise ValueError(f"Round trip mismatch for {path.name}: original kept")
+    old_size, new_size = path.stat().st_size, target.stat().st_size
+    if not keep_original:
+        path.unlink()
+    return old_size, new_size
+
+
+def migrate_archive(
+    replays_dir: Path, *, to: str = "gzip", workers: int = 1, keep_originals: bool = False
+) -> dict[str, Any]:
+    replays_dir = replays_dir.expanduser().resolve()
+    paths = [p for p in list_replays(replays_dir) if replay_format(p) != to]
+    start = time.perf_counter()
+    sizes = map_replays(partial(convert_replay, to=to, keep_original=keep_originals), paths, workers)
+    before = sum(old for old, _ in sizes)
+    after = sum(new for _, new in sizes)
+    return {
+        "converted": len(paths),
+        "bytes_before": before,
+        "bytes_after": after,
+        "ratio": round(before / after, 2) if after else None,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a replay archive to compressed (or plain) storage.")
+    parser.add_argument("--replays-dir", type=Path, default=_PROJECT_ROOT / "data/db_replays")
+    parser.add_argument("--to", choices=COMPRESSIONS, default="gzip", help="Target storage format")
+    parser.add_argument("--workers", type=int, default=1, help="Conversion processes (0 = one per CPU)")
+    parser.add_argument("--keep-originals", action="store_true", help="Do not delete the converted files")
+    args = parser.parse_args(argv)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    stats = migrate_archive(args.replays_dir, to=args.to, workers=workers, keep_originals=args.keep_originals)
+    if not stats["converted"]:
+        print(f"Nothing to convert: every replay of {args.replays_dir} is already in format '{args.to}'")
+        return 0
+    print(
+        f"✅ {stats['converted']} replay(s) converted to '{args.to}' in {stats['seconds']}s: "
+        f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB (x{stats['ratio']} smaller)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
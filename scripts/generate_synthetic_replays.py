@@ -0,0 +1,355 @@
+"""
+Generate synthetic DuelingBook replay JSONs, for benchmarks and scaling tests.
+
+The files follow the schema of data/db_replays: match metadata, then a `plays` list with RPS,
+Pick first (10 card dicts: 5 per player), card plays (To GY, Declare, SS ATK, ...) carrying full
+card dicts, game-state plays (Stop viewing, Duel message, ...) and Admit defeat, over 1 to 3 games.
+Play counts and play-type frequencies are drawn to look like the real archive (median ~430 plays
+per replay). The data provider plays the R.B. deck in part of the matches, so the deck filter of
+DataProcessing_for_YGO.py keeps a realistic fraction of rows.
+
+Replay i only depends on (seed, i): the output is the same whatever --workers is.
+
+Usage:
+  python scripts/generate_synthetic_replays.py --n 1000 --out-dir data/synthetic_replays
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from DataProcessing_for_YGO import DATA_PROVIDER_USERNAME, TARGETED_CARDS
+from get_csv_from_json import map_replays
+from replay_io import COMPRESSIONS, replay_path, save_replay
+
+# Relative frequencies of in-game plays in data/db_replays (structural plays are added separately)
+CARD_PLAY_WEIGHTS = {
+    "To GY": 3636,
+    "Declare": 3157,
+    "SS ATK": 1679,
+    "To hand": 1131,
+    "SS DEF": 670,
+    "Activate ST": 611,
+    "Draw card": 537,
+    "Banish": 454,
+    "Normal Summon": 327,
+    "To ST": 266,
+    "OL ATK": 183,
+    "Mill": 114,
+    "To ED": 93,
+}
+STATE_PLAY_WEIGHTS = {
+    "Stop viewing": 6108,
+    "Duel message": 4539,
+    "View GY": 2161,
+    "Good": 1905,
+    "Shuffle deck": 1560,
+    "View deck": 1516,
+    "View ED": 1227,
+    "Target card": 1079,
+    "View GY 2": 892,
+    "Thinking": 608,
+    "Enter M1": 468,
+    "Shuffle hand": 391,
+    "Set ST": 340,
+    "Enter SP": 325,
+    "End turn": 240,
+    "Start turn": 231,
+    "Overlay": 194,
+    "Enter EP": 190,
+    "View Banished": 189,
+    "To B Deck": 165,
+    "Detach": 151,
+    "Life points": 146,
+    "Enter BP": 91,
+    "Show hand": 78,
+}
+_PLAY_TYPES = list(CARD_PLAY_WEIGHTS) + list(STATE_PLAY_WEIGHTS)
+_PLAY_WEIGHTS = list(CARD_PLAY_WEIGHTS.values()) + list(STATE_PLAY_WEIGHTS.values())
+
+# Plays per replay ~ lognormal(median, sigma), clipped
+PLAYS_MEDIAN = 430
+PLAYS_SIGMA = 0.55
+PLAYS_RANGE = (20, 1500)
+
+N_ARCHETYPES = 24
+CARDS_PER_ARCHETYPE = 18
+STAPLES = [
+    "Ash Blossom & Joyous Spring",
+    "Infinite Impermanence",
+    "Called by the Grave",
+    "Crossout Designator",
+    "Effect Veiler",
+    "Nibiru, the Primal Being",
+    "Triple Tactics Talent",
+    "Pot of Prosperity",
+]
+RB_DECK = TARGETED_CARDS + ["R.B. VALCan Booster", "R.B. Operation Test", "Jet Synchron", "Scrap Recycler"]
+# Share of matches where the data provider plays the targeted deck
+PROVIDER_RB_RATE = 0.6
+
+_WORDS = (
+    "target monster card your opponent field special summon deck hand graveyard banish negate effect "
+    "once per turn you can activate this quick destroy draw add send attack points level"
+).split()
+
+
+def _card_dict(name: str, card_id: int, rng: random.Random) -> dict[str, Any]:
+    is_monster = rng.random() < 0.6
+    effect = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(30, 90))).capitalize() + "."
+    return {
+        "def": str(rng.randrange(0, 3100, 100)) if is_monster else "0",
+        "monster_color": "Effect" if is_monster else "",
+        "arrows": "",
+        "is_effect": int(is_monster),
+        "scale": 0,
+        "pic": "1",
+        "type": rng.choice(["Machine", "Warrior", "Dragon", "Aqua", "Zombie"]) if is_monster else "Normal",
+        "ocg": 1,
+        "atk": str(rng.randrange(0, 3100, 100)) if is_monster else "0",
+        "tcg": 1,
+        "id": card_id,
+        "attribute": rng.choice(["DARK", "LIGHT", "FIRE", "WATER", "EARTH", "WIND"]) if is_monster else "",
+        "ability": "",
+        "pendulum": 0,
+        "flip": 0,
+        "level": rng.randint(1, 8) if is_monster else 0,
+        "custom": 0,
+        "serial_number": f"{rng.randrange(10**8):08d}",
+        "card_type": "Monster" if is_monster else rng.choice(["Spell", "Trap"]),
+        "tcg_limit": 3,
+        "ocg_limit": 3,
+        "rush": 0,
+        "effect": effect,
+        "name": name,
+        "pendulum_effect": "",
+        "treated_as": name,
+    }
+
+
+def build_card_pool(seed: int = 0) -> tuple[dict[str, dict[str, Any]], list[list[str]]]:
+    """Card dicts by name, and the decks (lists of card names) players draw from."""
+    rng = random.Random(f"{seed}-cards")
+    decks = [[f"Archetype{a:02d} Card{c:02d}" for c in range(CARDS_PER_ARCHETYPE)] for a in range(N_ARCHETYPES)]
+    names = list(dict.fromkeys([*RB_DECK, *STAPLES, *(name for deck in decks for name in deck)]))
+    cards = {name: _card_dict(name, 1000 + i, rng) for i, name in enumerate(names)}
+    return cards, [deck + STAPLES for deck in decks]
+
+
+def _player(username: str, user_id: int, start: int, rng: random.Random) -> dict[str, Any]:
+    main = list(range(start, start + 40))
+    extra = list(range(start + 40, start + 55))
+    return {
+        "side": [],
+        "nsfw": 0,
+        "rating": rng.randint(50, 900),
+        "start": start,
+        "extra_total": len(extra),
+        "main": main,
+        "pic": "13011.jpg",
+        "experience": rng.randint(0, 20000),
+        "token": "1",
+        "main_total": len(main),
+        "side_total": 0,
+        "legality": "Advanced",
+        "user_id": user_id,
+        "default_pic": "13011.jpg",
+        "sleeve": "",
+        "extra": extra,
+        "username": username,
+    }
+
+
+def _log(text: str, username: str, kind: str = "duel") -> dict[str, Any]:
+    return {"public_log": text, "type": kind, "username": username}
+
+
+def generate_replay(
+    index: int,
+    *,
+    cards: dict[str, dict[str, Any]],
+    decks: list[list[str]],
+    seed: int = 0,
+    provider: str = DATA_PROVIDER_USERNAME,
+) -> dict[str, Any]:
+    """Replay number `index` of the synthetic archive (deterministic in (seed, index))."""
+    rng = random.Random(f"{seed}-{index}")
+    opponent = f"Player{rng.randrange(10**6):06d}"
+    # The provider is player1 of the RPS play about half of the time, as in the real archive
+    player1, player2 = (provider, opponent) if rng.random() < 0.5 else (opponent, provider)
+    deck_of = {
+        provider: RB_DECK + STAPLES if rng.random() < PROVIDER_RB_RATE else rng.choice(decks),
+        opponent: rng.choice(decks),
+    }
+
+    n_plays = int(min(max(rng.lognormvariate(math.log(PLAYS_MEDIAN), PLAYS_SIGMA), PLAYS_RANGE[0]), PLAYS_RANGE[1]))
+    n_games = rng.choices([1, 2, 3], weights=[0.3, 0.45, 0.25])[0]
+    seconds = 0
+    object_id = 0
+    plays: list[dict[str, Any]] = []
+
+    def card_of(username: str) -> dict[str, Any]:
+        nonlocal object_id
+        object_id += 1
+        return {**cards[rng.choice(deck_of[username])], "object_id": object_id}
+
+    rps_winner = rng.choice([player1, player2])
+    seconds += rng.randint(5, 30)
+    plays.append(
+        {
+            "play": "RPS",
+            "player1_choice": rng.choice(["Rock", "Paper", "Scissors"]),
+            "seconds": seconds,
+            "winner": rps_winner,
+            "player1": player1,
+            "player2": player2,
+            "log": _log("Won Rock-Paper-Scissors", rps_winner, "game"),
+            "action": "Duel",
+            "player2_choice": rng.choice(["Rock", "Paper", "Scissors"]),
+        }
+    )
+
+    for game in range(n_games):
+        if game:
+            for kind in ("Siding", "Done siding", "Begin next duel"):
+                seconds += rng.randint(1, 40)
+                username = rng.choice([player1, player2])
+                plays.append({"play": kind, "seconds": seconds, "action": "Duel", "username": username})
+        seconds += rng.randint(1, 10)
+        # First 5 cards are player1's hand, the next 5 player2's (see get_start_hands)
+        plays.append(
+            {
+                "play": "Pick first",
+                "seconds": seconds,
+                "cards": [card_of(player1) for _ in range(5)] + [card_of(player2) for _ in range(5)],
+                "log": [_log("Chose to go first", rps_winner, "game")],
+                "action": "Duel",
+                "username": rps_winner,
+                "order": [rps_winner, player2 if rps_winner == player1 else player1],
+            }
+        )
+        for kind in rng.choices(_PLAY_TYPES, weights=_PLAY_WEIGHTS, k=max(1, n_plays // n_games)):
+            seconds += rng.randint(0, 6)
+            username = rng.choice([player1, player2])
+            play: dict[str, Any] = {"play": kind, "seconds": seconds, "action": "Duel", "username": username}
+            if kind in CARD_PLAY_WEIGHTS:
+                card = card_of(username)
+                play["card"] = card
+                play["id"] = card["object_id"]
+                play["log"] = _log(f'{kind} "{card["name"]}"', username)
+            else:
+                play["log"] = _log(kind, username)
+            plays.append(play)
+
+        seconds += rng.randint(1, 30)
+        loser = rng.choice([player1, player2])
+        if rng.random() < 0.93:
+            plays.append(
+                {
+                    "play": "Admit defeat",
+                    "over": game == n_games - 1,
+                    "seconds": seconds,
+                    "log": _log("Admitted defeat", loser, "game"),
+                    "action": "Duel",
+                    "username": loser,
+                }
+            )
+        else:
+            # Match abandoned: no Admit defeat, game1_winner stays unknown
+            plays.append(
+                {
+                    "play": "Left duel",
+                    "seconds": seconds,
+                    "log": _log("Went offline", loser),
+                    "action": "Duel",
+                    "username": loser,
+                }
+            )
+            break
+
+    date = datetime(2025, 1, 1) + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+    replay_id = 70_000_000 + index
+    return {
+        "conceal": False,
+        "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+        "plays": plays,
+        "player1": _player(player1, rng.randrange(10**7), 1, rng),
+        "player2": _player(player2, rng.randrange(10**7), 56, rng),
+        "format": "ar",
+        "rules": "TCG",
+        "tag_duel": False,
+        "version": 17,
+        "watching": True,
+        "rated": True,
+        "password": False,
+        "match_type": "m",
+        "links": True,
+        "id": replay_id,
+        "logs": [_log(f"{player1} joined pool (English, TCG, Match) in Advanced (Rated)", player1, "game")],
+        "player3": None,
+        "player4": None,
+        "liked": False,
+    }
+
+
+def _write_replay(
+    index: int,
+    *,
+    out_dir: Path,
+    cards: dict[str, dict[str, Any]],
+    decks: list[list[str]],
+    seed: int,
+    provider: str,
+    compression: str = "json",
+) -> Path:
+    replay = generate_replay(index, cards=cards, decks=decks, seed=seed, provider=provider)
+    # Same layout as the downloaded replays (indented JSON unless compressed)
+    return save_replay(replay, replay_path(out_dir, f"1313181-{replay['id']}", compression))
+
+
+def generate_replays(
+    out_dir: Path,
+    n: int,
+    *,
+    seed: int = 0,
+    provider: str = DATA_PROVIDER_USERNAME,
+    workers: int = 1,
+    compression: str = "json",
+) -> list[Path]:
+    """Write n synthetic replays to out_dir (files already there are overwritten, others are kept)."""
+    out_dir = out_dir.expanduser().resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cards, decks = build_card_pool(seed)
+    write = partial(
+        _write_replay, out_dir=out_dir, cards=cards, decks=decks, seed=seed, provider=provider, compression=compression
+    )
+    return map_replays(write, list(range(n)), workers)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic DuelingBook replay JSONs.")
+    parser.add_argument("--n", type=int, default=1000, help="Number of replays")
+    parser.add_argument("--out-dir", type=Path, default=Path("data/synthetic_replays"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--provider", type=str, default=DATA_PROVIDER_USERNAME)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to write replays (0 = one per CPU)")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="json", help="Replay storage format")
+    args = parser.parse_args(argv)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    paths = generate_replays(
+        args.out_dir, args.n, seed=args.seed, provider=args.provider, workers=workers, compression=args.compression
+    )
+    print(f"✅ {len(paths)} synthetic replays written to: {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
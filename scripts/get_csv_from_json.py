@@ -6,114 +6,382 @@ refactored to run from this GitHub repository using relative paths.
 
 Typical usage:
   python scripts/get_csv_from_json.py --replays-dir data/db_replays --out data/matches_data_mitsu_RB.csv
+  python scripts/get_csv_from_json.py --workers 8   # parse replays in a process pool
+  python scripts/get_csv_from_json.py --stream      # stop reading each replay once the needed plays are found
+  python scripts/get_csv_from_json.py --full-rebuild  # ignore the replay manifest and re-parse everything
+  python scripts/get_csv_from_json.py --profile       # stage timings and slowest replays (JSON report)
+  python scripts/get_csv_from_json.py --keep-duplicates  # keep replays whose plays duplicate another replay
+
+Besides the matches CSV, a card-usage index (see card_index.py) is written next to it.
+Duplicate replays (same duel under several names, see replay_dedup.py) are dropped: byte-identical files
+are detected from their hash without being parsed, then the plays fingerprints find exact and near copies.
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, TypeVar
 
 import pandas as pd
 
+from card_index import build_card_index, default_card_index_path, save_card_index
+from pipeline_profiling import NULL_PROFILER, Profiler, add_profile_arguments, profiler_from_args
+from replay_dedup import (
+    NEAR_DUPLICATE_THRESHOLD,
+    Duplicate,
+    ReplayFingerprint,
+    duplicate_key,
+    find_duplicates,
+    print_duplicates,
+    replay_fingerprint,
+)
+from replay_io import iter_plays, list_replays, load_replay, replay_name
+from replay_manifest import ReplayManifest, default_manifest_path, file_sha256
+
+T = TypeVar("T")
+
+# Fields a ReplayExtractor can collect. "plays" and "card_usage" need the whole list,
+# the others stop at their first event.
+REPLAY_FIELDS = ("rps", "start_hands", "defeat", "plays", "card_usage")
+
+# (match row, unique plays, card usage, content fingerprint) as returned by extract_match_row
+ReplayResult = tuple[
+    dict[str, Any] | None, list[str], list[tuple[str | None, str, str]] | None, ReplayFingerprint | None
+]
+
+
+class ReplayExtractor:
+    """
+    Visitor collecting the match fields of a replay in a single pass over its `plays`.
+    Only the requested fields are collected, and the traversal stops as soon as all of them are known.
+    """
+
+    def __init__(self, fields: Iterable[str] = REPLAY_FIELDS):
+        self.pending = set(fields)
+        self.player1: str | None = None
+        self.player2: str | None = None
+        self.rps_winner_name: str | None = None
+        self.hand_player1: str | None = None
+        self.hand_player2: str | None = None
+        self.defeated_username: str | None = None
+        self.plays: dict[str, None] = {}  # ordered set of play types
+        self.card_usage: dict[tuple[str | None, str, str], None] = {}  # ordered set of (username, play, card name)
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def visit(self, play: dict[str, Any]) -> bool:
+        """Consume one play; returns True once nothing else is needed."""
+        kind = play["play"]
+        if "plays" in self.pending:
+            self.plays.setdefault(kind)
+        if "card_usage" in self.pending:
+            card = play.get("card")
+            if isinstance(card, dict) and card.get("name") is not None:
+                self.card_usage.setdefault((play.get("username"), kind, card["name"]))
+        if kind == "RPS" and "rps" in self.pending:
+            self.player1, self.player2 = play["player1"], play["player2"]
+            self.rps_winner_name = play["winner"]
+            self.pending.discard("rps")
+        elif kind == "Pick first" and "start_hands" in self.pending:
+            # Les 5 premières cartes sont pour player1, les 5 suivantes pour player2
+            names = [card["name"] + "%%%%" for card in play["cards"]]
+            self.hand_player1 = "".join(names[:5])
+            self.hand_player2 = "".join(names[5:])
+            self.pending.discard("start_hands")
+        elif kind == "Admit defeat" and "defeat" in self.pending and "username" in play:
+            self.defeated_username = play["username"]
+            self.pending.discard("defeat")
+        return self.done
+
+    def feed(self, plays: Iterable[dict[str, Any]]) -> "ReplayExtractor":
+        for play in plays:
+            if self.visit(play):
+                break
+        return self
+
+    @property
+    def rps_winner(self) -> bool | None:
+        # True si player1 a gagné le RPS, False si player2 a gagné
+        if self.player1 is None:
+            return None
+        return self.player1 == self.rps_winner_name
+
+    def game1_winner(self, player1_name: str | None = None) -> bool | None:
+        # Si player2 a admis la défaite, alors player1 a gagné (retourne True)
+        # Si player1 a admis la défaite, alors player2 a gagné (retourne False)
+        if self.defeated_username is None:
+            return None
+        return self.defeated_username != (player1_name if player1_name is not None else self.player1)
+
+    def match_row(self, file_name: str) -> dict[str, Any] | None:
+        """Row of the matches table, or None if the replay has no RPS play."""
+        if self.player1 is None or self.player2 is None:
+            return None
+        return {
+            "file": file_name,
+            "player1": self.player1,
+            "player2": self.player2,
+            "rps_winner": self.rps_winner,
+            "game1_winner": self.game1_winner(),
+            "starting_hand_player1": self.hand_player1,
+            "starting_hand_player2": self.hand_player2,
+        }
+
+
+def extract_replay(data_json: dict[str, Any], fields: Iterable[str] = REPLAY_FIELDS) -> ReplayExtractor:
+    return ReplayExtractor(fields).feed(data_json["plays"])
+
+
 def get_player_name(data_json : dict[str, Any]):
-    for play in data_json['plays']:
-            if play['play']=='RPS':
-                return play['player1'], play['player2']
-    return None, None  # Retourner None si aucun play RPS n'est trouvé
+    extractor = extract_replay(data_json, ("rps",))
+    return extractor.player1, extractor.player2  # None si aucun play RPS n'est trouvé
 
 def get_RPS_winner(data_json : dict[str, Any]):
-    for play in data_json['plays']:
-            if play['play']=='RPS':
-                # Retourne True si player1 a gagné, False si player2 a gagné
-                return play['player1'] == play['winner']
-    return None  # Aucun play RPS trouvé
+    return extract_replay(data_json, ("rps",)).rps_winner
 
 def get_game1_winner(data_json: dict[str, Any], player1_name: str, player2_name: str):
-    for play in data_json['plays']:
-            if play['play']=='Admit defeat':
-                # Si player2 a admis la défaite, alors player1 a gagné (retourne True)
-                # Si player1 a admis la défaite, alors player2 a gagné (retourne False)
-                if 'username' in play:
-                    return play['username'] != player1_name  # True si player1 a gagné
-    return None  # Aucun "Admit defeat" trouvé
+    return extract_replay(data_json, ("defeat",)).game1_winner(player1_name)
 
 
 def get_start_hands(data_json: dict[str, Any]):
-    for play in data_json['plays']:
-        if play['play']=='Pick first':
-            cards_player1 = ""
-            cards_player2 = ""
-            cpt = 0
-            for card in play['cards']:
-                if cpt < 5 :
-                    cards_player1 += card['name'] + "%%%%"
-                else :
-                    cards_player2 += card['name'] + "%%%%"
-                cpt += 1
-            # Les 5 premières cartes sont pour player1, les 5 suivantes pour player2
-            return cards_player1, cards_player2
-    return None, None
+    extractor = extract_replay(data_json, ("start_hands",))
+    return extractor.hand_player1, extractor.hand_player2
 
 # Get the lists of different plays possible in duelingbook replays
 # In combinaison with get_list_of_cards, it can be used to filter the replays by plays and cards
 # Goal : classify the deck played in the replay
 def get_list_of_plays(data_json: dict[str, Any]):
-    l = []
-    for play in data_json['plays']:
-        l.append(play['play'])
-    l_unique = []
-    [l_unique.append(play) for play in l if play not in l_unique]
-    return l_unique
-
-def build_matches_dataframe(replays_dir: Path, data_provider_username: str | None = None) -> pd.DataFrame:
+    return list(extract_replay(data_json, ("plays",)).plays)
+
+def extract_match_row(path: Path, *, stream: bool = False, fingerprint: bool = True) -> ReplayResult:
+    """
+    Parse one replay file and return (match row, unique plays, card usage, fingerprint).
+    The row is None when the replay has no RPS play (it is then skipped).
+    With stream=True the plays are decoded incrementally and reading stops once the row is complete;
+    the list of plays, the card usage and the fingerprint are then not collected (returned empty / None).
+    Top-level so it can be shipped to worker processes.
+    """
+    content = None
+    if stream:
+        with closing(iter_plays(path)) as plays:
+            extractor = ReplayExtractor(("rps", "start_hands", "defeat")).feed(plays)
+    else:
+        data = load_replay(path)
+        extractor = extract_replay(data)
+        if fingerprint:
+            content = replay_fingerprint(data["plays"])
+
+    match_data = extractor.match_row(replay_name(path))
+    if match_data is None:
+        return None, [], None, content
+    return match_data, list(extractor.plays), (None if stream else list(extractor.card_usage)), content
+
+
+def map_replays(fn: Callable[[Path], T], json_paths: list[Path], workers: int = 1) -> list[T]:
+    """
+    Apply `fn` (a picklable top-level function) to every replay, in a process pool when workers > 1.
+    Results always come back in json_paths order, so the output does not depend on `workers`.
+    """
+    if workers <= 1 or len(json_paths) < 2:
+        return [fn(path) for path in json_paths]
+    workers = min(workers, len(json_paths))
+    # A few chunks per worker: amortizes IPC without leaving cores idle at the tail
+    chunksize = max(1, len(json_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, json_paths, chunksize=chunksize))
+
+
+def build_matches_dataframe(
+    replays_dir: Path,
+    data_provider_username: str | None = None,
+    *,
+    workers: int = 1,
+    stream: bool = False,
+    manifest_path: Path | None = None,
+    full_rebuild: bool = False,
+    warehouse: Path | None = None,
+    dedup: bool = True,
+    near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    profiler: Profiler = NULL_PROFILER,
+) -> pd.DataFrame:
+    """
+    With manifest_path, rows of replays unchanged since the previous run are taken from the manifest
+    and only new/modified files are parsed (full_rebuild=True ignores the existing manifest).
+    With warehouse, rows are read from the Parquet warehouse (see replay_warehouse.py) instead of the JSONs.
+    With dedup, replays duplicating another one (see replay_dedup.py) are left out; in streaming mode only
+    byte-identical files are recognized, since the plays are not read to the end.
+    """
+    df, _ = build_matches_and_card_index(
+        replays_dir,
+        data_provider_username,
+        workers=workers,
+        stream=stream,
+        manifest_path=manifest_path,
+        full_rebuild=full_rebuild,
+        warehouse=warehouse,
+        dedup=dedup,
+        near_duplicate_threshold=near_duplicate_threshold,
+        profiler=profiler,
+    )
+    return df
+
+
+def build_matches_and_card_index(
+    replays_dir: Path,
+    data_provider_username: str | None = None,
+    *,
+    workers: int = 1,
+    stream: bool = False,
+    manifest_path: Path | None = None,
+    full_rebuild: bool = False,
+    warehouse: Path | None = None,
+    dedup: bool = True,
+    near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    profiler: Profiler = NULL_PROFILER,
+) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """
+    Same as build_matches_dataframe, also returning the card-usage index collected during the same pass
+    (None in streaming mode, where replays are not read to the end).
+    """
+    if warehouse is not None:
+        with profiler.stage("warehouse"):
+            df, card_index = _matches_from_warehouse(warehouse, data_provider_username)
+        return df, card_index
+
     replays_dir = replays_dir.expanduser().resolve()
-    json_paths = sorted(p for p in replays_dir.glob("*.json") if p.is_file())
+    json_paths = list_replays(replays_dir)
+
+    manifest: ReplayManifest | None = None
+    if manifest_path is not None:
+        manifest = ReplayManifest(manifest_path) if full_rebuild else ReplayManifest.load(manifest_path)
+
+    results: list[ReplayResult | None] = [None] * len(json_paths)
+    if manifest is not None:
+        with profiler.stage("manifest_lookup"):
+            for i, path in enumerate(json_paths):
+                results[i] = manifest.lookup(path, need_plays=not stream, need_fingerprint=dedup and not stream)
+    to_parse = [i for i, res in enumerate(results) if res is None]
+
+    digests: dict[int, str] = {}
+    copies: dict[int, int] = {}  # replay -> byte-identical replay whose result it reuses
+    if dedup:
+        with profiler.stage("hash"):
+            first_with_digest: dict[str, int] = {}
+            if manifest is not None:
+                for i, res in enumerate(results):
+                    if res is not None:
+                        digests[i] = manifest.sha256(json_paths[i])
+                        first_with_digest.setdefault(digests[i], i)
+            for i in to_parse:
+                digests[i] = file_sha256(json_paths[i])
+                original = first_with_digest.setdefault(digests[i], i)
+                if original != i:
+                    copies[i] = original
+        to_parse = [i for i in to_parse if i not in copies]
+
+    with profiler.stage("parse"):
+        parsed = profiler.map_timed(
+            partial(extract_match_row, stream=stream, fingerprint=dedup),
+            [json_paths[i] for i in to_parse],
+            partial(map_replays, workers=workers),
+            names=[replay_name(json_paths[i]) for i in to_parse],
+        )
+    for i, res in zip(to_parse, parsed):
+        results[i] = res
+    for i, original in copies.items():
+        row, plays, card_usage, fingerprint = results[original]
+        row = None if row is None else {**row, "file": replay_name(json_paths[i])}
+        results[i] = row, plays, card_usage, fingerprint
+
+    if manifest is not None:
+        with profiler.stage("manifest_save"):
+            for i in [*to_parse, *copies]:
+                row, plays, card_usage, fingerprint = results[i]
+                manifest.record(
+                    json_paths[i], row, None if stream else plays, card_usage, fingerprint, sha256=digests.get(i)
+                )
+            removed = manifest.prune(json_paths)
+            manifest.save()
+        print(
+            f"Manifest: {manifest.hits} replay(s) inchangé(s), {len(to_parse)} analysé(s), "
+            f"{removed} supprimé(s) -> {manifest.path}"
+        )
+
+    duplicates: dict[str, Duplicate] = {}
+    if dedup:
+        with profiler.stage("dedup"):
+            duplicates = find_duplicates(
+                [
+                    duplicate_key(replay_name(path), fingerprint, digests[i])
+                    for i, (path, (_, _, _, fingerprint)) in enumerate(zip(json_paths, results))
+                ],
+                threshold=near_duplicate_threshold,
+            )
+        print_duplicates(duplicates)
 
     matches_data: list[dict[str, Any]] = []
     total_plays: list[str] = []
+    usage_records: list[tuple[str, str | None, str, str]] = []
 
-    for path in json_paths:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        player1_name, player2_name = get_player_name(data)
-        if player1_name is None or player2_name is None:
+    for path, (match_data, plays, card_usage, _) in zip(json_paths, results):
+        if match_data is None:
             print(f"⚠️  Aucun play RPS trouvé dans {path.name} - ignoré")
             continue
+        if match_data["file"] in duplicates:
+            continue
+        total_plays += plays
+        matches_data.append(match_data)
+        if card_usage is not None:
+            usage_records.extend((replay_name(path), *record) for record in card_usage)
 
-        rps_winner = get_RPS_winner(data)
-        game1_winner = get_game1_winner(data, player1_name, player2_name)
-        hand_player1, hand_player2 = get_start_hands(data)
+    with profiler.stage("assemble"):
+        df = pd.DataFrame(matches_data)
+        swap_provider_to_player1(df, data_provider_username)
 
-        total_plays += get_list_of_plays(data)
+    if not stream:
+        # Streaming stops before the end of each replay, so the full list of plays is not known
+        total_plays_unique = list(dict.fromkeys(total_plays))
+        print("Plays seen (unique):", total_plays_unique)
 
-        match_data = {
-            "file": path.name,
-            "player1": player1_name,
-            "player2": player2_name,
-            "rps_winner": rps_winner,
-            "game1_winner": game1_winner,
-            "starting_hand_player1": hand_player1,
-            "starting_hand_player2": hand_player2,
-        }
-        matches_data.append(match_data)
+    if stream:
+        return df, None
+    with profiler.stage("card_index"):
+        card_index = build_card_index(usage_records)
+    return df, card_index
 
-    df = pd.DataFrame(matches_data)
 
-    if data_provider_username:
-        # Ensure the data provider is always in player1
-        for i in range(len(df["file"])):
-            if df.loc[i, "player2"] == data_provider_username:
-                df.loc[i, "player1"], df.loc[i, "player2"] = df.loc[i, "player2"], df.loc[i, "player1"]
-                df.loc[i, "starting_hand_player1"], df.loc[i, "starting_hand_player2"] = df.loc[i, "starting_hand_player2"], df.loc[i, "starting_hand_player1"]
+def _matches_from_warehouse(
+    warehouse: Path, data_provider_username: str | None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    from replay_warehouse import load_matches, load_plays
 
-    total_plays_unique: list[str] = []
-    [total_plays_unique.append(p) for p in total_plays if p not in total_plays_unique]
-    print("Plays seen (unique):", total_plays_unique)
+    df = load_matches(warehouse)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    swap_provider_to_player1(df, data_provider_username)
+
+    plays = load_plays(warehouse, columns=["file", "username", "play", "card_name"])
+    plays = plays[plays["file"].isin(df["file"])]
+    print("Plays seen (unique):", list(pd.unique(plays["play"].astype(object))))
+    used = plays.dropna(subset=["card_name"])
+    usage_records = zip(*(used[c].astype(object) for c in ("file", "username", "play", "card_name")))
+    return df, build_card_index(usage_records)
 
-    return df
+
+def swap_provider_to_player1(df: pd.DataFrame, data_provider_username: str | None) -> None:
+    if data_provider_username and len(df):
+        # Ensure the data provider is always in player1
+        swap = df["player2"] == data_provider_username
+        for a, b in (("player1", "player2"), ("starting_hand_player1", "starting_hand_player2")):
+            df.loc[swap, [a, b]] = df.loc[swap, [b, a]].to_numpy()
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -121,9 +389,71 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--replays-dir", type=Path, default=Path("data/db_replays"))
     parser.add_argument("--out", type=Path, default=Path("data/matches_data_Fryderyk Chopin.csv"))
     parser.add_argument("--provider", type=str, default="Fryderyk Chopin")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse replays (0 = one per CPU). Output is identical to the serial run.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Decode plays incrementally and stop reading each replay once its row is complete (skips the plays summary).",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help="Replay manifest caching extracted rows (default: <replays-dir>_manifest.json next to the replays dir).",
+    )
+    parser.add_argument("--no-manifest", action="store_true", help="Do not read or write the replay manifest.")
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Ignore the existing manifest and re-parse every replay (the manifest is rewritten).",
+    )
+    parser.add_argument(
+        "--warehouse",
+        type=Path,
+        default=None,
+        help="Read matches from a Parquet warehouse built by replay_warehouse.py instead of --replays-dir.",
+    )
+    parser.add_argument(
+        "--card-index",
+        type=Path,
+        default=None,
+        help="Where to write the card-usage index (default: <out>_card_usage.csv).",
+    )
+    parser.add_argument(
+        "--keep-duplicates",
+        action="store_true",
+        help="Keep replays whose plays duplicate another replay (by default one row per duel is kept).",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=NEAR_DUPLICATE_THRESHOLD,
+        help="Estimated play similarity from which two replays count as the same duel (0 = exact copies only).",
+    )
+    add_profile_arguments(parser)
     args = parser.parse_args(argv)
+    profiler = profiler_from_args(args, "get_csv_from_json")
 
-    df = build_matches_dataframe(args.replays_dir, data_provider_username=args.provider)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    manifest_path = None if args.no_manifest else (args.manifest or default_manifest_path(args.replays_dir))
+    with profiler.stage("build_matches"):
+        df, card_index = build_matches_and_card_index(
+            args.replays_dir,
+            data_provider_username=args.provider,
+            workers=workers,
+            stream=args.stream,
+            manifest_path=manifest_path,
+            full_rebuild=args.full_rebuild,
+            warehouse=args.warehouse,
+            dedup=not args.keep_duplicates,
+            near_duplicate_threshold=args.near_duplicate_threshold,
+            profiler=profiler,
+        )
 
     print("=" * 60)
     print(f"DataFrame créé avec {len(df)} matches")
@@ -135,8 +465,18 @@ def main(argv: list[str] | None = None) -> int:
 
     out = args.out
     out.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(out, index=False)
-    print(f"✅ DataFrame sauvegardé dans: {out}")
+    with profiler.stage("write"):
+        df.to_csv(out, index=False)
+        print(f"✅ DataFrame sauvegardé dans: {out}")
+
+        if card_index is not None:
+            index_path = save_card_index(
+                card_index, args.card_index or default_card_index_path(out), matches_files=df["file"]
+            )
+            print(f"✅ Index d'utilisation des cartes sauvegardé dans: {index_path} (rows={len(card_index)})")
+        else:
+            print("⚠️  Mode --stream: index d'utilisation des cartes non construit")
+    profiler.write()
     return 0
 
 
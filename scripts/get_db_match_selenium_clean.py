@@ -6,14 +6,24 @@ Utilise Selenium pour obtenir un token reCAPTCHA valide automatiquement.
 from __future__ import annotations
 
 import argparse
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Callable, Iterable, Iterator
 from urllib.parse import parse_qs, urlparse
 from urllib.parse import urlparse as _urlparse
 
 import json
 import sys
 
+from pipeline_profiling import add_profile_arguments, profiler_from_args
+from replay_dedup import KnownContent
+from replay_io import COMPRESSIONS, replay_path, resolve_replay, save_replay
+from replay_manifest import ReplayManifest, default_manifest_path
+from scrape_journal import DEFAULT_LEASE_S, DEFAULT_MAX_ATTEMPTS, ScrapeJournal, default_journal_path
+
 DEFAULT_OUT_DIR = Path("data/db_replays")
 DEFAULT_TRY_IT_YOURSELF_LINKS = Path("data/empty_match_data.csv")
 DEFAULT_TRY_IT_YOURSELF_REPLAYS_DIR = Path("data/my_own_db_replays")
@@ -75,15 +85,46 @@ def get_replay_id(url_or_id: str) -> str:
         return f"{replay_id}_match{match}"
     return replay_id
 
-def get_recaptcha_token_and_cookies_with_selenium(
-    replay_url: str,
-    *,
-    profile_dir: str | None = None,
-    action_name: str = "submit",
-):
+
+DUELINGBOOK_URL = "https://www.duelingbook.com"
+# DuelingBook may validate the reCAPTCHA "action" server-side, so retries try a few common ones.
+RECAPTCHA_ACTIONS = ("submit", "replay", "view_replay", "view-replay", "viewreplay", "view")
+RECAPTCHA_FALLBACK_SITEKEY = "6LcjdkEgAAAAAKoEsPnPbSdjLkf4bLx68445txKj"
+# A pooled browser is restarted after this many consecutive "Invalid Token" answers
+DEFAULT_MAX_TOKEN_FAILURES = 3
+
+_MINT_TOKEN_JS = """
+    var callback = arguments[arguments.length - 1];
+    var siteKey = arguments[0];
+    var mode = arguments[1];
+    var actionName = arguments[2];
+
+    if (typeof grecaptcha === 'undefined') {
+        callback(null);
+        return;
+    }
+
+    function exec() {
+        var api = grecaptcha;
+        if (mode === 'enterprise' && grecaptcha.enterprise) {
+            api = grecaptcha.enterprise;
+        }
+        api.execute(siteKey, {action: actionName})
+          .then(function(token) { callback(token); })
+          .catch(function(error) { callback(null); });
+    }
+
+    if (grecaptcha.ready) {
+        grecaptcha.ready(exec);
+    } else {
+        exec();
+    }
+"""
+
+
+def _start_chrome(profile_dir: str | None = None, *, headless: bool = False):
     try:
         from selenium import webdriver
-        from selenium.webdriver.support.ui import WebDriverWait
         from selenium.webdriver.chrome.service import Service
         from selenium.webdriver.chrome.options import Options
     except ImportError as e:
@@ -91,9 +132,6 @@ def get_recaptcha_token_and_cookies_with_selenium(
             "Selenium is not installed."
         ) from e
 
-    # Utilise Selenium pour obtenir un token reCAPTCHA ET les cookies de session.
-    # Returns: Tuple (token, selenium_cookies_list)
-    
     # Configuration Chrome
     chrome_options = Options()
     chrome_options.add_argument('--no-sandbox')
@@ -103,10 +141,12 @@ def get_recaptcha_token_and_cookies_with_selenium(
     chrome_options.add_experimental_option('useAutomationExtension', False)
     if profile_dir:
         chrome_options.add_argument('--user-data-dir=' + str(profile_dir))
-    
+    if headless:
+        chrome_options.add_argument('--headless=new')
+
     # Creer le driver
     try:
-        driver = webdriver.Chrome(options=chrome_options)
+        return webdriver.Chrome(options=chrome_options)
     except Exception:
         # Essayer avec webdriver-manager
         try:
@@ -118,107 +158,228 @@ def get_recaptcha_token_and_cookies_with_selenium(
         service = Service(ChromeDriverManager().install())
         driver = webdriver.Chrome(service=service, options=chrome_options)
         print("ChromeDriver installe automatiquement via webdriver-manager")
+        return driver
 
-    def _detect_site_key_and_mode() -> tuple[str | None, str]:
-        """
-        Try to detect the reCAPTCHA sitekey from script tags.
-        Returns (sitekey, mode) where mode is 'enterprise' or 'standard'.
-        """
-        try:
-            srcs = driver.execute_script(
-                "return Array.from(document.querySelectorAll('script[src]')).map(s => s.src);"
-            )
-        except Exception:
-            srcs = []
 
-        sitekey: str | None = None
-        mode = "standard"
-        if isinstance(srcs, list):
-            for src in srcs:
-                if not isinstance(src, str):
-                    continue
-                if "recaptcha/enterprise.js" in src:
-                    mode = "enterprise"
-                if "recaptcha/api.js" in src or "recaptcha/enterprise.js" in src:
-                    try:
-                        qs = parse_qs(_urlparse(src).query)
-                        render = (qs.get("render") or [None])[0]
-                        if isinstance(render, str) and render.strip():
-                            sitekey = render.strip()
-                    except Exception:
-                        pass
-        return sitekey, mode
+def _detect_site_key_and_mode(driver) -> tuple[str | None, str]:
+    """
+    Try to detect the reCAPTCHA sitekey from script tags.
+    Returns (sitekey, mode) where mode is 'enterprise' or 'standard'.
+    """
+    try:
+        srcs = driver.execute_script(
+            "return Array.from(document.querySelectorAll('script[src]')).map(s => s.src);"
+        )
+    except Exception:
+        srcs = []
+
+    sitekey: str | None = None
+    mode = "standard"
+    if isinstance(srcs, list):
+        for src in srcs:
+            if not isinstance(src, str):
+                continue
+            if "recaptcha/enterprise.js" in src:
+                mode = "enterprise"
+            if "recaptcha/api.js" in src or "recaptcha/enterprise.js" in src:
+                try:
+                    qs = parse_qs(_urlparse(src).query)
+                    render = (qs.get("render") or [None])[0]
+                    if isinstance(render, str) and render.strip():
+                        sitekey = render.strip()
+                except Exception:
+                    pass
+    return sitekey, mode
+
+
+def _load_recaptcha_page(driver, replay_url: str) -> tuple[str | None, str]:
+    """Open a replay page and wait for grecaptcha; returns (sitekey, mode)."""
+    from selenium.webdriver.support.ui import WebDriverWait
 
     try:
-        try:
-            driver.get("https://www.duelingbook.com/")  # Aller sur la home
-        except Exception as e:
-            print("ATTENTION: Probleme lors de la connexion: " + str(e))
+        driver.get("https://www.duelingbook.com/")  # Aller sur la home
+    except Exception as e:
+        print("ATTENTION: Probleme lors de la connexion: " + str(e))
 
-        driver.get(replay_url) # Charger la page de replay
-        
-        print("Attente du chargement de reCAPTCHA...")
-        WebDriverWait(driver, 20).until(
-            lambda d: d.execute_script("return (typeof grecaptcha !== 'undefined') || (typeof grecaptcha !== 'undefined' && grecaptcha.enterprise)")
-        )
+    driver.get(replay_url) # Charger la page de replay
 
-        sitekey, mode = _detect_site_key_and_mode()
-        if sitekey:
-            print(f"Sitekey détectée: {sitekey} (mode={mode})")
-        else:
-            print("Sitekey non détectée; fallback sur la clé hardcodée.")
-        
-        # Obtenir le token
-        token = driver.execute_async_script("""
-            var callback = arguments[arguments.length - 1];
-            var siteKey = arguments[0];
-            var mode = arguments[1];
-            var actionName = arguments[2];
-            
-            if (typeof grecaptcha === 'undefined') {
-                callback(null);
-                return;
-            }
-            
-            function exec() {
-                var api = grecaptcha;
-                if (mode === 'enterprise' && grecaptcha.enterprise) {
-                    api = grecaptcha.enterprise;
-                }
-                api.execute(siteKey, {action: actionName})
-                  .then(function(token) { callback(token); })
-                  .catch(function(error) { callback(null); });
-            }
-
-            if (grecaptcha.ready) {
-                grecaptcha.ready(exec);
-            } else {
-                exec();
-            }
-        """, sitekey or "6LcjdkEgAAAAAKoEsPnPbSdjLkf4bLx68445txKj", mode, action_name)
-        
-        # Recuperer les cookies
-        cookies = driver.get_cookies()
+    print("Attente du chargement de reCAPTCHA...")
+    WebDriverWait(driver, 20).until(
+        lambda d: d.execute_script("return (typeof grecaptcha !== 'undefined') || (typeof grecaptcha !== 'undefined' && grecaptcha.enterprise)")
+    )
+
+    sitekey, mode = _detect_site_key_and_mode(driver)
+    if sitekey:
+        print(f"Sitekey détectée: {sitekey} (mode={mode})")
+    else:
+        print("Sitekey non détectée; fallback sur la clé hardcodée.")
+    return sitekey, mode
+
+
+def _mint_token_and_cookies(driver, sitekey: str | None, mode: str, action_name: str):
+    # Obtenir le token
+    token = driver.execute_async_script(_MINT_TOKEN_JS, sitekey or RECAPTCHA_FALLBACK_SITEKEY, mode, action_name)
+
+    # Recuperer les cookies
+    cookies = driver.get_cookies()
+    try:
+        cookie_names = [c.get("name") for c in cookies if isinstance(c, dict)]
+        print("Cookies: " + ", ".join([str(n) for n in cookie_names if n]))
+    except Exception:
+        pass
+
+    if token and len(token) > 50:
+        print("Token reCAPTCHA obtenu! (longueur: " + str(len(token)) + ")")
+        print("Cookies recuperes: " + str(len(cookies)) + " cookies")
+        print(f"Action reCAPTCHA utilisée: {action_name}")
+        return token, cookies
+    raise Exception("Impossible d'obtenir un token reCAPTCHA valide.")
+
+
+def get_recaptcha_token_and_cookies_with_selenium(
+    replay_url: str,
+    *,
+    profile_dir: str | None = None,
+    action_name: str = "submit",
+):
+    # Utilise Selenium pour obtenir un token reCAPTCHA ET les cookies de session.
+    # Returns: Tuple (token, selenium_cookies_list)
+    # Starts (and quits) a browser for this one token; see BrowserSession to keep one open.
+    driver = _start_chrome(profile_dir)
+    try:
+        sitekey, mode = _load_recaptcha_page(driver, replay_url)
+        return _mint_token_and_cookies(driver, sitekey, mode, action_name)
+    finally:
         try:
-            cookie_names = [c.get("name") for c in cookies if isinstance(c, dict)]
-            print("Cookies: " + ", ".join([str(n) for n in cookie_names if n]))
+            driver.quit() # Fermer le navigateur
         except Exception:
             pass
-        
-        if token and len(token) > 50:
-            print("Token reCAPTCHA obtenu! (longueur: " + str(len(token)) + ")")
-            print("Cookies recuperes: " + str(len(cookies)) + " cookies")
+
+
+class BrowserSession:
+    """
+    Long-lived Chrome (optionally headless) that mints reCAPTCHA tokens on demand.
+
+    The replay page (and grecaptcha) is loaded once when the browser starts; every later token is a
+    grecaptcha.execute() call in the same page, and the cookies of the session are reused across
+    replays. The browser is restarted only after max_token_failures consecutive "Invalid Token"
+    answers, or when the driver itself fails.
+    """
+
+    def __init__(
+        self,
+        *,
+        profile_dir: str | None = None,
+        headless: bool = False,
+        max_token_failures: int = DEFAULT_MAX_TOKEN_FAILURES,
+    ):
+        self.profile_dir = profile_dir
+        self.headless = headless
+        self.max_token_failures = max(1, max_token_failures)
+        self.starts = 0
+        self.tokens = 0
+        self._driver = None
+        self._sitekey: str | None = None
+        self._mode = "standard"
+        self._token_failures = 0
+        # Held while the browser is used: the async fetcher reports token feedback from other threads
+        self._lock = threading.RLock()
+
+    def _start(self, replay_url: str) -> None:
+        self.close()
+        self._driver = _start_chrome(self.profile_dir, headless=self.headless)
+        self.starts += 1
+        self._token_failures = 0
+        self._sitekey, self._mode = _load_recaptcha_page(self._driver, replay_url)
+
+    def token_and_cookies(self, replay_url: str, *, action_name: str = "submit"):
+        with self._lock:
+            if self._driver is None:
+                self._start(replay_url)
             try:
-                print(f"Action reCAPTCHA utilisée: {action_name}")
+                result = _mint_token_and_cookies(self._driver, self._sitekey, self._mode, action_name)
             except Exception:
-                pass
-            return token, cookies
-        raise Exception("Impossible d'obtenir un token reCAPTCHA valide.")
-    finally:
+                # Dead driver or page in a bad state: one fresh browser, then give up
+                print("ATTENTION: Session navigateur invalide, redemarrage...")
+                self._start(replay_url)
+                result = _mint_token_and_cookies(self._driver, self._sitekey, self._mode, action_name)
+            self.tokens += 1
+            return result
+
+    def token_accepted(self) -> None:
+        with self._lock:
+            self._token_failures = 0
+
+    def token_rejected(self) -> None:
+        with self._lock:
+            self._token_failures += 1
+            if self._token_failures >= self.max_token_failures:
+                print("ATTENTION: Tokens refuses a repetition, redemarrage du navigateur au prochain token.")
+                self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._driver is not None:
+                try:
+                    self._driver.quit() # Fermer le navigateur
+                except Exception:
+                    pass
+                self._driver = None
+
+
+class BrowserSessionPool:
+    """
+    Fixed set of BrowserSession objects shared by the scraping threads; acquire() lends one session to
+    one thread at a time (Selenium drivers are not thread-safe). Browsers start lazily on first use.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        *,
+        profile_dir: str | None = None,
+        headless: bool = False,
+        max_token_failures: int = DEFAULT_MAX_TOKEN_FAILURES,
+    ):
+        if profile_dir and size > 1:
+            # Chrome locks its user-data-dir: a logged-in profile can only back one browser
+            print("⚠️  --profile-dir given: using a single browser session")
+            size = 1
+        self.sessions = [
+            BrowserSession(profile_dir=profile_dir, headless=headless, max_token_failures=max_token_failures)
+            for _ in range(max(1, size))
+        ]
+        self._idle: queue.Queue[BrowserSession] = queue.Queue()
+        for session in self.sessions:
+            self._idle.put(session)
+
+    @property
+    def size(self) -> int:
+        return len(self.sessions)
+
+    @contextmanager
+    def acquire(self) -> Iterator[BrowserSession]:
+        session = self._idle.get()
         try:
-            driver.quit() # Fermer le navigateur
-        except Exception:
-            pass
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def mint(self, replay_url: str, action_name: str) -> tuple[str, list[dict], BrowserSession]:
+        """Token and cookies from the next idle session, which is returned for token_accepted / token_rejected."""
+        with self.acquire() as session:
+            token, cookies = session.token_and_cookies(replay_url, action_name=action_name)
+        return token, cookies, session
+
+    def close(self) -> None:
+        for session in self.sessions:
+            session.close()
+
+    def __enter__(self) -> BrowserSessionPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
 
 def normalize_replay_url(url_or_id: str, *, strip_user_prefix: bool = True) -> str:
@@ -247,78 +408,99 @@ def normalize_replay_url(url_or_id: str, *, strip_user_prefix: bool = True) -> s
     return "https://www.duelingbook.com/replay?id=" + s
 
 
-def get_match_data(url_id: str, *, profile_dir: str | None = None): # returns json containing match data
-    try:
-        import requests
-    except ImportError as e:
-        raise RuntimeError(
-            "requests is not installed. Install dependencies with: pip install -r requirements.txt"
-        ) from e
-    
+def build_api_request(url_id: str, *, api_base: str = DUELINGBOOK_URL) -> tuple[str, dict[str, str]]:
+    """URL and headers of the replay API POST; api_base can point at a local stand-in server."""
     replay_id, match = _parse_replay_id_and_match(url_id)
-    url = "https://www.duelingbook.com/view-replay?id=" + replay_id
+    url = api_base.rstrip("/") + "/view-replay?id=" + replay_id
     if match:
         url += "&match=" + match
 
-    
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Accept": "application/json",
         "Content-Type": "application/x-www-form-urlencoded",
-        "Origin": "https://www.duelingbook.com",
+        "Origin": DUELINGBOOK_URL,
         "Referer": url_id,
     }
+    return url, headers
+
+
+def api_form_data(token: str) -> dict[str, str]:
+    # Donnees du formulaire
+    return {"token": token, "recaptcha_version": "3", "master": "2"}
+
+
+def add_selenium_cookies(jar, cookies_list: list[dict]) -> None:
+    """Copy cookies returned by driver.get_cookies() into a requests cookie jar."""
+    for c in cookies_list:
+        try:
+            name = c.get('name')
+            value = c.get('value')
+            domain = c.get('domain') or 'www.duelingbook.com'
+            path = c.get('path') or '/'
+            if name and value is not None:
+                jar.set(name, value, domain=domain, path=path)
+        except Exception:
+            pass
+
+
+def get_match_data(
+    url_id: str, *, profile_dir: str | None = None, browser: BrowserSession | None = None
+): # returns json containing match data
+    # browser: reuse a long-lived session for the tokens instead of starting Chrome for each one
+    try:
+        import requests
+    except ImportError as e:
+        raise RuntimeError(
+            "requests is not installed. Install dependencies with: pip install -r requirements.txt"
+        ) from e
     
+    replay_id, match = _parse_replay_id_and_match(url_id)
+    url, headers = build_api_request(url_id)
+
     print("Requete a l'API DuelingBook...")
     print("URL: " + url)
     print("Replay ID: " + replay_id + (f" (match={match})" if match else ""))
     
     
     def _post_with_token(token: str, cookies_list: list[dict] | None):
-        # Donnees du formulaire
-        form_data = {"token": token, "recaptcha_version": "3", "master": "2"}
-
         # Creer une session pour utiliser les cookies
         session = requests.Session()
 
         # Ajouter les cookies si disponibles
         if cookies_list:  # cookies is a list
-            for c in cookies_list:
-                try:
-                    name = c.get('name')
-                    value = c.get('value')
-                    domain = c.get('domain') or 'www.duelingbook.com'
-                    path = c.get('path') or '/'
-                    if name and value is not None:
-                        session.cookies.set(name, value, domain=domain, path=path)
-                except Exception:
-                    pass
+            add_selenium_cookies(session.cookies, cookies_list)
             print("Cookies de session ajoutes (" + str(len(cookies_list)) + " cookies)")
 
         # Faire la requete POST avec headers et cookies
-        response = session.post(url, data=form_data, headers=headers, timeout=30)
+        response = session.post(url, data=api_form_data(token), headers=headers, timeout=30)
         response.raise_for_status()
         return response.json()
 
     try:
         # Obtenir le token reCAPTCHA et les cookies (with retries on Invalid Token)
-        # DuelingBook may validate the reCAPTCHA "action" server-side, so try a few common ones.
-        action_candidates = ["submit", "replay", "view_replay", "view-replay", "viewreplay", "view"]
         for attempt in range(6):
-            action_name = action_candidates[min(attempt, len(action_candidates) - 1)]
-            recaptcha_token, cookies = get_recaptcha_token_and_cookies_with_selenium(
-                url_id,
-                profile_dir=profile_dir,
-                action_name=action_name,
-            )
+            action_name = RECAPTCHA_ACTIONS[min(attempt, len(RECAPTCHA_ACTIONS) - 1)]
+            if browser is not None:
+                recaptcha_token, cookies = browser.token_and_cookies(url_id, action_name=action_name)
+            else:
+                recaptcha_token, cookies = get_recaptcha_token_and_cookies_with_selenium(
+                    url_id,
+                    profile_dir=profile_dir,
+                    action_name=action_name,
+                )
             data = _post_with_token(recaptcha_token, cookies)
 
             if data.get("action") != "Error":
+                if browser is not None:
+                    browser.token_accepted()
                 return data
 
             error_msg = data.get("message", "Erreur inconnue")
             if isinstance(error_msg, str) and "invalid token" in error_msg.lower():
                 print("ATTENTION: Token invalide (reCAPTCHA). Nouvelle tentative...")
+                if browser is not None:
+                    browser.token_rejected()
                 continue
 
             if isinstance(error_msg, str) and "logged in" in error_msg.lower():
@@ -434,21 +616,158 @@ def scrape_one(
     out_dir: Path,
     profile_dir: str | None = None,
     strip_user_prefix: bool = True,
+    browser_pool: BrowserSessionPool | None = None,
+    journal: ScrapeJournal | None = None,
+    compression: str = "json",
+    known_content: KnownContent | None = None,
 ) -> int:
+    replay_id = None
     try:
         replay_url = normalize_replay_url(db_link, strip_user_prefix=strip_user_prefix)
-        match_data = get_match_data(url_id=replay_url, profile_dir=profile_dir)
-        out_dir = out_dir.expanduser().resolve()
-        out_dir.mkdir(parents=True, exist_ok=True)
-        out_path = out_dir / (get_replay_id(replay_url) + ".json")
-        print("OK: JSON sauvegarde -> " + save_json(match_data, str(out_path)))
+        replay_id = get_replay_id(replay_url)
+        if browser_pool is None:
+            match_data = get_match_data(url_id=replay_url, profile_dir=profile_dir)
+        else:
+            with browser_pool.acquire() as browser:
+                match_data = get_match_data(url_id=replay_url, browser=browser)
+        if known_content is not None:
+            duplicate_of = known_content.claim(f"{replay_id}.json", match_data.get("plays") or [])
+            if duplicate_of is not None:
+                print(f"Doublon: {replay_id} a les memes plays que {duplicate_of} - non sauvegarde")
+                if journal is not None:
+                    journal.mark_duplicate(replay_id, duplicate_of)
+                return 0
+        try:
+            out_dir = out_dir.expanduser().resolve()
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out_path = save_replay(match_data, replay_path(out_dir, replay_id, compression))
+        except BaseException:
+            # Not saved: a later copy of the same plays must not be skipped as a duplicate of this one
+            if known_content is not None:
+                known_content.release(f"{replay_id}.json", match_data.get("plays") or [])
+            raise
+        print("OK: JSON sauvegarde -> " + str(out_path))
+        if journal is not None:
+            journal.mark_done(replay_id)
         return 0
     except Exception as e:
         print("")
         print("Erreur: " + str(e))
+        if journal is not None and replay_id is not None:
+            journal.mark_error(replay_id, str(e))
         return 1
 
 
+def replay_output_id(db_link: str, *, strip_user_prefix: bool = True) -> str | None:
+    """Replay id naming the output file (<id>.json[.gz|.zst]) of a link; None if the link cannot be parsed."""
+    try:
+        return get_replay_id(normalize_replay_url(db_link, strip_user_prefix=strip_user_prefix))
+    except ValueError:
+        return None
+
+
+def map_threads(fn: Callable[[Any], Any], items: Iterable[Any], n_threads: int) -> list[Any]:
+    """
+    fn over items with n_threads threads, results in item order. Items are taken from the iterable
+    only when a thread is free, so a lazy source (journal claims) is not drained up front.
+    An exception raised by fn for one item does not stop the others; one raised by the iterable stops
+    taking items. Either is re-raised once every thread is done (the iterable's first, else the one of
+    the first failing item).
+    """
+    iterator = iter(enumerate(items))
+    lock = threading.Lock()
+    results: dict[int, Any] = {}
+    errors: dict[int, BaseException] = {}  # item index -> exception raised by fn
+    source_errors: list[BaseException] = []  # exception raised by the iterable
+
+    def _drain() -> None:
+        while True:
+            with lock:
+                if source_errors:
+                    return
+                try:
+                    entry = next(iterator, None)
+                except BaseException as e:
+                    source_errors.append(e)
+                    return
+            if entry is None:
+                return
+            try:
+                results[entry[0]] = fn(entry[1])
+            except BaseException as e:
+                errors[entry[0]] = e
+
+    threads = [threading.Thread(target=_drain) for _ in range(max(1, n_threads))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if source_errors:
+        raise source_errors[0]
+    if errors:
+        raise errors[min(errors)]
+    return [results[i] for i in range(len(results))]
+
+
+def scrape_async(
+    links: Iterable[str],
+    args: argparse.Namespace,
+    profiler,
+    *,
+    journal: ScrapeJournal | None = None,
+    known_content: KnownContent | None = None,
+) -> list[int]:
+    """--async: concurrent fetch with rate limiting and backoff; one return code per link (0 = saved or known)."""
+    from async_replay_fetcher import AsyncReplayFetcher, StaticTokenSource
+
+    browser_pool = None
+    if args.static_token:
+        token_source = StaticTokenSource(args.static_token)
+    else:
+        browser_pool = BrowserSessionPool(
+            max(1, args.browser_sessions),
+            profile_dir=args.profile_dir,
+            headless=args.headless,
+            max_token_failures=args.max_token_failures,
+        )
+        token_source = browser_pool
+    fetcher = AsyncReplayFetcher(
+        token_source,
+        api_base=args.api_base,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        max_attempts=args.max_attempts,
+        strip_user_prefix=not args.keep_user_prefix,
+        compression=args.compression,
+        known_content=known_content,
+    )
+    def _record(result) -> None:
+        if journal is not None and result.replay_id is not None:
+            if result.duplicate_of is not None:
+                journal.mark_duplicate(result.replay_id, result.duplicate_of)
+            elif result.ok:
+                journal.mark_done(result.replay_id)
+            else:
+                journal.mark_error(result.replay_id, result.error)
+
+    try:
+        results = fetcher.run(links, args.out_dir, on_result=_record)
+    finally:
+        fetcher.close()
+        if browser_pool is not None:
+            browser_pool.close()
+    for r in results:
+        profiler.record_file(r.link, r.seconds)
+    retries = sum(max(0, r.attempts - 1) for r in results if r.ok)
+    duplicates = sum(r.duplicate_of is not None for r in results)
+    print(
+        f"Async fetch: {sum(r.ok for r in results) - duplicates}/{len(results)} saved, "
+        f"{duplicates} already in the archive, {retries} retried attempt(s)"
+    )
+    return [0 if r.ok else 1 for r in results]
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(
         description="Fetch DuelingBook replay JSONs using Selenium (reCAPTCHA v3) and save them locally."
@@ -475,6 +794,86 @@ def main(argv: list[str] | None = None) -> int:
         default=None,
         help="Optional Chrome user-data-dir (NOT COMMITTED). Helps if some replays require login.",
     )
+    parser.add_argument(
+        "--browser-sessions",
+        type=int,
+        default=0,
+        help="Keep N long-lived browsers that mint tokens on demand and scrape N replays at a time "
+        "(default 0: start a new browser for every token)",
+    )
+    parser.add_argument("--headless", action="store_true", help="Run the browsers headless")
+    parser.add_argument(
+        "--max-token-failures",
+        type=int,
+        default=DEFAULT_MAX_TOKEN_FAILURES,
+        help="Restart a pooled browser after this many consecutive invalid tokens",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_fetch",
+        action="store_true",
+        help="Fetch replays concurrently (shared HTTP connection pool, rate limit, backoff with jitter); "
+        "tokens come from --browser-sessions browsers (at least 1)",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Replays in flight at once (--async)")
+    parser.add_argument("--rate", type=float, default=2.0, help="API requests per second, 0 = no limit (--async)")
+    parser.add_argument("--burst", type=int, default=2, help="Requests allowed at once by the rate limiter (--async)")
+    parser.add_argument("--max-attempts", type=int, default=6, help="Attempts per replay (--async)")
+    parser.add_argument(
+        "--api-base",
+        type=str,
+        default=DUELINGBOOK_URL,
+        help="Replay API base URL (--async), e.g. a local replay_api_stub.py server",
+    )
+    parser.add_argument(
+        "--static-token",
+        type=str,
+        default=None,
+        help="Send this token instead of minting reCAPTCHA tokens (--async against a stand-in server only)",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Fetch replays again even if <out-dir>/<replay_id>.json already exists",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSIONS,
+        default="json",
+        help="Storage format of the saved replays: indented JSON, or compact JSON in gzip / zstd (~10x smaller)",
+    )
+    parser.add_argument(
+        "--keep-duplicates",
+        action="store_true",
+        help="Save replays even when the same plays are already in --out-dir (by default, replays known from "
+        "the replay manifest of --out-dir or saved earlier in the run are not saved again)",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        nargs="?",
+        const=True,
+        default=None,
+        help="Track every link in a SQLite job journal (default: data/scrape_journal.sqlite): reruns skip done "
+        "replays and retry retriable failures; several processes can drain the same journal",
+    )
+    parser.add_argument(
+        "--journal-max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help="Runs that may try a replay before its failure is final (--journal)",
+    )
+    parser.add_argument(
+        "--journal-lease",
+        type=float,
+        default=DEFAULT_LEASE_S,
+        help="Seconds before a replay claimed by a worker that died can be taken over (--journal)",
+    )
+    parser.add_argument(
+        "--retry-needs-login",
+        action="store_true",
+        help="Put replays recorded as needing a login back in the queue (e.g. with --profile-dir) (--journal)",
+    )
     parser.add_argument(
         "--keep-user-prefix",
         action="store_true",
@@ -508,7 +907,9 @@ def main(argv: list[str] | None = None) -> int:
         default=DEFAULT_TRY_IT_YOURSELF_FEATURES_CSV,
         help="Where to write the built features CSV (only used with --run-ml / --try-it-yourself).",
     )
+    add_profile_arguments(parser)
     args = parser.parse_args(argv)
+    profiler = profiler_from_args(args, "get_db_match_selenium_clean")
 
     # Resolve preset mode
     if args.try_it_yourself:
@@ -519,31 +920,119 @@ def main(argv: list[str] | None = None) -> int:
     if not (args.replay or args.links_file):
         parser.error("one of the arguments --replay --links-file is required (or use --try-it-yourself)")
 
-    links: Iterable[str]
+    links: list[str]
     if args.replay:
         links = [args.replay]
     else:
         links = read_links_from_file(args.links_file)
 
-    failures = 0
-    successes = 0
-    for link in links:
-        rc = scrape_one(
-            link,
-            out_dir=args.out_dir,
-            profile_dir=args.profile_dir,
-            strip_user_prefix=not args.keep_user_prefix,
+    strip_user_prefix = not args.keep_user_prefix
+    out_dir = args.out_dir.expanduser().resolve()
+    journal = None
+    already_saved = 0
+    if args.journal is not None:
+        journal = ScrapeJournal(
+            default_journal_path() if args.journal is True else args.journal,
+            lease_s=args.journal_lease,
+            max_attempts=args.journal_max_attempts,
         )
-        if rc == 0:
-            successes += 1
+        jobs = []
+        for link in links:
+            replay_id = replay_output_id(link, strip_user_prefix=strip_user_prefix)
+            if replay_id is None:
+                print(f"⚠️  Skipping unparsable link: {link}")
+            else:
+                jobs.append((replay_id, link))
+        added = journal.add(jobs, out_dir=None if args.overwrite else out_dir)
+        if args.overwrite:
+            journal.requeue(["done", "duplicate"], replay_ids=[replay_id for replay_id, _ in jobs])
+        if args.retry_needs_login:
+            journal.requeue(["needs_login"])
+        counts = journal.counts()
+        print(f"Journal {journal.path}: {added} new job(s); " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+        # Links are claimed one at a time as workers free up; `names` fills in as they are claimed
+        names: list[str] = []
+        todo: Iterable[str] = journal.iter_claims(names)
+    else:
+        todo = links
+        if not args.overwrite:
+            todo = [
+                link
+                for link in links
+                if resolve_replay(out_dir, f"{replay_output_id(link, strip_user_prefix=strip_user_prefix)}.json")
+                is None
+            ]
+            already_saved = len(links) - len(todo)
+            if already_saved:
+                print(f"Skipping {already_saved} replay(s) already saved in {out_dir} (--overwrite to fetch again)")
+        names = todo
+
+    known_content = None
+    if not args.keep_duplicates:
+        known_content = KnownContent.from_manifest(ReplayManifest.load(default_manifest_path(out_dir)))
+        if len(known_content):
+            print(f"{len(known_content)} replay(s) of the archive known from its manifest: duplicates are not saved")
+
+    # Per-replay times are reported as the "files" of the profile
+    with profiler.stage("scrape"):
+        if args.async_fetch:
+            return_codes = scrape_async(todo, args, profiler, journal=journal, known_content=known_content)
+        elif args.browser_sessions > 0:
+            with BrowserSessionPool(
+                args.browser_sessions,
+                profile_dir=args.profile_dir,
+                headless=args.headless,
+                max_token_failures=args.max_token_failures,
+            ) as browser_pool:
+                return_codes = profiler.map_timed(
+                    partial(
+                        scrape_one,
+                        out_dir=args.out_dir,
+                        strip_user_prefix=strip_user_prefix,
+                        browser_pool=browser_pool,
+                        journal=journal,
+                        compression=args.compression,
+                        known_content=known_content,
+                    ),
+                    todo,
+                    lambda fn, items: map_threads(fn, items, browser_pool.size),
+                    names=names,
+                )
+            starts = sum(session.starts for session in browser_pool.sessions)
+            tokens = sum(session.tokens for session in browser_pool.sessions)
+            print(f"Browser sessions: {starts} start(s) for {tokens} token(s)")
         else:
-            failures += 1
+            return_codes = profiler.map_timed(
+                partial(
+                    scrape_one,
+                    out_dir=args.out_dir,
+                    profile_dir=args.profile_dir,
+                    strip_user_prefix=strip_user_prefix,
+                    journal=journal,
+                    compression=args.compression,
+                    known_content=known_content,
+                ),
+                todo,
+                lambda fn, items: [fn(item) for item in items],
+                names=names,
+            )
+    successes = sum(1 for rc in return_codes if rc == 0) + already_saved
+    failures = len(return_codes) - sum(1 for rc in return_codes if rc == 0)
+    if journal is not None:
+        counts = journal.counts()
+        print("Journal: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+        for replay_id, state, error in journal.failures()[:20]:
+            print(f"  - {replay_id} [{state}]: {error}")
+        # Replays saved by earlier runs (or other workers) count for --run-ml too
+        successes = counts["done"]
 
     if failures:
         print(f"Done with {failures} failure(s).")
         if not args.continue_on_failure and not args.run_ml:
+            profiler.write()
             return 1
         if not args.continue_on_failure and args.run_ml and successes == 0:
+            profiler.write()
             return 1
 
     if failures == 0:
@@ -555,44 +1044,38 @@ def main(argv: list[str] | None = None) -> int:
     if args.run_ml:
         if successes == 0:
             print("No replay JSONs were saved successfully; skipping ML.")
+            profiler.write()
             return 1
         try:
-            from get_csv_from_json import build_matches_dataframe
-            from ML_for_YGO import build_features, load_dataset, train_and_score_models
+            from pipeline import run_pipeline
         except Exception as e:
             raise RuntimeError(
-                "Unable to import pipeline modules (get_csv_from_json / ML_for_YGO). "
+                "Unable to import pipeline modules (pipeline / get_csv_from_json / DataProcessing_for_YGO). "
                 "Make sure you're running from the repo and dependencies are installed."
             ) from e
 
-        replays_dir = args.out_dir.expanduser().resolve()
-        df = build_matches_dataframe(replays_dir, data_provider_username=args.provider)
-        args.matches_csv.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(args.matches_csv, index=False)
-        print(f"✅ Matches CSV saved to: {args.matches_csv} (rows={len(df)})")
-
-        dataset = load_dataset(args.matches_csv)
-
+        # Stages are chained in memory; the matches and features CSVs are side outputs.
         # In try-it-yourself mode, we want this to work on arbitrary replays, so we disable
-        # the deck-specific filter (if supported by ML_for_YGO.py).
-        try:
-            X, y = build_features(dataset, replays_dir, filter_wrong_deck=False)  # type: ignore[call-arg]
-        except TypeError:
-            X, y = build_features(dataset, replays_dir)
-
-        args.features_out.parent.mkdir(parents=True, exist_ok=True)
-        X.to_csv(args.features_out, index=False)
-        print(f"✅ Features CSV saved to: {args.features_out} (shape={X.shape})")
+        # the deck-specific filter.
+        result = run_pipeline(
+            args.out_dir.expanduser().resolve(),
+            provider=args.provider,
+            filter_wrong_deck=False,
+            matches_csv=args.matches_csv,
+            features_out=args.features_out,
+            profiler=profiler,
+        )
+        print(f"✅ Matches CSV saved to: {args.matches_csv} (rows={len(result.matches)})")
+        print(f"✅ Features CSV saved to: {args.features_out} (shape={result.X.shape})")
 
-        if len(X) == 0:
+        if result.scores is None:
             print("⚠️ No samples available after feature building; skipping model training.")
-            return 0
-
-        scores = train_and_score_models(X, y)
-        print("Scores:")
-        for k, v in scores.items():
-            print(f"  - {k}: {v}")
+        else:
+            print("Scores:")
+            for k, v in result.scores.items():
+                print(f"  - {k}: {v}")
 
+    profiler.write()
     return 0
 
 
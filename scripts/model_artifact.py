@@ -0,0 +1,83 @@
+"""
+Versioned model artifact written by ML_for_YGO.py (--save-model) and read by predict_hands.py.
+
+The artifact is a pickle of a dict holding the fitted estimator together with everything needed to
+rebuild its input from starting hands: the feature column order, the card vocabulary per player and
+a hash of the training data.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+ARTIFACT_FORMAT_VERSION = 1
+
+HAND_SUFFIXES = ("player1", "player2")
+
+
+def data_hash(X: pd.DataFrame, y: pd.Series) -> str:
+    """SHA-256 of the training features (with column names) and target."""
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, X.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(pd.Series(y), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def vocabulary_from_columns(columns: list[str]) -> dict[str, list[str]]:
+    """Card vocabulary per player, read back from '<card> (player1)' style feature columns."""
+    vocabulary: dict[str, list[str]] = {suffix: [] for suffix in HAND_SUFFIXES}
+    for col in columns:
+        for suffix in HAND_SUFFIXES:
+            if col.endswith(f" ({suffix})"):
+                vocabulary[suffix].append(col[: -len(suffix) - 3])
+    return vocabulary
+
+
+def save_model_artifact(
+    estimator: Any,
+    path: Path,
+    *,
+    model_name: str,
+    X: pd.DataFrame,
+    y: pd.Series,
+) -> Path:
+    import sklearn
+
+    artifact = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "model_name": model_name,
+        "estimator": estimator,
+        "feature_columns": [str(c) for c in X.columns],
+        "vocabulary": vocabulary_from_columns([str(c) for c in X.columns]),
+        "data_hash": data_hash(X, y),
+        "n_samples": len(X),
+        "sklearn_version": sklearn.__version__,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    path = Path(path).expanduser().resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+    return path
+
+
+def load_model_artifact(path: Path) -> dict[str, Any]:
+    # Only load artifacts you produced yourself: this unpickles arbitrary objects
+    path = Path(path).expanduser().resolve()
+    with open(path, "rb") as f:
+        artifact = pickle.load(f)
+    version = artifact.get("format_version") if isinstance(artifact, dict) else None
+    if version != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model artifact {path.name} (format_version={version}, expected {ARTIFACT_FORMAT_VERSION})."
+        )
+    return artifact
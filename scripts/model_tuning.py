@@ -0,0 +1,221 @@
+"""
+Hyperparameter search for the model zoo of ML_for_YGO.py, with successive halving.
+
+Each model draws a set of candidate configurations from its search space. All candidates are first
+evaluated with a small training budget (a subsample of each cross-validation fold); only the best
+1/eta of them move to the next rung, where the budget is multiplied by eta, until the full training
+folds are used. Trials of every model run together in a process pool. The wall-clock budget is a hard
+limit: when it runs out, the trials still running are stopped (their worker processes are killed), and
+each model keeps the best of the trials completed on the interrupted rung, or else the best
+configuration of the last completed rung. If no trial at all completed in time, tuning fails.
+
+The best configuration per model is saved to a JSON file that ML_for_YGO.py picks up on later runs.
+
+Usage:
+  python scripts/ML_for_YGO.py --tune --time-budget 600 --jobs 16
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import math
+import random
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from ML_for_YGO import build_models, make_cv_folds
+
+SEARCH_SPACES: dict[str, dict[str, list[Any]]] = {
+    "knn": {"n_neighbors": [3, 5, 7, 11, 15, 21, 31], "weights": ["uniform", "distance"]},
+    "logistic_regression": {"C": [0.01, 0.1, 1.0, 10.0, 100.0]},
+    "decision_tree": {
+        "criterion": ["gini", "entropy"],
+        "max_depth": [3, 5, 10, 20, None],
+        "min_samples_leaf": [1, 2, 5, 10],
+    },
+    "random_forest": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [5, 10, 20, None],
+        "max_features": ["sqrt", "log2", None],
+        "min_samples_leaf": [1, 2, 5],
+    },
+    "svc": {"C": [0.1, 1.0, 10.0, 100.0], "gamma": ["scale", 0.01, 0.1, 1.0]},
+    "gradient_boosting": {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [2, 3, 5],
+        "learning_rate": [0.03, 0.1, 0.3],
+    },
+    "adaboost": {"n_estimators": [25, 50, 100, 200], "learning_rate": [0.1, 0.5, 1.0]},
+    "naive_bayes": {"var_smoothing": [1e-9, 1e-7, 1e-5, 1e-3]},
+    "mlp": {
+        "hidden_layer_sizes": [(32,), (64, 32), (128, 64)],
+        "alpha": [1e-4, 1e-3, 1e-2],
+        "learning_rate_init": [1e-3, 1e-2],
+    },
+}
+
+# Smallest training subsample used on the first rung
+MIN_RESOURCES = 20
+
+_TUNE_DATA: tuple[np.ndarray, np.ndarray, list[tuple[np.ndarray, np.ndarray]], int] | None = None
+
+
+def _init_tune_worker(
+    X: np.ndarray, y: np.ndarray, folds: list[tuple[np.ndarray, np.ndarray]], random_state: int
+) -> None:
+    global _TUNE_DATA
+    _TUNE_DATA = (X, y, folds, random_state)
+
+
+def _run_trial(name: str, params: dict[str, Any], n_resources: int) -> float:
+    """Mean accuracy over the folds of `name` with `params`, trained on n_resources samples per fold."""
+    X, y, folds, random_state = _TUNE_DATA
+    scores = []
+    for fold, (train_idx, test_idx) in enumerate(folds):
+        # Same subsample for every candidate, so a rung compares configurations on equal data
+        subset = train_idx[np.random.default_rng(random_state + fold).permutation(len(train_idx))[:n_resources]]
+        if len(np.unique(y[subset])) < 2:
+            # A single class in a tiny subsample cannot be fitted: the configuration scores 0 on this fold
+            scores.append(0.0)
+            continue
+        model = build_models(n_train=len(subset), random_state=random_state, params={name: params})[name]
+        model.fit(X[subset], y[subset])
+        scores.append(float(model.score(X[test_idx], y[test_idx])))
+    return float(np.mean(scores))
+
+
+def _terminate_pool(pool: ProcessPoolExecutor) -> None:
+    """Stop the pool without waiting for the running trials (shutdown() would let them finish)."""
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def sample_candidates(space: dict[str, list[Any]], n_candidates: int, rng: random.Random) -> list[dict[str, Any]]:
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if len(grid) <= n_candidates:
+        return grid
+    return rng.sample(grid, n_candidates)
+
+
+def rung_resources(n_candidates: int, max_resources: int, eta: int) -> list[int]:
+    """Training budget of each rung: multiplied by eta from rung to rung, ending at max_resources."""
+    n_rungs = 1
+    while eta**n_rungs <= n_candidates:
+        n_rungs += 1
+    return [
+        max(min(MIN_RESOURCES, max_resources), max_resources // eta ** (n_rungs - 1 - k)) for k in range(n_rungs)
+    ]
+
+
+def tune_models(
+    X: pd.DataFrame,
+    y: pd.Series,
+    *,
+    models: list[str] | None = None,
+    n_candidates: int = 27,
+    eta: int = 3,
+    n_splits: int = 3,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    time_budget: float | None = None,
+) -> dict[str, dict[str, Any]]:
+    """
+    Successive halving over SEARCH_SPACES. Returns, per model, the best params, their CV score
+    and the training budget (samples per fold) it was measured with. Raises RuntimeError if the
+    time budget runs out before any trial completed.
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    folds = make_cv_folds(y, n_splits=n_splits, random_state=random_state)
+    X_arr = X.to_numpy(dtype=float)
+    y_arr = pd.Series(y).to_numpy()
+    max_resources = min(len(train_idx) for train_idx, _ in folds)
+    rng = random.Random(random_state)
+
+    names = [m for m in (models or SEARCH_SPACES) if m in SEARCH_SPACES]
+    candidates = {name: sample_candidates(SEARCH_SPACES[name], n_candidates, rng) for name in names}
+    best: dict[str, dict[str, Any]] = {}
+
+    pool = ProcessPoolExecutor(
+        max_workers=max(1, n_jobs), initializer=_init_tune_worker, initargs=(X_arr, y_arr, folds, random_state)
+    )
+    terminated = False
+    try:
+        for n_resources in rung_resources(n_candidates, max_resources, eta):
+            if deadline is not None and time.monotonic() >= deadline:
+                print("⚠️  Time budget reached: keeping the best configurations of the last completed rung")
+                break
+            futures: dict[Future, tuple[str, int]] = {
+                pool.submit(_run_trial, name, params, n_resources): (name, i)
+                for name in names
+                for i, params in enumerate(candidates[name])
+            }
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(futures, timeout=timeout)
+            if pending:
+                _terminate_pool(pool)
+                terminated = True
+                # Trials of the interrupted rung that did complete were measured with more data
+                partial: dict[str, list[tuple[float, int]]] = {}
+                for f in done:
+                    name, i = futures[f]
+                    partial.setdefault(name, []).append((f.result(), i))
+                for name, results in partial.items():
+                    score, top = max(results, key=lambda r: (r[0], -r[1]))
+                    best[name] = {"params": candidates[name][top], "score": score, "n_resources": n_resources}
+                print(
+                    f"⚠️  Time budget reached during the {n_resources} samples/fold rung: "
+                    f"{len(done)}/{len(futures)} trials completed, running trials stopped"
+                )
+                break
+
+            scores: dict[str, list[float]] = {name: [0.0] * len(candidates[name]) for name in names}
+            for f in done:
+                name, i = futures[f]
+                scores[name][i] = f.result()
+            for name in names:
+                order = sorted(range(len(candidates[name])), key=lambda i: -scores[name][i])
+                top = order[0]
+                best[name] = {
+                    "params": candidates[name][top],
+                    "score": scores[name][top],
+                    "n_resources": n_resources,
+                }
+                keep = max(1, math.ceil(len(order) / eta))
+                candidates[name] = [candidates[name][i] for i in order[:keep]]
+            print(f"Rung {n_resources} samples/fold: " + ", ".join(f"{n}={best[n]['score']:.3f}" for n in names))
+    finally:
+        if not terminated:
+            pool.shutdown(wait=True, cancel_futures=True)
+    if names and not best:
+        raise RuntimeError(
+            f"No tuning trial completed within the time budget ({time_budget:g}s): increase --time-budget"
+        )
+    missing = [name for name in names if name not in best]
+    if missing:
+        print(f"⚠️  No trial completed in time for: {', '.join(missing)} (not tuned)")
+    return best
+
+
+def save_best_params(best: dict[str, dict[str, Any]], path: Path) -> Path:
+    """Write the tuned configurations, keeping the entries of models that were not tuned this time."""
+    path = Path(path).expanduser().resolve()
+    saved: dict[str, Any] = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    saved.update(best)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2)
+    return path
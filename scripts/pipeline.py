@@ -0,0 +1,173 @@
+"""
+In-process pipeline API: replays -> matches -> features -> scores, passing DataFrames between the
+stages in memory.
+
+The command-line scripts hand off CSV files (get_csv_from_json.py -> DataProcessing_for_YGO.py ->
+ML_for_YGO.py); chaining the stages from Python with these functions skips the write / parse /
+dtype-inference round trip. CSVs are only written when an output path is given (side output).
+
+Example:
+  from pipeline import run_pipeline
+  result = run_pipeline(Path("data/db_replays"), provider="Fryderyk Chopin")
+  result.scores["knn"]
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from card_index import default_card_index_path, save_card_index
+from DataProcessing_for_YGO import DATA_PROVIDER_USERNAME, build_features
+from get_csv_from_json import build_matches_and_card_index
+from pipeline_profiling import NULL_PROFILER, Profiler
+
+
+@dataclass
+class PipelineResult:
+    matches: pd.DataFrame
+    card_index: pd.DataFrame | None
+    X: pd.DataFrame
+    y: pd.Series
+    scores: dict[str, float] | None = None
+
+
+def build_matches(
+    replays_dir: Path,
+    *,
+    provider: str | None = DATA_PROVIDER_USERNAME,
+    workers: int = 1,
+    manifest_path: Path | None = None,
+    matches_csv: Path | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """Matches table and card-usage index; with matches_csv both are also written (as get_csv_from_json.py does)."""
+    matches, card_index = build_matches_and_card_index(
+        replays_dir, provider, workers=workers, manifest_path=manifest_path, profiler=profiler
+    )
+    if matches_csv is not None:
+        matches_csv = Path(matches_csv).expanduser().resolve()
+        matches_csv.parent.mkdir(parents=True, exist_ok=True)
+        matches.to_csv(matches_csv, index=False)
+        if card_index is not None:
+            save_card_index(card_index, default_card_index_path(matches_csv), matches_files=matches["file"])
+    return matches, card_index
+
+
+def build_feature_matrix(
+    matches: pd.DataFrame,
+    replays_dir: Path,
+    *,
+    card_index: pd.DataFrame | None = None,
+    provider: str = DATA_PROVIDER_USERNAME,
+    filter_wrong_deck: bool = True,
+    drop_indices: list[int] | None = None,
+    encode_player2: bool = False,
+    turn_features: int = 0,
+    workers: int = 1,
+    features_out: Path | None = None,
+    target_out: Path | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """build_features on an in-memory matches table; features/target CSVs are optional side outputs."""
+    X, y = build_features(
+        matches,
+        replays_dir,
+        drop_indices=drop_indices,
+        filter_wrong_deck=filter_wrong_deck,
+        data_provider_username=provider,
+        card_index=card_index,
+        encode_player2=encode_player2,
+        turn_features=turn_features,
+        workers=workers,
+        profiler=profiler,
+    )
+    if features_out is not None:
+        features_out = Path(features_out).expanduser().resolve()
+        features_out.parent.mkdir(parents=True, exist_ok=True)
+        X.to_csv(features_out, index=False)
+    if target_out is not None:
+        target_out = Path(target_out).expanduser().resolve()
+        target_out.parent.mkdir(parents=True, exist_ok=True)
+        y.to_csv(target_out, index=False, header=["game1_winner"])
+    return X, y
+
+
+def train_models(
+    X: pd.DataFrame,
+    y: pd.Series,
+    *,
+    test_size: float = 0.2,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    params: dict[str, dict[str, Any]] | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> dict[str, float]:
+    # Imported here: scikit-learn / matplotlib are only needed when models are trained
+    from ML_for_YGO import train_and_score_models
+
+    return train_and_score_models(
+        X, y, test_size=test_size, random_state=random_state, n_jobs=n_jobs, params=params, profiler=profiler
+    )
+
+
+def run_pipeline(
+    replays_dir: Path,
+    *,
+    provider: str | None = DATA_PROVIDER_USERNAME,
+    workers: int = 1,
+    manifest_path: Path | None = None,
+    filter_wrong_deck: bool = True,
+    drop_indices: list[int] | None = None,
+    encode_player2: bool = False,
+    turn_features: int = 0,
+    train: bool = True,
+    test_size: float = 0.2,
+    random_state: int = 1,
+    n_jobs: int = 1,
+    params: dict[str, dict[str, Any]] | None = None,
+    matches_csv: Path | None = None,
+    features_out: Path | None = None,
+    target_out: Path | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> PipelineResult:
+    """
+    Replays to model scores in one process. The deck filter uses the card-usage index collected while
+    parsing, so replays are read once. Scores are skipped (None) with train=False or when no sample
+    is left. provider=None keeps the players in replay order (the deck filter then checks the default
+    data provider).
+    """
+    with profiler.stage("build_matches"):
+        matches, card_index = build_matches(
+            replays_dir,
+            provider=provider,
+            workers=workers,
+            manifest_path=manifest_path,
+            matches_csv=matches_csv,
+            profiler=profiler,
+        )
+    with profiler.stage("build_features"):
+        X, y = build_feature_matrix(
+            matches,
+            replays_dir,
+            card_index=card_index,
+            provider=provider or DATA_PROVIDER_USERNAME,
+            filter_wrong_deck=filter_wrong_deck,
+            drop_indices=drop_indices,
+            encode_player2=encode_player2,
+            turn_features=turn_features,
+            workers=workers,
+            features_out=features_out,
+            target_out=target_out,
+            profiler=profiler,
+        )
+    result = PipelineResult(matches=matches, card_index=card_index, X=X, y=y)
+    if train and len(X):
+        with profiler.stage("train"):
+            result.scores = train_models(
+                X, y, test_size=test_size, random_state=random_state, n_jobs=n_jobs, params=params, profiler=profiler
+            )
+    return result
@@ -0,0 +1,226 @@
+"""
+Stage-level profiling shared by the pipeline scripts (--profile).
+
+A Profiler records, for one run:
+  - wall / CPU time and memory high-water mark (peak RSS) at the end of each stage (nested stages allowed),
+  - the parse time of every replay file and the slowest N of them,
+  - fit / score time of every model,
+  - optionally a cProfile dump of one stage (--profile-cprofile STAGE).
+
+The report is a JSON file that can also be opened as a trace in chrome://tracing or https://ui.perfetto.dev
+(stages are "traceEvents"). Without --profile the scripts get NULL_PROFILER, whose methods do nothing,
+so the instrumentation costs a no-op call per stage and nothing per file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import heapq
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def peak_rss_mb() -> float | None:
+    """High-water RSS of this process and its finished children, in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS, in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed_call(fn: Callable[[Any], T], arg: Any) -> tuple[T, float]:
+    # Top-level so it can run in a worker process: the time is measured where the work happens
+    start = time.perf_counter()
+    result = fn(arg)
+    return result, time.perf_counter() - start
+
+
+class Profiler:
+    def __init__(self, script: str, out_path: Path, *, top_n: int = 10, cprofile_stage: str | None = None):
+        self.script = script
+        self.out_path = Path(out_path).expanduser().resolve()
+        self.top_n = top_n
+        self.cprofile_stage = cprofile_stage
+        self.stages: list[dict[str, Any]] = []
+        self.models: dict[str, dict[str, float]] = {}
+        self.n_files = 0
+        self.files_total_s = 0.0
+        self._slowest: list[tuple[float, str]] = []  # min-heap of the top_n slowest files
+        self._stack: list[str] = []
+        self._t0 = time.perf_counter()
+        self._started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block; stages opened inside it are reported as '<outer>/<inner>'."""
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        profile = None
+        if name == self.cprofile_stage or path == self.cprofile_stage:
+            profile = cProfile.Profile()
+            profile.enable()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            end, cpu_end = time.perf_counter(), time.process_time()
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.cprofile_path(name))
+            self._stack.pop()
+            rss = peak_rss_mb()
+            self.stages.append(
+                {
+                    "stage": path,
+                    "start_s": round(start - self._t0, 6),
+                    "wall_s": round(end - start, 6),
+                    "cpu_s": round(cpu_end - cpu_start, 6),
+                    "rss_high_water_mb": None if rss is None else round(rss, 1),
+                }
+            )
+
+    def cprofile_path(self, stage: str) -> Path:
+        return self.out_path.with_name(f"{self.out_path.stem}.{stage.replace('/', '_')}.prof")
+
+    def record_file(self, name: str, seconds: float) -> None:
+        self.n_files += 1
+        self.files_total_s += seconds
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, (seconds, name))
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, name))
+
+    def map_timed(
+        self, fn: Callable[[Any], T], items: Iterable[Any], mapper: Callable[..., list[Any]], *, names: Sequence[str]
+    ) -> list[T]:
+        """
+        mapper(fn, items) (e.g. get_csv_from_json.map_replays) with the time of every call recorded
+        under names[i]; the calls are timed inside the workers when the mapper uses a process pool.
+        """
+        timed = mapper(partial(_timed_call, fn), items)
+        for name, (_, seconds) in zip(names, timed):
+            self.record_file(name, seconds)
+        return [result for result, _ in timed]
+
+    def record_model(self, name: str, *, fit_s: float, score_s: float) -> None:
+        self.models[name] = {"fit_s": round(fit_s, 6), "score_s": round(score_s, 6)}
+
+    def report(self) -> dict[str, Any]:
+        rss = peak_rss_mb()
+        slowest = sorted(self._slowest, reverse=True)
+        return {
+            "script": self.script,
+            "started_at": self._started_at,
+            "wall_s": round(time.perf_counter() - self._t0, 6),
+            "peak_rss_mb": None if rss is None else round(rss, 1),
+            "stages": sorted(self.stages, key=lambda s: s["start_s"]),
+            "files": {
+                "count": self.n_files,
+                "total_s": round(self.files_total_s, 6),
+                "mean_s": round(self.files_total_s / self.n_files, 6) if self.n_files else None,
+                "slowest": [{"file": name, "seconds": round(s, 6)} for s, name in slowest],
+            },
+            "models": self.models,
+            # Chrome trace format (complete events, microseconds)
+            "traceEvents": [
+                {
+                    "name": s["stage"].rsplit("/", 1)[-1],
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": round(s["start_s"] * 1e6),
+                    "dur": round(s["wall_s"] * 1e6),
+                    "pid": os.getpid(),
+                    "tid": 0,
+                    "args": {"cpu_s": s["cpu_s"], "rss_high_water_mb": s["rss_high_water_mb"]},
+                }
+                for s in self.stages
+            ],
+        }
+
+    def write(self) -> Path:
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.out_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"✅ Profile saved to: {self.out_path}")
+        return self.out_path
+
+
+class NullProfiler(Profiler):
+    """Profiler used when --profile is off: records nothing."""
+
+    def __init__(self) -> None:
+        pass
+
+    @property
+    def enabled(self) -> bool:
+        return False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def record_file(self, name: str, seconds: float) -> None:
+        pass
+
+    def map_timed(
+        self, fn: Callable[[Any], T], items: Iterable[Any], mapper: Callable[..., list[Any]], *, names: Sequence[str]
+    ) -> list[T]:
+        return mapper(fn, items)
+
+    def record_model(self, name: str, *, fit_s: float, score_s: float) -> None:
+        pass
+
+    def write(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=True,
+        default=None,
+        help="Write a stage-level profile (JSON, also loadable in chrome://tracing) to this path "
+        "(default: data/profile_<script>.json)",
+    )
+    parser.add_argument("--profile-top", type=int, default=10, help="Slowest replay files listed in the profile")
+    parser.add_argument(
+        "--profile-cprofile",
+        type=str,
+        default=None,
+        metavar="STAGE",
+        help="Also dump cProfile stats of this stage next to the profile (<profile>.<stage>.prof)",
+    )
+
+
+def profiler_from_args(args: argparse.Namespace, script: str) -> Profiler:
+    if args.profile is None:
+        return NULL_PROFILER
+    out = _PROJECT_ROOT / f"data/profile_{script}.json" if args.profile is True else args.profile
+    return Profiler(script, out, top_n=args.profile_top, cprofile_stage=args.profile_cprofile)
@@ -0,0 +1,271 @@
+"""
+Long-form play event table: one row per play of every replay, for analyses beyond the starting hands.
+
+Columns:
+  replay_id  replay name without ".json" (e.g. "1313181-76237082"); the index of the table
+  seq        position of the play in its replay
+  seconds    duel clock when the play was made (nullable)
+  play       play type ("Normal Summon", "To GY", "Life points", ...)
+  username   player (or watcher) who made it
+  card_id    DuelingBook id of the card involved (nullable); its attributes are in the card catalog
+  card_name  its name
+  zone       field zone of summons, sets and activations ("M-3", "S-2", ...)
+  amount     life point change of "Life points" plays (nullable)
+
+String columns are categoricals. Replays are parsed chunk by chunk and their strings encoded into
+shared code books right away, so only integer codes are kept for the whole archive (under 30 bytes
+per play). Rows are grouped by replay, in replay_id order: `events.loc[replay_id]` and replay_slices()
+are contiguous slices of the table, not copies.
+
+Usage:
+  python scripts/play_events.py --replays-dir data/db_replays          # size and memory per column
+  python scripts/play_events.py --warehouse data/replay_warehouse       # from the Parquet warehouse
+  python scripts/play_events.py --replays-dir data/db_replays --out data/play_events.parquet
+  python scripts/play_events.py --replays-dir data/db_replays --catalog-out data/card_catalog  # see card_catalog.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from functools import partial
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from card_catalog import CardCatalog, replay_cards
+from get_csv_from_json import map_replays
+from replay_io import list_replays, load_replay, replay_name
+
+EVENT_COLUMNS = ["replay_id", "seq", "seconds", "play", "username", "card_id", "card_name", "zone", "amount"]
+CATEGORICAL_COLUMNS = ["play", "username", "card_name", "zone"]
+NULLABLE_INT_COLUMNS = ["seconds", "card_id", "amount"]
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def replay_id(file_name: str) -> str:
+    """replay_id of a replay file name ("x.json" -> "x"); the matches CSV `file` column maps to it."""
+    return file_name[: -len(".json")] if file_name.endswith(".json") else file_name
+
+
+def play_columns(plays: list[dict[str, Any]]) -> dict[str, list[Any]]:
+    """Event columns (all but replay_id) of one replay's plays."""
+    cards = [play.get("card") if isinstance(play.get("card"), dict) else None for play in plays]
+    return {
+        "seq": list(range(len(plays))),
+        "seconds": [play.get("seconds") for play in plays],
+        "play": [play["play"] for play in plays],
+        "username": [play.get("username") for play in plays],
+        "card_id": [None if card is None else card.get("id") for card in cards],
+        "card_name": [None if card is None else card.get("name") for card in cards],
+        "zone": [play.get("zone") for play in plays],
+        "amount": [play.get("amount") if play["play"] == "Life points" else None for play in plays],
+    }
+
+
+def select_plays(columns: dict[str, list[Any]], plays: frozenset[str]) -> dict[str, list[Any]]:
+    """Rows of event columns whose play type is in `plays` (`seq` keeps the position in the whole replay)."""
+    keep = [i for i, play in enumerate(columns["play"]) if play in plays]
+    return {col: [values[i] for i in keep] for col, values in columns.items()}
+
+
+def replay_play_columns(
+    path: Path, *, with_cards: bool = False, plays: frozenset[str] | None = None
+) -> tuple[dict[str, list[Any]], dict[int, dict[str, Any]] | None]:
+    """
+    (event columns, card objects or None) of one replay, only plays of the `plays` types if given.
+    Top-level so it can be shipped to worker processes.
+    """
+    replay_plays = load_replay(path).get("plays", [])
+    columns = play_columns(replay_plays)
+    if plays is not None:
+        columns = select_plays(columns, plays)
+    return columns, (replay_cards(replay_plays) if with_cards else None)
+
+
+class _CodeBook:
+    """Codes of the distinct values of one column, in order of first appearance (None -> -1)."""
+
+    def __init__(self) -> None:
+        self.codes: dict[Any, int] = {}
+
+    def encode(self, values: list[Any]) -> np.ndarray:
+        codes = self.codes
+        return np.fromiter(
+            (-1 if v is None else codes.setdefault(v, len(codes)) for v in values), dtype=np.int32, count=len(values)
+        )
+
+    def categorical(self, codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=list(self.codes))
+
+
+def _nullable_ints(values: list[Any]) -> tuple[np.ndarray, np.ndarray]:
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    data = np.fromiter((0 if v is None else v for v in values), dtype=np.int32, count=len(values))
+    return data, mask
+
+
+def build_play_events(
+    replays_dir: Path,
+    *,
+    workers: int = 1,
+    replay_ids: Iterable[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cards: dict[int, dict[str, Any]] | None = None,
+    plays: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Event table of the replays of replays_dir (only those of `replay_ids` if given, e.g. the files of a
+    deduplicated matches table mapped with replay_id()). Replays are parsed `chunk_size` at a time.
+    With `plays`, only plays of these types are kept (filtered in the workers, before encoding).
+    With `cards`, the card objects met are added to it by id, for CardCatalog.from_cards().
+    """
+    paths = list_replays(replays_dir.expanduser().resolve())
+    if replay_ids is not None:
+        wanted = {replay_id(name) for name in replay_ids}
+        paths = [path for path in paths if replay_id(replay_name(path)) in wanted]
+
+    books = {col: _CodeBook() for col in CATEGORICAL_COLUMNS}
+    ids: list[str] = []
+    parts: dict[str, list[np.ndarray]] = {col: [] for col in EVENT_COLUMNS}
+    masks: dict[str, list[np.ndarray]] = {col: [] for col in NULLABLE_INT_COLUMNS}
+    for start in range(0, len(paths), max(1, chunk_size)):
+        chunk = paths[start : start + chunk_size]
+        parse = partial(
+            replay_play_columns, with_cards=cards is not None, plays=None if plays is None else frozenset(plays)
+        )
+        parsed = map_replays(parse, chunk, workers)
+        for path, (columns, replay_card_objects) in zip(chunk, parsed):
+            if cards is not None:
+                cards.update(replay_card_objects)
+            parts["replay_id"].append(np.full(len(columns["seq"]), len(ids), dtype=np.int32))
+            ids.append(replay_id(replay_name(path)))
+            parts["seq"].append(np.asarray(columns["seq"], dtype=np.int32))
+            for col in CATEGORICAL_COLUMNS:
+                parts[col].append(books[col].encode(columns[col]))
+            for col in NULLABLE_INT_COLUMNS:
+                data, mask = _nullable_ints(columns[col])
+                parts[col].append(data)
+                masks[col].append(mask)
+
+    def _concat(arrays: list[np.ndarray], dtype: Any) -> np.ndarray:
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    data: dict[str, Any] = {"seq": _concat(parts["seq"], np.int32)}
+    for col in EVENT_COLUMNS[2:]:
+        if col in NULLABLE_INT_COLUMNS:
+            data[col] = pd.arrays.IntegerArray(_concat(parts[col], np.int32), _concat(masks[col], bool))
+        else:
+            data[col] = books[col].categorical(_concat(parts[col], np.int32))
+    index = pd.CategoricalIndex(
+        pd.Categorical.from_codes(_concat(parts["replay_id"], np.int32), categories=ids), name="replay_id"
+    )
+    return pd.DataFrame(data, index=index, columns=EVENT_COLUMNS[1:])
+
+
+def load_play_events(
+    source: Path,
+    *,
+    workers: int = 1,
+    replay_ids: Iterable[str] | None = None,
+    columns: list[str] | None = None,
+    plays: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Event table from a replay directory, or from a Parquet warehouse (see replay_warehouse.py).
+    `plays` keeps only these play types (pushed down to the Parquet reader for a warehouse).
+    """
+    from replay_warehouse import is_warehouse, load_plays
+
+    if not is_warehouse(source):
+        events = build_play_events(source, workers=workers, replay_ids=replay_ids, plays=plays)
+        return events if columns is None else events[columns]
+
+    wanted = None if columns is None else ["file", *columns]
+    filters = []
+    if replay_ids is not None:
+        filters.append(("file", "in", sorted(f"{replay_id(name)}.json" for name in replay_ids)))
+    if plays is not None:
+        filters.append(("play", "in", sorted(set(plays))))
+    table = load_plays(source, columns=wanted, filters=filters or None)
+    files = table.pop("file").astype("category").cat.remove_unused_categories()
+    files = files.cat.rename_categories([replay_id(str(name)) for name in files.cat.categories])
+    table.index = pd.CategoricalIndex(files, name="replay_id")
+    return table
+
+
+def replay_slices(events: pd.DataFrame) -> pd.DataFrame:
+    """(start, stop) row positions of every replay of an event table, indexed by replay_id."""
+    codes = np.asarray(events.index.codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+    stops = np.r_[starts[1:], len(codes)].astype(np.int64)
+    return pd.DataFrame(
+        {"start": starts, "stop": stops},
+        index=pd.Index(events.index.categories[codes[starts]], name="replay_id"),
+    )
+
+
+def iter_replays(events: pd.DataFrame) -> Iterator[tuple[str, pd.DataFrame]]:
+    """(replay_id, its events) pairs; every frame is a slice of `events`."""
+    for rid, start, stop in replay_slices(events).itertuples():
+        yield rid, events.iloc[start:stop]
+
+
+def describe_events(events: pd.DataFrame) -> pd.DataFrame:
+    """Memory per column (index included), with the number of distinct values of categoricals."""
+    usage = events.memory_usage(deep=True)
+    rows = []
+    for col, nbytes in usage.items():
+        values = events.index if col == "Index" else events[col]
+        distinct = len(values.dtype.categories) if isinstance(values.dtype, pd.CategoricalDtype) else None
+        name = "replay_id" if col == "Index" else col
+        rows.append({"column": name, "dtype": str(values.dtype), "distinct": distinct, "bytes": nbytes})
+    return pd.DataFrame(rows)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Flatten the plays of every replay into one event table.")
+    parser.add_argument("--replays-dir", type=Path, default=Path("data/db_replays"))
+    parser.add_argument("--warehouse", type=Path, default=None, help="Read the plays from a Parquet warehouse")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of processes used to parse replays (0 = one per CPU)"
+    )
+    parser.add_argument("--out", type=Path, default=None, help="Write the table to this Parquet file (needs pyarrow)")
+    parser.add_argument(
+        "--catalog-out",
+        type=Path,
+        default=None,
+        help="Also build the card catalog (see card_catalog.py) in the same pass and save it there",
+    )
+    args = parser.parse_args(argv)
+    if args.catalog_out is not None and args.warehouse is not None:
+        parser.error("--catalog-out needs the replay JSONs (--replays-dir), not a warehouse")
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    cards: dict[int, dict[str, Any]] | None = None if args.catalog_out is None else {}
+    if args.warehouse is not None:
+        events = load_play_events(args.warehouse, workers=workers)
+    else:
+        events = build_play_events(args.replays_dir, workers=workers, cards=cards)
+    summary = describe_events(events)
+    total = int(summary["bytes"].sum())
+    n_replays = len(events.index.categories)
+    print(
+        f"✅ {len(events)} plays from {n_replays} replays: {total / 1e6:.1f} MB in memory "
+        f"({total / max(1, len(events)):.1f} bytes per play)"
+    )
+    print(summary.to_string(index=False))
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        events.to_parquet(args.out, compression="zstd")
+        print(f"✅ Table des plays sauvegardée dans: {args.out}")
+    if cards is not None:
+        catalog = CardCatalog.from_cards(cards)
+        print(f"✅ Catalogue de {len(catalog)} cartes sauvegardé dans: {catalog.save(args.catalog_out)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
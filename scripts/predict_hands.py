@@ -0,0 +1,166 @@
+"""
+Batch win-probability prediction from starting hands, using a model artifact saved by
+ML_for_YGO.py --save-model.
+
+The artifact is loaded once; hands are then encoded into the model's feature column order in a
+vectorized way, so large batches cost little more than the estimator's own predict_proba.
+
+Usage:
+  python scripts/predict_hands.py --model data/model.pkl --hand "Card A%%%%Card B%%%%Card C%%%%Card D%%%%Card E%%%%"
+  python scripts/predict_hands.py --model data/model.pkl --matches-csv "data/matches_data_Fryderyk Chopin.csv" --out data/predictions.csv
+  python scripts/predict_hands.py --model data/model.pkl --replays data/db_replays --provider "Fryderyk Chopin"
+"""
+
+from __future__ import annotations
+
+import argparse
+from itertools import chain
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+from DataProcessing_for_YGO import parse_hand
+from get_csv_from_json import extract_match_row, swap_provider_to_player1
+from model_artifact import HAND_SUFFIXES, load_model_artifact
+from replay_io import list_replays
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+class HandScorer:
+    """Fitted estimator + feature layout of a model artifact, ready to score batches of hands."""
+
+    def __init__(self, artifact: dict[str, Any]):
+        self.artifact = artifact
+        self.estimator = artifact["estimator"]
+        self.feature_columns: list[str] = artifact["feature_columns"]
+        position = {col: i for i, col in enumerate(self.feature_columns)}
+
+        self._rps_column = position.get("rps_winner")
+        # Per player: feature column of each card of the vocabulary
+        self._card_columns: dict[str, dict[str, int]] = {
+            suffix: {card: position[f"{card} ({suffix})"] for card in artifact["vocabulary"].get(suffix, [])}
+            for suffix in HAND_SUFFIXES
+        }
+
+        known = {"rps_winner"} | {self.feature_columns[i] for cols in self._card_columns.values() for i in cols.values()}
+        unsupported = [col for col in self.feature_columns if col not in known]
+        if unsupported:
+            raise ValueError(f"Model uses features that cannot be built from starting hands: {unsupported[:5]}")
+
+        classes = list(self.estimator.classes_)
+        self._positive = classes.index(True) if True in classes else len(classes) - 1
+
+    @classmethod
+    def from_path(cls, path: Path) -> "HandScorer":
+        return cls(load_model_artifact(path))
+
+    def featurize(
+        self,
+        hands_player1: Sequence[str | list[str]],
+        *,
+        hands_player2: Sequence[str | list[str]] | None = None,
+        rps_winner: bool | Sequence[bool] = False,
+    ) -> np.ndarray:
+        """
+        Feature matrix in the artifact's column order. Hands are '%%%%'-separated strings (as produced
+        by get_start_hands) or lists of card names; cards unknown to the model are ignored.
+        """
+        n, n_features = len(hands_player1), len(self.feature_columns)
+        # Flat (row * n_features + column) index of every known card, counted with one bincount
+        cells: list[np.ndarray] = []
+        for suffix, hands in (("player1", hands_player1), ("player2", hands_player2)):
+            columns = self._card_columns[suffix]
+            if hands is None or not columns:
+                continue
+            parsed = [h[:5] if isinstance(h, list) else parse_hand(h) for h in hands]
+            lengths = np.fromiter(map(len, parsed), dtype=np.int64, count=n)
+            cols = np.fromiter(
+                (columns.get(card, -1) for card in chain.from_iterable(parsed)), dtype=np.int64, count=int(lengths.sum())
+            )
+            rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+            keep = cols >= 0
+            cells.append(rows[keep] * n_features + cols[keep])
+
+        if cells:
+            counts = np.bincount(np.concatenate(cells), minlength=n * n_features)
+            features = counts.reshape(n, n_features).astype(float)
+        else:
+            features = np.zeros((n, n_features), dtype=float)
+        if self._rps_column is not None:
+            features[:, self._rps_column] = np.broadcast_to(np.asarray(rps_winner, dtype=float), (n,))
+        return features
+
+    def predict_proba(
+        self,
+        hands_player1: Sequence[str | list[str]],
+        *,
+        hands_player2: Sequence[str | list[str]] | None = None,
+        rps_winner: bool | Sequence[bool] = False,
+    ) -> np.ndarray:
+        """Probability that player1 wins game 1, one value per hand."""
+        if len(hands_player1) == 0:
+            return np.zeros(0)
+        features = self.featurize(hands_player1, hands_player2=hands_player2, rps_winner=rps_winner)
+        return self.estimator.predict_proba(features)[:, self._positive]
+
+    def predict_replays(self, paths: Sequence[Path], *, data_provider_username: str | None = None) -> pd.DataFrame:
+        """Score the starting hands of replay JSONs (streamed, stopping once the hands are read)."""
+        rows = [res[0] for res in (extract_match_row(Path(p), stream=True) for p in paths) if res[0] is not None]
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return pd.DataFrame(columns=["file", "player1", "player2", "win_probability"])
+        swap_provider_to_player1(df, data_provider_username)
+        df["win_probability"] = self.predict_proba(
+            df["starting_hand_player1"].tolist(),
+            hands_player2=df["starting_hand_player2"].tolist(),
+            rps_winner=df["rps_winner"].astype(bool).to_numpy(),
+        )
+        return df[["file", "player1", "player2", "win_probability"]]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Predict game-1 win probabilities from starting hands.")
+    parser.add_argument("--model", type=Path, default=_PROJECT_ROOT / "data/model.pkl", help="Model artifact")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--hand", action="append", help="'%%%%'-separated starting hand of player1 (repeatable)")
+    src.add_argument("--matches-csv", type=Path, help="Matches CSV (starting_hand_player1/2, rps_winner columns)")
+    src.add_argument("--replays", type=Path, nargs="+", help="Replay files (.json/.json.gz/.json.zst) or directories")
+    parser.add_argument("--rps-winner", action="store_true", help="player1 won rock-paper-scissors (with --hand)")
+    parser.add_argument("--provider", type=str, default=None, help="Username forced into player1 (with --replays)")
+    parser.add_argument("--out", type=Path, default=None, help="Write predictions to this CSV instead of printing")
+    args = parser.parse_args(argv)
+
+    scorer = HandScorer.from_path(args.model)
+    print(f"Model: {scorer.artifact['model_name']} (data_hash={scorer.artifact['data_hash'][:12]})")
+
+    if args.hand:
+        out = pd.DataFrame({"starting_hand_player1": args.hand})
+        out["win_probability"] = scorer.predict_proba(args.hand, rps_winner=args.rps_winner)
+    elif args.matches_csv:
+        matches = pd.read_csv(args.matches_csv)
+        hands_p2 = matches["starting_hand_player2"].tolist() if "starting_hand_player2" in matches else None
+        rps = matches["rps_winner"].astype(bool).to_numpy() if "rps_winner" in matches else False
+        out = matches[[c for c in ("file", "player1", "player2") if c in matches]].copy()
+        out["win_probability"] = scorer.predict_proba(
+            matches["starting_hand_player1"].tolist(), hands_player2=hands_p2, rps_winner=rps
+        )
+    else:
+        paths: list[Path] = []
+        for p in args.replays:
+            paths += list_replays(p) if p.is_dir() else [p]
+        out = scorer.predict_replays(paths, data_provider_username=args.provider)
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        out.to_csv(args.out, index=False)
+        print(f"✅ Predictions saved to: {args.out} (rows={len(out)})")
+    else:
+        print(out.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the DuelingBook replay API (standard library only), to exercise the scraper without
+touching the real site.
+
+Serves the replays of a directory (plain or compressed, e.g. generate_synthetic_replays.py output) on
+POST /view-replay?id=<replay id>[&match=N], like the real endpoint: the id may be the file stem
+("1313181-70000000") or its duel part ("70000000"). Faults can be injected: HTTP 503, "Invalid token"
+answers and latency. GET /stats returns request counters and the highest number of concurrent requests.
+
+Usage:
+  python scripts/replay_api_stub.py --replays-dir data/benchmark/replays_1000_seed0 --port 8766 --error-rate 0.05
+  python scripts/get_db_match_selenium_clean.py --links-file links.txt --async \
+      --api-base http://127.0.0.1:8766 --static-token test
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+from replay_io import list_replays, read_replay_bytes, replay_name
+
+
+class StubStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.served = 0
+        self.errors_503 = 0
+        self.invalid_tokens = 0
+        self.not_found = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.first_request_at: float | None = None
+        self.last_request_at: float | None = None
+
+    def enter(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.first_request_at = self.first_request_at or now
+            self.last_request_at = now
+
+    def leave(self, outcome: str) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            span = (self.last_request_at or 0) - (self.first_request_at or 0)
+            return {
+                "requests": self.requests,
+                "served": self.served,
+                "errors_503": self.errors_503,
+                "invalid_tokens": self.invalid_tokens,
+                "not_found": self.not_found,
+                "max_in_flight": self.max_in_flight,
+                "requests_per_s": round((self.requests - 1) / span, 2) if span > 0 else None,
+            }
+
+
+def index_replays(replays_dir: Path) -> dict[str, Path]:
+    """Replay files by stem and by duel id (the part after the user prefix)."""
+    index: dict[str, Path] = {}
+    for path in list_replays(replays_dir):
+        stem = replay_name(path)[: -len(".json")]
+        index[stem] = path
+        index.setdefault(stem.split("-", 1)[-1], path)
+    return index
+
+
+def make_handler(
+    replays: dict[str, Path],
+    stats: StubStats,
+    *,
+    error_rate: float,
+    invalid_token_rate: float,
+    latency: float,
+    seed: int,
+):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class ReplayAPIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - silence per-request logs
+            pass
+
+        def _send(self, status: int, payload: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            if urlparse(self.path).path == "/stats":
+                self._send(200, json.dumps(stats.snapshot()).encode("utf-8"))
+            else:
+                self._send(404, b'{"error": "not found"}')
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))  # form data, ignored
+            parsed = urlparse(self.path)
+            if parsed.path != "/view-replay":
+                self._send(404, b'{"error": "not found"}')
+                return
+            stats.enter()
+            with rng_lock:
+                roll = rng.random()
+            if latency:
+                time.sleep(latency)
+            if roll < error_rate:
+                stats.leave("errors_503")
+                self._send(503, b'{"error": "unavailable"}')
+                return
+            if roll < error_rate + invalid_token_rate:
+                stats.leave("invalid_tokens")
+                self._send(200, b'{"action": "Error", "message": "Invalid token"}')
+                return
+            replay_id = (parse_qs(parsed.query).get("id") or [""])[0]
+            path = replays.get(replay_id)
+            if path is None:
+                stats.leave("not_found")
+                self._send(200, b'{"action": "Error", "message": "Replay not found"}')
+                return
+            stats.leave("served")
+            self._send(200, read_replay_bytes(path))
+
+    return ReplayAPIHandler
+
+
+def make_server(
+    replays_dir: Path,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8766,
+    error_rate: float = 0.0,
+    invalid_token_rate: float = 0.0,
+    latency_ms: float = 0.0,
+    seed: int = 0,
+) -> ThreadingHTTPServer:
+    """Server bound to host:port (port 0 picks a free one); call serve_forever() to start it."""
+    replays = index_replays(replays_dir.expanduser().resolve())
+    handler = make_handler(
+        replays,
+        StubStats(),
+        error_rate=error_rate,
+        invalid_token_rate=invalid_token_rate,
+        latency=latency_ms / 1000,
+        seed=seed,
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a replay directory as a stand-in DuelingBook replay API.")
+    parser.add_argument("--replays-dir", type=Path, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 503")
+    parser.add_argument("--invalid-token-rate", type=float, default=0.0, help="Share answered 'Invalid token'")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = make_server(
+        args.replays_dir,
+        host=args.host,
+        port=args.port,
+        error_rate=args.error_rate,
+        invalid_token_rate=args.invalid_token_rate,
+        latency_ms=args.latency_ms,
+        seed=args.seed,
+    )
+    print(f"✅ Stand-in replay API listening on http://{args.host}:{server.server_address[1]} ({args.replays_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,239 @@
+"""
+Content fingerprints of replays, to keep the same duel from entering the dataset twice.
+
+The archive can hold one duel under several names (e.g. "1313181-77395430.json" and
+"1313181-77395430&match.json", fetched from two links) or in several formats. Every copy would become a
+separate matches row, and the copies could land on both sides of a train/test split.
+
+A replay is fingerprinted from its `plays` only (metadata such as ratings can change between downloads):
+  - content   : SHA-256 of the canonical JSON of the plays (sorted keys, compact), equal for exact copies.
+                Card objects are reduced to their ids: their text follows DuelingBook's card database,
+                not the duel, and it is most of the bytes to hash.
+
+  - signature : MinHash of the 4-play shingles (play type, username, card name), used by the second pass
+                to find near-duplicates, e.g. a download cut short or replayed with a few extra events.
+                Distinct duels score far below the threshold, even with the same decks (< 0.1 on data/db_replays).
+
+Used by get_csv_from_json.py (duplicates dropped at ingest, fingerprints kept in the replay manifest),
+replay_warehouse.py and the scraper (replays whose content is already in the archive are not saved again).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import zlib
+from typing import Any, NamedTuple, Sequence
+
+import numpy as np
+
+SHINGLE_SIZE = 4
+SIGNATURE_SIZE = 64
+LSH_BANDS = 16  # SIGNATURE_SIZE / LSH_BANDS rows per band
+NEAR_DUPLICATE_THRESHOLD = 0.9
+
+_PRIME = (1 << 31) - 1
+_PERMUTATIONS = np.random.default_rng(20240615).integers(1, _PRIME, size=(2, SIGNATURE_SIZE), dtype=np.uint64)
+
+
+class ReplayFingerprint(NamedTuple):
+    content: str
+    signature: str | None  # hex of SIGNATURE_SIZE little-endian uint32, None for a replay without plays
+
+
+class Duplicate(NamedTuple):
+    original: str  # replay kept in its place
+    similarity: float  # estimated Jaccard similarity of the plays (1.0 for exact copies)
+    exact: bool
+
+
+def _card_ref(card: Any) -> Any:
+    return [card.get("id"), card.get("object_id")] if isinstance(card, dict) else card
+
+
+def plays_content_hash(plays: list[dict[str, Any]]) -> str:
+    canonical_plays = []
+    for play in plays:
+        if "card" in play or "cards" in play:
+            play = dict(play)
+            if "card" in play:
+                play["card"] = _card_ref(play["card"])
+            if isinstance(play.get("cards"), list):
+                play["cards"] = [_card_ref(card) for card in play["cards"]]
+        canonical_plays.append(play)
+    canonical = json.dumps(canonical_plays, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _play_token(play: dict[str, Any]) -> str:
+    card = play.get("card")
+    card_name = card.get("name") if isinstance(card, dict) else None
+    return f"{play.get('play')}\x1f{play.get('username')}\x1f{card_name}"
+
+
+def play_shingles(plays: list[dict[str, Any]], k: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hashes (below 2**31 - 1) of the runs of k consecutive plays."""
+    tokens = [_play_token(play) for play in plays]
+    runs = ["\x1e".join(tokens[i : i + k]) for i in range(max(1, len(tokens) - k + 1))] if tokens else []
+    return np.unique(np.array([zlib.crc32(run.encode("utf-8")) for run in runs], dtype=np.uint64) % np.uint64(_PRIME))
+
+
+def minhash_signature(shingles: np.ndarray) -> str | None:
+    if not len(shingles):
+        return None
+    a, b = _PERMUTATIONS
+    # (a * x + b) mod p stays below 2**63 since a, x < 2**31
+    hashed = (a[:, None] * shingles[None, :] + b[:, None]) % np.uint64(_PRIME)
+    return hashed.min(axis=1).astype("<u4").tobytes().hex()
+
+
+def replay_fingerprint(plays: list[dict[str, Any]]) -> ReplayFingerprint:
+    return ReplayFingerprint(plays_content_hash(plays), minhash_signature(play_shingles(plays)))
+
+
+# Content hash shared by every replay without plays: it says nothing about the duel
+EMPTY_PLAYS_CONTENT = plays_content_hash([])
+
+
+def duplicate_key(
+    name: str, fingerprint: ReplayFingerprint | None, sha256: str | None
+) -> tuple[str, str, str | None]:
+    """
+    find_duplicates entry of one replay. Replays without a fingerprint (streaming mode) or without plays
+    are keyed by their file digest (sha256, only needed for them), so only byte-identical files share a key.
+    """
+    if fingerprint is None or fingerprint.content == EMPTY_PLAYS_CONTENT:
+        if sha256 is None:
+            raise ValueError(f"{name}: the file digest is needed to deduplicate a replay without plays")
+        return name, "sha256:" + sha256, None
+    return name, fingerprint.content, fingerprint.signature
+
+
+def _signature_array(signature: str) -> np.ndarray:
+    return np.frombuffer(bytes.fromhex(signature), dtype="<u4")
+
+
+def signature_similarity(a: str, b: str) -> float:
+    """Estimated Jaccard similarity of the shingles of two replays."""
+    return float(np.mean(_signature_array(a) == _signature_array(b)))
+
+
+def _keep_first(name: str) -> tuple[int, str]:
+    # The plainest name is kept: "x.json" rather than "x&match.json"
+    return len(name), name
+
+
+def find_duplicates(
+    replays: Sequence[tuple[str, str, str | None]], *, threshold: float = NEAR_DUPLICATE_THRESHOLD
+) -> dict[str, Duplicate]:
+    """
+    Duplicates among (name, content hash, MinHash signature or None) entries, as {duplicate name: Duplicate}.
+    Entries with the same content hash are exact copies. The second pass compares the signatures of the
+    remaining replays through LSH buckets and groups those at or above `threshold` (threshold <= 0 or > 1
+    skips it). In every group the replay with the shortest name is kept.
+    """
+    duplicates: dict[str, Duplicate] = {}
+    by_content: dict[Any, list[str]] = {}
+    signatures: dict[str, str | None] = {}
+    for name, content, signature in replays:
+        # Replays without plays all hash the same: never treat them as copies of each other
+        by_content.setdefault(("name", name) if content == EMPTY_PLAYS_CONTENT else content, []).append(name)
+        signatures.setdefault(name, signature)
+    kept: list[str] = []
+    for names in by_content.values():
+        names = sorted(names, key=_keep_first)
+        kept.append(names[0])
+        duplicates.update((name, Duplicate(names[0], 1.0, True)) for name in names[1:])
+    if not 0 < threshold <= 1:
+        return duplicates
+
+    rows = SIGNATURE_SIZE // LSH_BANDS
+    buckets: dict[tuple[int, bytes], list[str]] = {}
+    for name in kept:
+        if signatures[name] is None:
+            continue
+        raw = bytes.fromhex(signatures[name])
+        for band in range(LSH_BANDS):
+            buckets.setdefault((band, raw[band * rows * 4 : (band + 1) * rows * 4]), []).append(name)
+
+    parent = {name: name for name in kept}
+
+    def _root(name: str) -> str:
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    checked: set[tuple[str, str]] = set()
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1 :]:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                if signature_similarity(signatures[a], signatures[b]) >= threshold:
+                    ra, rb = _root(a), _root(b)
+                    if ra != rb:
+                        first, second = sorted((ra, rb), key=_keep_first)
+                        parent[second] = first
+    for name in kept:
+        root = _root(name)
+        if root != name:
+            duplicates[name] = Duplicate(root, signature_similarity(signatures[name], signatures[root]), False)
+    # Copies of a replay that turned out to be a near-duplicate follow it to its group's original
+    for name, duplicate in list(duplicates.items()):
+        root = _root(duplicate.original)
+        if duplicate.exact and root != duplicate.original:
+            duplicates[name] = duplicates[duplicate.original]
+    return duplicates
+
+
+def print_duplicates(duplicates: dict[str, Duplicate], *, limit: int = 20) -> None:
+    if not duplicates:
+        return
+    exact = sum(1 for d in duplicates.values() if d.exact)
+    print(
+        f"⚠️  {len(duplicates)} doublon(s) ignoré(s): {exact} identique(s), "
+        f"{len(duplicates) - exact} quasi-identique(s)"
+    )
+    for name, duplicate in list(duplicates.items())[:limit]:
+        similarity = "" if duplicate.exact else f" (similarité {duplicate.similarity:.2f})"
+        print(f"  - {name} = {duplicate.original}{similarity}")
+
+
+class KnownContent:
+    """
+    Replay names by content hash, for the scraper: replays whose plays are already in the archive are
+    not saved again. Safe to share between threads.
+    """
+
+    def __init__(self, names: dict[str, str] | None = None):
+        self._names: dict[str, str] = dict(names or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_manifest(cls, manifest: Any) -> "KnownContent":
+        """Content of the replays recorded in a ReplayManifest (see replay_manifest.py) that still exist."""
+        return cls({fingerprint.content: name for name, fingerprint in manifest.fingerprints()})
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def claim(self, name: str, plays: list[dict[str, Any]]) -> str | None:
+        """Register replay `name`; returns the name already holding the same plays, or None if they are new."""
+        if not plays:
+            return None
+        content = plays_content_hash(plays)
+        with self._lock:
+            known = self._names.setdefault(content, name)
+        return None if known == name else known
+
+    def release(self, name: str, plays: list[dict[str, Any]]) -> None:
+        """Undo claim(name, plays), e.g. when the replay could not be saved after all."""
+        if not plays:
+            return
+        content = plays_content_hash(plays)
+        with self._lock:
+            if self._names.get(content) == name:
+                del self._names[content]
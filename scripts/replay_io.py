@@ -0,0 +1,229 @@
+"""
+Access to DuelingBook replay JSON files, plain or compressed.
+
+Replays are stored as `<replay>.json` (indented JSON, as scraped), `<replay>.json.gz` or
+`<replay>.json.zst` (compact JSON, gzip / zstandard). The compressed files are about 10x smaller on
+disk and to read. Readers go through this module and never see the difference:
+  - list_replays(dir)         one path per replay, whatever its format
+  - replay_name(path)         logical name "<replay>.json" (the "file" column of the matches CSV)
+  - resolve_replay(dir, name) stored file of a logical name
+  - load_replay(path)         parsed JSON
+  - iter_plays(path)          streaming reader
+
+A replay is one large object whose `plays` array holds most of the bytes (every play embeds full
+card dicts). `iter_plays` reads the file in chunks and decodes one play at a time, so a caller that
+only needs a few events can stop early without parsing (or holding in memory) the rest of the file.
+
+Usage:
+  from replay_io import iter_plays
+  for play in iter_plays(path):
+      if play["play"] == "RPS":
+          break
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+CHUNK_SIZE = 64 * 1024
+
+# Storage format -> file suffix; a replay's logical name always ends in ".json"
+REPLAY_SUFFIXES = {"json": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+COMPRESSIONS = tuple(REPLAY_SUFFIXES)
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstandard is not installed. Install it with: pip install zstandard") from e
+    return zstandard
+
+
+def replay_format(path: Path | str) -> str:
+    name = str(path)
+    if name.endswith(REPLAY_SUFFIXES["gzip"]):
+        return "gzip"
+    if name.endswith(REPLAY_SUFFIXES["zstd"]):
+        return "zstd"
+    return "json"
+
+
+def replay_name(path: Path | str) -> str:
+    """Logical file name of a stored replay: 'x.json.gz' -> 'x.json' (plain files keep their name)."""
+    name = Path(path).name
+    fmt = replay_format(name)
+    if fmt == "json":
+        return name
+    return name[: -len(REPLAY_SUFFIXES[fmt])] + REPLAY_SUFFIXES["json"]
+
+
+def replay_path(out_dir: Path, replay_id: str, compression: str = "json") -> Path:
+    return out_dir / (replay_id + REPLAY_SUFFIXES[compression])
+
+
+def resolve_replay(replays_dir: Path, name: str) -> Path | None:
+    """Stored file of a logical replay name (e.g. from the matches CSV) in any format, or None."""
+    stem = name[: -len(".json")] if name.endswith(".json") else name
+    for suffix in REPLAY_SUFFIXES.values():
+        path = replays_dir / (stem + suffix)
+        if path.is_file():
+            return path
+    return None
+
+
+def list_replays(replays_dir: Path) -> list[Path]:
+    """
+    Replay files of a directory, one per replay sorted by logical name. If a replay is stored in
+    several formats (interrupted migration), the plain JSON file is used.
+    """
+    found: dict[str, Path] = {}
+    for suffix in REPLAY_SUFFIXES.values():
+        for path in replays_dir.glob("*" + suffix):
+            if path.is_file():
+                found.setdefault(replay_name(path), path)
+    return [found[name] for name in sorted(found)]
+
+
+def read_replay_bytes(path: Path | str) -> bytes:
+    """Decompressed JSON bytes of a replay."""
+    fmt = replay_format(path)
+    with open(path, "rb") as f:
+        if fmt == "gzip":
+            return gzip.decompress(f.read())
+        if fmt == "zstd":
+            return _zstd().ZstdDecompressor().stream_reader(f).read()
+        return f.read()
+
+
+def load_replay(path: Path | str) -> dict[str, Any]:
+    return json.loads(read_replay_bytes(path))
+
+
+def open_replay(path: Path | str) -> TextIO:
+    """Text stream over a replay's (decompressed) JSON."""
+    fmt = replay_format(path)
+    if fmt == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if fmt == "zstd":
+        return io.TextIOWrapper(_zstd().ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def encode_replay(data: dict[str, Any], compression: str = "json") -> bytes:
+    """File content of a replay: indented JSON as scraped, or compact JSON compressed."""
+    if compression == "json":
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if compression == "gzip":
+        # mtime=0: the same replay always gives the same bytes (stable content hashes)
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == "zstd":
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    raise ValueError(f"Unknown replay compression: {compression} (expected one of {', '.join(COMPRESSIONS)})")
+
+
+def save_replay(data: dict[str, Any], path: Path | str) -> Path:
+    """Write a replay in the format given by the path's suffix (atomically: tmp file + rename)."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(encode_replay(data, replay_format(path)))
+    os.replace(tmp, path)
+    return path
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _ChunkReader:
+    """Text buffer over a file, refilled on demand and trimmed as it is consumed."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            # Drop what has already been decoded so the buffer stays around one chunk
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more data until it is complete."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number cut at the chunk boundary decodes fine but is incomplete:
+            # only accept the value once the following character is in the buffer.
+            if end >= len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_plays(path: Path | str, *, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Yield the entries of the replay's top-level `plays` array one by one, in file order.
+    Other top-level keys are skipped; nothing after `plays` is read. Breaking out of the loop
+    (or closing the generator) stops reading the file.
+    """
+    with open_replay(path) as f:
+        reader = _ChunkReader(f, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "plays":
+                reader.expect("[")
+                if reader.peek() == "]":
+                    return
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        return
+                    reader.expect(",")
+            reader.value()
+            if reader.peek() == "}":
+                return
+            reader.expect(",")
@@ -0,0 +1,139 @@
+"""
+Persistent manifest of already-ingested replay files.
+
+Each entry is keyed by the replay path and records the file size, mtime and SHA-256 of its content
+together with the match row, card usage and content fingerprint (see replay_dedup.py) extracted
+from it. On a rerun, a file whose size and mtime are unchanged is reused straight from the manifest;
+if only the mtime moved, the content hash decides. Entries for files that disappeared are dropped when the manifest is saved.
+
+Used by get_csv_from_json.py (see --manifest / --full-rebuild).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator
+
+from replay_dedup import ReplayFingerprint
+from replay_io import replay_name
+
+# Bump when the extracted row changes shape, so stale manifests are ignored
+MANIFEST_VERSION = 3
+
+
+def file_sha256(path: Path, *, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_manifest_path(replays_dir: Path) -> Path:
+    # Next to the replays directory (not inside it, so it is never mistaken for a replay)
+    replays_dir = replays_dir.expanduser().resolve()
+    return replays_dir.parent / f"{replays_dir.name}_manifest.json"
+
+
+class ReplayManifest:
+    def __init__(self, path: Path, entries: dict[str, dict[str, Any]] | None = None):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = entries or {}
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "ReplayManifest":
+        path = path.expanduser().resolve()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Manifest illisible ({path.name}: {e}) — reconstruction complète")
+            return cls(path)
+        if obj.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, obj.get("entries", {}))
+
+    def lookup(
+        self, path: Path, *, need_plays: bool = True, need_fingerprint: bool = False
+    ) -> tuple[
+        dict[str, Any] | None, list[str], list[tuple[str | None, str, str]] | None, ReplayFingerprint | None
+    ] | None:
+        """
+        Return the cached (row, plays, card usage, fingerprint) for `path`, or None if the file is new or changed.
+        Entries recorded without plays (streaming mode) only count when need_plays is False, and entries
+        recorded without fingerprint (dedup disabled) only when need_fingerprint is False.
+        """
+        entry = self.entries.get(str(path))
+        if entry is None or (need_plays and entry.get("plays") is None):
+            return None
+        if need_fingerprint and entry.get("fingerprint") is None:
+            return None
+        st = path.stat()
+        if entry["size"] != st.st_size:
+            return None
+        if entry["mtime_ns"] != st.st_mtime_ns:
+            # Touched but maybe not modified: trust the content hash
+            if entry["sha256"] != file_sha256(path):
+                return None
+            entry["mtime_ns"] = st.st_mtime_ns
+        self.hits += 1
+        card_usage = entry.get("card_usage")
+        if not need_plays:
+            card_usage = None
+        elif card_usage is not None:
+            card_usage = [tuple(record) for record in card_usage]
+        fingerprint = entry.get("fingerprint")
+        return entry["row"], entry.get("plays") or [], card_usage, fingerprint and ReplayFingerprint(*fingerprint)
+
+    def sha256(self, path: Path) -> str | None:
+        """Content hash recorded for `path` (valid once lookup() returned its entry)."""
+        entry = self.entries.get(str(path))
+        return None if entry is None else entry["sha256"]
+
+    def fingerprints(self) -> Iterator[tuple[str, ReplayFingerprint]]:
+        """(replay name, fingerprint) of the recorded replays that still exist."""
+        for key, entry in self.entries.items():
+            if entry.get("fingerprint") is not None and os.path.exists(key):
+                yield replay_name(Path(key)), ReplayFingerprint(*entry["fingerprint"])
+
+    def record(
+        self,
+        path: Path,
+        row: dict[str, Any] | None,
+        plays: list[str] | None,
+        card_usage: list[tuple[str | None, str, str]] | None = None,
+        fingerprint: ReplayFingerprint | None = None,
+        *,
+        sha256: str | None = None,
+    ) -> None:
+        st = path.stat()
+        self.entries[str(path)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha256 or file_sha256(path),
+            "row": row,
+            "plays": plays,
+            "card_usage": card_usage,
+            "fingerprint": fingerprint,
+        }
+
+    def prune(self, paths: list[Path]) -> int:
+        """Drop entries whose file is not in `paths`; returns how many were removed."""
+        keep = {str(p) for p in paths}
+        stale = [k for k in self.entries if k not in keep]
+        for k in stale:
+            del self.entries[k]
+        return len(stale)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,193 @@
+"""
+Replay warehouse: columnar (Parquet) copy of the replay JSON archive.
+
+Converts data/db_replays/*.json into two tables:
+  - matches.parquet : one row per replay with an RPS play (same columns as the matches CSV, before
+                      the provider swap)
+  - plays.parquet   : one row per play (file, then the event columns of play_events.py: seq, seconds,
+                      play, username, card_id, card_name, zone, amount)
+  - card_catalog/   : attributes of every card id met in the plays (see card_catalog.py), memory-mapped
+
+Repeated strings (file names, play types, usernames, card names) are stored as dictionary-encoded
+categoricals. get_csv_from_json.py and DataProcessing_for_YGO.py can read the warehouse (--warehouse)
+instead of re-parsing the JSON directory. Duplicate replays (see replay_dedup.py) are left out of both
+tables unless --keep-duplicates is given.
+
+Requires pyarrow (optional dependency: pip install pyarrow).
+
+Usage:
+  python scripts/replay_warehouse.py --replays-dir data/db_replays --out data/replay_warehouse
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from card_catalog import CardCatalog, replay_cards
+from get_csv_from_json import extract_replay, map_replays
+from play_events import play_columns
+from replay_dedup import (
+    EMPTY_PLAYS_CONTENT,
+    NEAR_DUPLICATE_THRESHOLD,
+    ReplayFingerprint,
+    duplicate_key,
+    find_duplicates,
+    print_duplicates,
+    replay_fingerprint,
+)
+from replay_io import list_replays, load_replay, replay_name
+from replay_manifest import file_sha256
+
+MATCHES_FILE = "matches.parquet"
+PLAYS_FILE = "plays.parquet"
+CATALOG_DIR = "card_catalog"
+
+MATCH_CATEGORICALS = ["player1", "player2"]
+PLAY_CATEGORICALS = ["file", "play", "username", "card_name", "zone"]
+
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("pyarrow is not installed. Install it with: pip install pyarrow") from e
+
+
+def flatten_replay(
+    path: Path,
+) -> tuple[dict[str, Any] | None, dict[str, list[Any]], ReplayFingerprint, dict[int, dict[str, Any]]]:
+    """
+    Parse one replay into (match row or None, plays columns, fingerprint, card objects by id).
+    Top-level so it can be shipped to worker processes.
+    """
+    data = load_replay(path)
+    plays = data.get("plays", [])
+    row = extract_replay(data).match_row(replay_name(path))
+    return row, play_columns(plays), replay_fingerprint(plays), replay_cards(plays)
+
+
+def build_warehouse(
+    replays_dir: Path,
+    *,
+    workers: int = 1,
+    dedup: bool = True,
+    near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    cards: dict[int, dict[str, Any]] | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(matches, plays) tables; with `cards`, the card objects met are added to it by id (for the catalog)."""
+    replays_dir = replays_dir.expanduser().resolve()
+    json_paths = list_replays(replays_dir)
+    flattened = map_replays(flatten_replay, json_paths, workers)
+
+    duplicates = {}
+    if dedup:
+        duplicates = find_duplicates(
+            [
+                # Only replays without plays are keyed by their file digest
+                duplicate_key(replay_name(path), fp, file_sha256(path) if fp.content == EMPTY_PLAYS_CONTENT else None)
+                for path, (_, _, fp, _) in zip(json_paths, flattened)
+            ],
+            threshold=near_duplicate_threshold,
+        )
+        print_duplicates(duplicates)
+
+    rows: list[dict[str, Any]] = []
+    plays_frames: list[pd.DataFrame] = []
+    for path, (row, columns, _, replay_card_objects) in zip(json_paths, flattened):
+        if replay_name(path) in duplicates:
+            continue
+        if cards is not None:
+            cards.update(replay_card_objects)
+        if row is None:
+            print(f"⚠️  Aucun play RPS trouvé dans {path.name} - absent de la table matches")
+        else:
+            rows.append(row)
+        frame = pd.DataFrame(columns)
+        frame.insert(0, "file", replay_name(path))
+        plays_frames.append(frame)
+
+    matches = pd.DataFrame(rows)
+    for col in MATCH_CATEGORICALS:
+        if col in matches:
+            matches[col] = matches[col].astype("category")
+
+    plays = pd.concat(plays_frames, ignore_index=True) if plays_frames else pd.DataFrame(columns=["file", "seq"])
+    plays["seq"] = plays["seq"].astype("int32")
+    for col in ("seconds", "card_id", "amount"):
+        plays[col] = plays[col].astype("Int32")
+    for col in PLAY_CATEGORICALS:
+        plays[col] = plays[col].astype("category")
+    return matches, plays
+
+
+def write_warehouse(matches: pd.DataFrame, plays: pd.DataFrame, out_dir: Path) -> Path:
+    _require_pyarrow()
+    out_dir = out_dir.expanduser().resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for df, name in ((matches, MATCHES_FILE), (plays, PLAYS_FILE)):
+        tmp = out_dir / (name + ".tmp")
+        df.to_parquet(tmp, index=False, compression="zstd")
+        os.replace(tmp, out_dir / name)
+    return out_dir
+
+
+def is_warehouse(path: Path) -> bool:
+    return (Path(path) / MATCHES_FILE).is_file()
+
+
+def load_matches(warehouse_dir: Path) -> pd.DataFrame:
+    _require_pyarrow()
+    return pd.read_parquet(Path(warehouse_dir).expanduser().resolve() / MATCHES_FILE)
+
+
+def load_plays(
+    warehouse_dir: Path,
+    *,
+    columns: list[str] | None = None,
+    filters: list[tuple[str, str, Any]] | None = None,
+) -> pd.DataFrame:
+    """Load the plays table; `columns` and pyarrow `filters` are pushed down to the Parquet reader."""
+    _require_pyarrow()
+    return pd.read_parquet(
+        Path(warehouse_dir).expanduser().resolve() / PLAYS_FILE, columns=columns, filters=filters
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a replay JSON directory into a Parquet warehouse.")
+    parser.add_argument("--replays-dir", type=Path, default=Path("data/db_replays"))
+    parser.add_argument("--out", type=Path, default=Path("data/replay_warehouse"))
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to parse replays (0 = one per CPU)")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Keep replays duplicating another replay")
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=NEAR_DUPLICATE_THRESHOLD,
+        help="Estimated play similarity from which two replays count as the same duel (0 = exact copies only)",
+    )
+    args = parser.parse_args(argv)
+
+    _require_pyarrow()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    cards: dict[int, dict[str, Any]] = {}
+    matches, plays = build_warehouse(
+        args.replays_dir,
+        cards=cards,
+        workers=workers,
+        dedup=not args.keep_duplicates,
+        near_duplicate_threshold=args.near_duplicate_threshold,
+    )
+    out_dir = write_warehouse(matches, plays, args.out)
+    catalog = CardCatalog.from_cards(cards)
+    catalog.save(out_dir / CATALOG_DIR)
+    print(f"✅ Warehouse écrit dans: {out_dir} (matches={len(matches)}, plays={len(plays)}, cards={len(catalog)})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,471 @@
+"""
+Single entry point for the whole pipeline: scrape -> matches -> features -> train, run as a DAG with a
+content-addressed artifact cache.
+
+Every stage output is stored under <cache-dir>/<stage>/<key>/, where the key is a hash of
+  - the stage parameters (provider, deck filter, test_size, random_state, ...),
+  - the content hash of each upstream stage output (or, for the matches stage, of the replay files),
+  - the source code of the scripts the stage runs (its entry scripts and every script they import).
+A stage whose key is already in the cache is skipped and its artifact reused; downstream stages only
+load the artifacts they actually need. Changing only --random-state therefore retrains on the cached
+features without re-reading any replay JSON, and a rebuilt stage whose output did not change leaves
+the downstream keys (and caches) valid.
+
+Usage:
+  python scripts/run_pipeline.py --replays-dir data/db_replays --provider "Fryderyk Chopin"
+  python scripts/run_pipeline.py --random-state 7           # only the train stage runs
+  python scripts/run_pipeline.py --links-file links.csv     # scrape new replays first
+  python scripts/run_pipeline.py --force matches            # rebuild a stage (and whatever its output changes)
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from replay_io import list_replays
+from replay_manifest import default_manifest_path, file_sha256
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+_SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Bump when the cache layout changes
+CACHE_VERSION = 1
+
+# Entry scripts of each stage: editing one of them, or a script they import, invalidates the stage
+STAGE_SOURCES = {
+    "scrape": ["get_db_match_selenium_clean.py"],
+    "matches": ["get_csv_from_json.py", "pipeline.py"],
+    "features": ["DataProcessing_for_YGO.py", "pipeline.py"],
+    "train": ["ML_for_YGO.py", "pipeline.py"],
+}
+# Glue shared by every stage: it imports the entry scripts of all of them, so its imports are not followed
+GLUE_SOURCES = {"pipeline.py"}
+
+Outputs = dict[str, Any]
+
+
+def _hash_json(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _local_imports(name: str) -> set[str]:
+    """Scripts of this directory imported by `name`, at module level or inside functions."""
+    tree = ast.parse((_SCRIPTS_DIR / name).read_text(encoding="utf-8"))
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module)
+    return {f"{module}.py" for module in modules if (_SCRIPTS_DIR / f"{module}.py").is_file()}
+
+
+@lru_cache(maxsize=None)
+def stage_sources(stage: str) -> tuple[str, ...]:
+    """Entry scripts of the stage and, transitively, the scripts they import (sorted)."""
+    seen: set[str] = set()
+    todo = list(STAGE_SOURCES.get(stage, []))
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name not in GLUE_SOURCES:
+            todo.extend(_local_imports(name))
+    return tuple(sorted(seen))
+
+
+def source_digest(stage: str) -> str:
+    h = hashlib.sha256()
+    for name in stage_sources(stage):
+        h.update(name.encode("utf-8"))
+        h.update((_SCRIPTS_DIR / name).read_bytes())
+    return h.hexdigest()
+
+
+def outputs_digest(outputs: Outputs) -> str:
+    """Content hash of a stage's outputs (DataFrames / Series hashed by value, other objects as JSON)."""
+    h = hashlib.sha256()
+    for name in sorted(outputs):
+        value = outputs[name]
+        h.update(name.encode("utf-8"))
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            frame = value.to_frame() if isinstance(value, pd.Series) else value
+            h.update("\x1f".join(map(str, frame.columns)).encode("utf-8"))
+            h.update("\x1f".join(map(str, frame.dtypes)).encode("utf-8"))
+            h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def replays_digest(replays_dir: Path, digests_path: Path) -> str:
+    """
+    Content hash of the replay directory (names + SHA-256 of every file). Per-file hashes are kept in
+    digests_path and reused while a file's size and mtime are unchanged.
+    """
+    replays_dir = replays_dir.expanduser().resolve()
+    try:
+        with open(digests_path, "r", encoding="utf-8") as f:
+            known: dict[str, list[Any]] = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        known = {}
+    current: dict[str, list[Any]] = {}
+    h = hashlib.sha256()
+    for path in list_replays(replays_dir):
+        st = path.stat()
+        entry = known.get(path.name)
+        if entry is None or entry[:2] != [st.st_size, st.st_mtime_ns]:
+            entry = [st.st_size, st.st_mtime_ns, file_sha256(path)]
+        current[path.name] = entry
+        h.update(f"{path.name}\x1f{entry[2]}\n".encode("utf-8"))
+    digests_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(digests_path, "w", encoding="utf-8") as f:
+        json.dump(current, f)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """Stage outputs on disk: <root>/<stage>/<key>/{meta.json, <output>.pkl}."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser().resolve()
+
+    def path(self, stage: str, key: str) -> Path:
+        return self.root / stage / key
+
+    def lookup(self, stage: str, key: str) -> dict[str, Any] | None:
+        try:
+            with open(self.path(stage, key) / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return meta if meta.get("cache_version") == CACHE_VERSION else None
+
+    def load(self, stage: str, key: str) -> Outputs:
+        meta = self.lookup(stage, key)
+        if meta is None:
+            raise KeyError(f"No cached artifact for stage {stage!r} (key {key[:12]})")
+        return {name: pd.read_pickle(self.path(stage, key) / f"{name}.pkl") for name in meta["outputs"]}
+
+    def store(self, stage: str, key: str, outputs: Outputs, meta: dict[str, Any]) -> Path:
+        final = self.path(stage, key)
+        tmp = final.with_name(final.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, value in outputs.items():
+            pd.to_pickle(value, tmp / f"{name}.pkl")
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({**meta, "cache_version": CACHE_VERSION, "outputs": sorted(outputs)}, f, indent=2, default=str)
+        # Written to a temporary directory and renamed in one step: a crash never leaves a half-written entry
+        shutil.rmtree(final, ignore_errors=True)
+        tmp.rename(final)
+        return final
+
+
+@dataclass
+class Stage:
+    name: str
+    deps: tuple[str, ...]
+    params: dict[str, Any]
+    compute: Callable[[dict[str, Outputs]], Outputs]
+    # Extra key material evaluated when the stage is reached (e.g. the replay files, once scraping is done)
+    key_inputs: Callable[[], dict[str, Any]] | None = None
+    # Whether a fresh result may be cached (e.g. not when some replays failed to download)
+    cacheable: Callable[[Outputs], bool] = field(default=lambda outputs: True)
+
+
+def topological_order(stages: list[Stage]) -> list[Stage]:
+    by_name = {s.name: s for s in stages}
+    ordered: list[Stage] = []
+    state: dict[str, str] = {}
+
+    def visit(stage: Stage) -> None:
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Pipeline has a cycle through stage {stage.name!r}")
+        state[stage.name] = "visiting"
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage {dep!r}")
+            visit(by_name[dep])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def run_dag(
+    stages: list[Stage], cache: ArtifactCache, *, force: set[str] | None = None
+) -> tuple[dict[str, Outputs], list[dict[str, Any]]]:
+    """
+    Run the stages in dependency order, skipping those whose key is cached. Returns the outputs of every
+    stage that was run or had to be loaded, and one report entry per stage.
+    """
+    force = force or set()
+    keys: dict[str, str] = {}
+    output_hashes: dict[str, str] = {}
+    outputs: dict[str, Outputs] = {}
+    report: list[dict[str, Any]] = []
+
+    def load(name: str) -> Outputs:
+        if name not in outputs:
+            outputs[name] = cache.load(name, keys[name])
+        return outputs[name]
+
+    for stage in topological_order(stages):
+        start = time.perf_counter()
+        key_material = {
+            "stage": stage.name,
+            "source": source_digest(stage.name),
+            "params": stage.params,
+            "deps": {dep: output_hashes[dep] for dep in stage.deps},
+            "inputs": stage.key_inputs() if stage.key_inputs else {},
+        }
+        key = keys[stage.name] = _hash_json(key_material)
+        meta = None if stage.name in force else cache.lookup(stage.name, key)
+        if meta is not None:
+            output_hashes[stage.name] = meta["output_hash"]
+            status = "cached"
+        else:
+            result = stage.compute({dep: load(dep) for dep in stage.deps})
+            outputs[stage.name] = result
+            output_hashes[stage.name] = outputs_digest(result)
+            if stage.cacheable(result):
+                cache.store(
+                    stage.name,
+                    key,
+                    result,
+                    {
+                        **key_material,
+                        "output_hash": output_hashes[stage.name],
+                        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    },
+                )
+                status = "ran"
+            else:
+                # Not cached: the stage reruns next time. Its output hash still keys the downstream stages.
+                status = "ran (not cached)"
+        report.append(
+            {"stage": stage.name, "status": status, "key": key, "seconds": round(time.perf_counter() - start, 3)}
+        )
+    return outputs, report
+
+
+def _scrape(upstream: dict[str, Outputs], *, links: list[str], out_dir: Path, strip_user_prefix: bool) -> Outputs:
+    from get_db_match_selenium_clean import scrape_one
+
+    codes = [scrape_one(link, out_dir=out_dir, strip_user_prefix=strip_user_prefix) for link in links]
+    return {"scrape": {"links": len(links), "failures": sum(1 for rc in codes if rc != 0)}}
+
+
+def _matches(upstream: dict[str, Outputs], *, replays_dir: Path, provider: str | None, workers: int) -> Outputs:
+    from pipeline import build_matches
+
+    matches, card_index = build_matches(
+        replays_dir, provider=provider, workers=workers, manifest_path=default_manifest_path(replays_dir)
+    )
+    return {"matches": matches, "card_index": card_index}
+
+
+def _features(
+    upstream: dict[str, Outputs],
+    *,
+    replays_dir: Path,
+    provider: str,
+    filter_wrong_deck: bool,
+    drop_indices: list[int],
+    encode_player2: bool,
+    turn_features: int,
+    workers: int,
+) -> Outputs:
+    from pipeline import build_feature_matrix
+
+    X, y = build_feature_matrix(
+        upstream["matches"]["matches"],
+        replays_dir,
+        card_index=upstream["matches"]["card_index"],
+        provider=provider,
+        filter_wrong_deck=filter_wrong_deck,
+        drop_indices=drop_indices or None,
+        encode_player2=encode_player2,
+        turn_features=turn_features,
+        workers=workers,
+    )
+    return {"X": X, "y": y}
+
+
+def _train(
+    upstream: dict[str, Outputs],
+    *,
+    test_size: float,
+    random_state: int,
+    cv: int,
+    cv_repeats: int,
+    params: dict[str, dict[str, Any]],
+    n_jobs: int,
+) -> Outputs:
+    from ML_for_YGO import cross_validate_models
+    from pipeline import train_models
+
+    X, y = upstream["features"]["X"], upstream["features"]["y"]
+    if cv:
+        results = cross_validate_models(
+            X, y, n_splits=cv, n_repeats=cv_repeats, random_state=random_state, n_jobs=n_jobs, params=params
+        )
+        return {
+            "scores": {k: r["mean"] for k, r in results.items()},
+            "errors": {k: r["std"] for k, r in results.items()},
+        }
+    scores = train_models(X, y, test_size=test_size, random_state=random_state, n_jobs=n_jobs, params=params)
+    return {"scores": scores, "errors": None}
+
+
+def build_stages(args: argparse.Namespace, cache: ArtifactCache) -> list[Stage]:
+    from ML_for_YGO import load_model_params
+
+    replays_dir = args.replays_dir.expanduser().resolve()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    stages = []
+
+    matches_deps: tuple[str, ...] = ()
+    if args.links_file:
+        from get_db_match_selenium_clean import read_links_from_file
+
+        links = read_links_from_file(args.links_file)
+        stages.append(
+            Stage(
+                "scrape",
+                (),
+                {"links": links, "strip_user_prefix": not args.keep_user_prefix, "out_dir": str(replays_dir)},
+                partial(_scrape, links=links, out_dir=replays_dir, strip_user_prefix=not args.keep_user_prefix),
+                cacheable=lambda outputs: outputs["scrape"]["failures"] == 0,
+            )
+        )
+        matches_deps = ("scrape",)
+
+    stages.append(
+        Stage(
+            "matches",
+            matches_deps,
+            {"provider": args.provider},
+            partial(_matches, replays_dir=replays_dir, provider=args.provider, workers=workers),
+            key_inputs=lambda: {"replays": replays_digest(replays_dir, cache.root / "replay_digests.json")},
+        )
+    )
+    stages.append(
+        Stage(
+            "features",
+            ("matches",),
+            {
+                "provider": args.provider,
+                "filter_wrong_deck": not args.no_deck_filter,
+                "drop_indices": args.drop_index,
+                "encode_player2": args.encode_player2,
+                "turn_features": args.turn_features,
+            },
+            partial(
+                _features,
+                replays_dir=replays_dir,
+                provider=args.provider,
+                filter_wrong_deck=not args.no_deck_filter,
+                drop_indices=args.drop_index,
+                encode_player2=args.encode_player2,
+                turn_features=args.turn_features,
+                workers=workers,
+            ),
+        )
+    )
+    model_params = load_model_params(args.params)
+    stages.append(
+        Stage(
+            "train",
+            ("features",),
+            {
+                "test_size": args.test_size,
+                "random_state": args.random_state,
+                "cv": args.cv,
+                "cv_repeats": args.cv_repeats,
+                "params": model_params,
+            },
+            partial(
+                _train,
+                test_size=args.test_size,
+                random_state=args.random_state,
+                cv=args.cv,
+                cv_repeats=args.cv_repeats,
+                params=model_params,
+                n_jobs=jobs,
+            ),
+        )
+    )
+    return stages
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run scrape -> matches -> features -> train with artifact caching.")
+    parser.add_argument("--replays-dir", type=Path, default=_PROJECT_ROOT / "data/db_replays")
+    parser.add_argument("--links-file", type=Path, default=None, help="Scrape these replays first (xlsx/csv/txt/json)")
+    parser.add_argument("--keep-user-prefix", action="store_true", help="See get_db_match_selenium_clean.py")
+    parser.add_argument("--provider", type=str, default="Fryderyk Chopin")
+    parser.add_argument("--no-deck-filter", action="store_true")
+    parser.add_argument("--drop-index", type=int, action="append", default=[])
+    parser.add_argument("--encode-player2", action="store_true")
+    parser.add_argument("--turn-features", type=int, default=0, metavar="TURNS", help="See DataProcessing_for_YGO.py")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=1)
+    parser.add_argument("--cv", type=int, default=0, metavar="K", help="Repeated stratified K-fold (0 = one split)")
+    parser.add_argument("--cv-repeats", type=int, default=1)
+    parser.add_argument("--params", type=Path, default=_PROJECT_ROOT / "data/best_params.json")
+    parser.add_argument("--workers", type=int, default=1, help="Replay parsing processes (0 = one per CPU)")
+    parser.add_argument("--jobs", type=int, default=1, help="Model fitting processes (0 = one per CPU)")
+    parser.add_argument("--cache-dir", type=Path, default=_PROJECT_ROOT / "data/pipeline_cache")
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        choices=list(STAGE_SOURCES),
+        help="Rerun this stage even if cached (repeatable); downstream stages rerun if its output changes",
+    )
+    parser.add_argument("--plot-out", type=Path, default=_PROJECT_ROOT / "data/model_comparison.png")
+    parser.add_argument("--no-plot", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache = ArtifactCache(args.cache_dir)
+    outputs, report = run_dag(build_stages(args, cache), cache, force=set(args.force))
+
+    print("=" * 60)
+    for entry in report:
+        print(f"{entry['stage']:<9} {entry['status']:<17} {entry['seconds']:>8.3f}s  key={entry['key'][:12]}")
+    print("=" * 60)
+
+    train_key = next(entry["key"] for entry in report if entry["stage"] == "train")
+    train = outputs.get("train") or cache.load("train", train_key)
+    for k, v in train["scores"].items():
+        print(f"{k}: {v}")
+    if not args.no_plot:
+        from ML_for_YGO import plot_model_scores
+
+        plot_model_scores(train["scores"], out_path=args.plot_out, errors=train["errors"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
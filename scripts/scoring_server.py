@@ -0,0 +1,361 @@
+"""
+Local HTTP scoring service for starting hands (standard library only).
+
+Keeps a model artifact (ML_for_YGO.py --save-model) in memory and reloads it when the file changes.
+Concurrent requests are put on a bounded queue and scored together by a micro-batching thread, so
+one predict_proba call serves many requests.
+
+Endpoints:
+  POST /predict   {"hand": "A%%%%B%%%%..."} or {"hands": [...], "hands_player2": [...], "rps_winner": true}
+                  -> {"win_probability": 0.61} or {"win_probabilities": [...]}
+  GET  /metrics   latency p50/p99, throughput, queue and batch counters, loaded model
+  GET  /health
+
+Usage:
+  python scripts/scoring_server.py --model data/model.pkl --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from predict_hands import HandScorer
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+class ModelCache:
+    """Current HandScorer of an artifact file, reloaded when the file's mtime/size change."""
+
+    def __init__(self, path: Path, *, check_interval: float = 1.0):
+        self.path = Path(path).expanduser().resolve()
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._stamp = self._file_stamp()
+        self.scorer = HandScorer.from_path(self.path)
+        self._next_check = time.monotonic() + check_interval
+
+    def _file_stamp(self) -> tuple[int, int]:
+        st = self.path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def get(self) -> HandScorer:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    self.scorer = HandScorer.from_path(self.path)
+                    self._stamp = stamp
+                    self.reloads += 1
+                    print(f"Model reloaded: {self.scorer.artifact['model_name']} ({self.path.name})")
+            except (OSError, ValueError, EOFError) as e:
+                # Artifact being rewritten or invalid: keep serving the previous model
+                print(f"⚠️  Model reload failed ({e}); keeping the previous model")
+        return self.scorer
+
+
+@dataclass
+class _Request:
+    hands: list[str]
+    hands_player2: list[str] | None
+    rps_winner: list[bool]
+    future: Future = field(default_factory=Future)
+
+
+class Metrics:
+    def __init__(self, window: int = 10_000):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.completed: deque[float] = deque(maxlen=window)  # completion times, for recent throughput
+        self.requests = 0
+        self.hands = 0
+        self.rejected = 0
+        self.errors = 0
+        self.timed_out = 0
+        self.batches = 0
+
+    def observe(self, latency: float, n_hands: int) -> None:
+        with self.lock:
+            self.requests += 1
+            self.hands += n_hands
+            self.latencies.append(latency)
+            self.completed.append(time.monotonic())
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000.0
+            now = time.monotonic()
+            recent = sum(1 for t in self.completed if now - t <= 10.0)
+            uptime = now - self.started
+            return {
+                "uptime_s": round(uptime, 3),
+                "requests_total": self.requests,
+                "hands_total": self.hands,
+                "rejected_total": self.rejected,
+                "errors_total": self.errors,
+                "timed_out_total": self.timed_out,
+                "batches_total": self.batches,
+                "mean_batch_size": round(self.requests / self.batches, 3) if self.batches else 0.0,
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                "latency_ms_p99": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                "throughput_rps_10s": round(recent / min(10.0, uptime), 3) if uptime > 0 else 0.0,
+                "throughput_rps_total": round(self.requests / uptime, 3) if uptime > 0 else 0.0,
+            }
+
+
+class MicroBatcher(threading.Thread):
+    """Drains the request queue in batches of up to max_batch requests, waiting at most max_wait seconds."""
+
+    def __init__(self, models: ModelCache, metrics: Metrics, *, queue_size: int, max_batch: int, max_wait: float):
+        super().__init__(daemon=True)
+        self.models = models
+        self.metrics = metrics
+        self.requests: queue.Queue[_Request] = queue.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+    def submit(self, request: _Request) -> bool:
+        """Enqueue a request; False if the queue is full (the caller should reject it)."""
+        try:
+            self.requests.put_nowait(request)
+            return True
+        except queue.Full:
+            with self.metrics.lock:
+                self.metrics.rejected += 1
+            return False
+
+    def _collect(self) -> list[_Request]:
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _score(scorer: Any, batch: list[_Request]) -> np.ndarray:
+        hands = [h for r in batch for h in r.hands]
+        with_p2 = any(r.hands_player2 is not None for r in batch)
+        hands_p2 = [h for r in batch for h in (r.hands_player2 or [""] * len(r.hands))] if with_p2 else None
+        rps = np.array([v for r in batch for v in r.rps_winner], dtype=bool)
+        return scorer.predict_proba(hands, hands_player2=hands_p2, rps_winner=rps)
+
+    def run(self) -> None:
+        while True:
+            # Requests whose client already timed out were cancelled: do not score them
+            batch = [r for r in self._collect() if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                scorer = self.models.get()
+            except Exception as e:  # noqa: BLE001 - reported to every waiting client
+                self._fail(batch, e)
+                continue
+            try:
+                probabilities = self._score(scorer, batch)
+            except Exception as e:  # noqa: BLE001
+                if len(batch) > 1:
+                    # One bad request must not fail the others: score them one by one
+                    self._score_each(scorer, batch)
+                else:
+                    self._fail(batch, e)
+                continue
+            with self.metrics.lock:
+                self.metrics.batches += 1
+            start = 0
+            for r in batch:
+                r.future.set_result(probabilities[start : start + len(r.hands)].tolist())
+                start += len(r.hands)
+
+    def _fail(self, batch: list[_Request], error: Exception) -> None:
+        with self.metrics.lock:
+            self.metrics.errors += len(batch)
+        for r in batch:
+            r.future.set_exception(error)
+
+    def _score_each(self, scorer: Any, batch: list[_Request]) -> None:
+        for r in batch:
+            try:
+                probabilities = self._score(scorer, [r])
+            except Exception as e:  # noqa: BLE001 - reported to this client only
+                self._fail([r], e)
+                continue
+            with self.metrics.lock:
+                self.metrics.batches += 1
+            r.future.set_result(probabilities.tolist())
+
+
+def _is_hand(hand: Any) -> bool:
+    """A '%%%%'-separated hand string, or a list of at most 5 card names."""
+    if isinstance(hand, str):
+        return True
+    return isinstance(hand, list) and len(hand) <= 5 and all(isinstance(card, str) for card in hand)
+
+
+def parse_predict_body(body: dict[str, Any]) -> tuple[_Request, bool]:
+    """Request from a /predict JSON body; the flag tells whether it was a single hand."""
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+    single = "hand" in body
+    hands = [body["hand"]] if single else body.get("hands")
+    if not isinstance(hands, list) or not all(_is_hand(h) for h in hands):
+        raise ValueError("expected 'hand' or 'hands': hand strings or lists of at most 5 card names")
+    hands_p2 = body.get("hands_player2")
+    if single and "hand_player2" in body:
+        hands_p2 = [body["hand_player2"]]
+    if hands_p2 is not None and (not isinstance(hands_p2, list) or not all(_is_hand(h) for h in hands_p2)):
+        raise ValueError("expected 'hand_player2' or 'hands_player2': hand strings or lists of at most 5 card names")
+    if hands_p2 is not None and len(hands_p2) != len(hands):
+        raise ValueError("'hands_player2' must have the same length as 'hands'")
+    rps = body.get("rps_winner", False)
+    if not isinstance(rps, (bool, int, list)) or (
+        isinstance(rps, list) and not all(isinstance(v, (bool, int)) for v in rps)
+    ):
+        raise ValueError("'rps_winner' must be a boolean or a list of booleans")
+    rps_list = [bool(v) for v in rps] if isinstance(rps, list) else [bool(rps)] * len(hands)
+    if len(rps_list) != len(hands):
+        raise ValueError("'rps_winner' must be a boolean or a list as long as 'hands'")
+    return _Request(hands=hands, hands_player2=hands_p2, rps_winner=rps_list), single
+
+
+def make_handler(batcher: MicroBatcher, metrics: Metrics, models: ModelCache, *, timeout: float):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - silence per-request logs
+            pass
+
+        def _send_json(self, status: int, obj: Any) -> None:
+            payload = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/metrics":
+                snapshot = metrics.snapshot()
+                snapshot["queue_depth"] = batcher.requests.qsize()
+                snapshot["queue_capacity"] = batcher.requests.maxsize
+                snapshot["model"] = models.scorer.artifact["model_name"]
+                snapshot["model_data_hash"] = models.scorer.artifact["data_hash"]
+                snapshot["model_reloads"] = models.reloads
+                self._send_json(200, snapshot)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self.path != "/predict":
+                self._send_json(404, {"error": "not found"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request, single = parse_predict_body(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, TypeError, AttributeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            if not batcher.submit(request):
+                self._send_json(503, {"error": "request queue full"})
+                return
+            try:
+                probabilities = request.future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # Still queued: cancelled, so the batcher skips it (already being scored: the result is dropped)
+                request.future.cancel()
+                with metrics.lock:
+                    metrics.timed_out += 1
+                self._send_json(504, {"error": "scoring timed out"})
+                return
+            except Exception as e:  # noqa: BLE001
+                self._send_json(500, {"error": str(e)})
+                return
+            metrics.observe(time.perf_counter() - start, len(request.hands))
+            if single:
+                self._send_json(200, {"win_probability": probabilities[0]})
+            else:
+                self._send_json(200, {"win_probabilities": probabilities})
+
+    return ScoringHandler
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) resets connections under a few dozen concurrent clients
+    request_queue_size = 512
+
+
+def make_server(
+    model_path: Path,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    queue_size: int = 1024,
+    max_batch: int = 256,
+    max_wait_ms: float = 2.0,
+    reload_interval: float = 1.0,
+    timeout: float = 10.0,
+) -> ScoringHTTPServer:
+    models = ModelCache(model_path, check_interval=reload_interval)
+    metrics = Metrics()
+    batcher = MicroBatcher(models, metrics, queue_size=queue_size, max_batch=max_batch, max_wait=max_wait_ms / 1000.0)
+    batcher.start()
+    return ScoringHTTPServer((host, port), make_handler(batcher, metrics, models, timeout=timeout))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve win-probability predictions over HTTP.")
+    parser.add_argument("--model", type=Path, default=_PROJECT_ROOT / "data/model.pkl", help="Model artifact")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queue-size", type=int, default=1024, help="Pending requests beyond this get HTTP 503")
+    parser.add_argument("--max-batch", type=int, default=256, help="Requests scored together at most")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="Time a batch waits for more requests")
+    parser.add_argument("--reload-interval", type=float, default=1.0, help="Seconds between artifact change checks")
+    args = parser.parse_args(argv)
+
+    server = make_server(
+        args.model,
+        host=args.host,
+        port=args.port,
+        queue_size=args.queue_size,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        reload_interval=args.reload_interval,
+    )
+    print(f"✅ Scoring server listening on http://{args.host}:{server.server_address[1]} (model: {args.model})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,229 @@
+"""
+Persistent job journal for the replay scraper (get_db_match_selenium_clean.py --journal).
+
+One SQLite row per replay (keyed by the replay id used for its output file) records its state:
+  pending       not fetched yet
+  in_progress   claimed by a worker; the claim is a lease, taken over by another worker once it expires
+  done          JSON saved
+  failed        error recorded; retried by a later run when retriable and under max_attempts
+  needs_login   DuelingBook requires a logged-in account; only retried on request (requeue)
+  duplicate     fetched, but its plays were already in the archive under another name: not saved
+
+Claims happen in BEGIN IMMEDIATE transactions, so several worker processes can drain the same
+journal: each job goes to one worker at a time. Failures are not retried by the run that recorded
+them, only by later runs (the fetch itself already retries transient errors).
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from replay_io import resolve_replay
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+JOB_STATES = ("pending", "in_progress", "done", "failed", "needs_login", "duplicate")
+DEFAULT_LEASE_S = 900.0
+DEFAULT_MAX_ATTEMPTS = 3
+_ID_BATCH = 500  # replay ids per "IN (...)" query
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    replay_id TEXT PRIMARY KEY,
+    link TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    retriable INTEGER NOT NULL DEFAULT 1,
+    error TEXT,
+    worker TEXT,
+    lease_expires REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+def default_journal_path() -> Path:
+    return _PROJECT_ROOT / "data/scrape_journal.sqlite"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def classify_error(message: str) -> tuple[str, bool]:
+    """(state, retriable) recorded for a scrape error message."""
+    lowered = message.lower()
+    if "logged in" in lowered:
+        return "needs_login", False
+    if "erreur api" in lowered and "invalid token" not in lowered:
+        # The API answered with a definitive error (e.g. replay not found)
+        return "failed", False
+    # Invalid tokens, network errors, browser failures: worth another run
+    return "failed", True
+
+
+class ScrapeJournal:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        worker: str | None = None,
+        lease_s: float = DEFAULT_LEASE_S,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.path = Path(path).expanduser().resolve()
+        self.worker = worker or default_worker_id()
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        # Failures recorded after this time belong to the current run and are not retried by it
+        self.run_started_at = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per operation: usable from any thread, and nothing is held between claims
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def add(self, jobs: Iterable[tuple[str, str]], *, out_dir: Path | None = None) -> int:
+        """
+        Register (replay_id, link) jobs; known replay ids keep their state. With out_dir, jobs whose
+        replay file exists (in any format, see replay_io.py) are marked done, and done jobs whose file
+        is gone go back to pending.
+        Returns the number of new jobs.
+        """
+        now = time.time()
+        jobs = list(jobs)
+        with self._transaction() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (replay_id, link, updated_at) VALUES (?, ?, ?)",
+                [(replay_id, link, now) for replay_id, link in jobs],
+            )
+            added = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - before
+            if out_dir is not None:
+                out_dir = Path(out_dir).expanduser().resolve()
+                saved = [resolve_replay(out_dir, f"{replay_id}.json") is not None for replay_id, _ in jobs]
+                conn.executemany(
+                    "UPDATE jobs SET state = 'done', error = NULL, updated_at = ? "
+                    "WHERE replay_id = ? AND state NOT IN ('done', 'in_progress')",
+                    [(now, replay_id) for (replay_id, _), exists in zip(jobs, saved) if exists],
+                )
+                conn.executemany(
+                    "UPDATE jobs SET state = 'pending', updated_at = ? WHERE replay_id = ? AND state = 'done'",
+                    [(now, replay_id) for (replay_id, _), exists in zip(jobs, saved) if not exists],
+                )
+        return added
+
+    def claim(self) -> tuple[str, str] | None:
+        """Lease the next runnable job to this worker: (replay_id, link), or None when nothing is left."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT replay_id, link FROM jobs
+                WHERE state = 'pending'
+                   OR (state = 'failed' AND retriable = 1 AND attempts < ? AND updated_at < ?)
+                   OR (state = 'in_progress' AND lease_expires < ?)
+                ORDER BY attempts, rowid
+                LIMIT 1
+                """,
+                (self.max_attempts, self.run_started_at, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'in_progress', worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "updated_at = ? WHERE replay_id = ?",
+                (self.worker, now + self.lease_s, now, row[0]),
+            )
+        return row[0], row[1]
+
+    def iter_claims(self, claimed: list[str] | None = None) -> Iterator[str]:
+        """Links claimed one at a time, as a consumer asks for them (appended to `claimed` if given)."""
+        while (job := self.claim()) is not None:
+            if claimed is not None:
+                claimed.append(job[1])
+            yield job[1]
+
+    def _finish(self, replay_id: str, state: str, *, error: str | None, retriable: bool) -> None:
+        with self._transaction() as conn:
+            # Only the lease holder records the outcome; a worker whose lease was taken over is ignored
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, retriable = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE replay_id = ? AND state = 'in_progress' AND worker = ?",
+                (state, error, int(retriable), time.time(), replay_id, self.worker),
+            )
+
+    def mark_done(self, replay_id: str) -> None:
+        self._finish(replay_id, "done", error=None, retriable=False)
+
+    def mark_duplicate(self, replay_id: str, original: str) -> None:
+        self._finish(replay_id, "duplicate", error=f"same plays as {original}", retriable=False)
+
+    def mark_error(self, replay_id: str, message: str) -> str:
+        """Record a failure (state chosen by classify_error); returns the state."""
+        state, retriable = classify_error(message)
+        self._finish(replay_id, state, error=message, retriable=retriable)
+        return state
+
+    def requeue(self, states: Iterable[str], *, replay_ids: Iterable[str] | None = None) -> int:
+        """
+        Put jobs in these states back to pending with a fresh attempt count (e.g. needs_login after logging in);
+        only the jobs of `replay_ids` if given.
+        """
+        states = list(states)
+        sql = (
+            "UPDATE jobs SET state = 'pending', attempts = 0, error = NULL, updated_at = ? "
+            f"WHERE state IN ({', '.join('?' * len(states))})"
+        )
+        if replay_ids is None:
+            with self._transaction() as conn:
+                return conn.execute(sql, (time.time(), *states)).rowcount
+        replay_ids = list(replay_ids)
+        requeued = 0
+        with self._transaction() as conn:
+            # Batched to stay under SQLite's limit on the number of query parameters
+            for start in range(0, len(replay_ids), _ID_BATCH):
+                batch = replay_ids[start : start + _ID_BATCH]
+                requeued += conn.execute(
+                    f"{sql} AND replay_id IN ({', '.join('?' * len(batch))})", (time.time(), *states, *batch)
+                ).rowcount
+        return requeued
+
+    def counts(self) -> dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        found = dict(rows)
+        return {state: found.get(state, 0) for state in JOB_STATES}
+
+    def failures(self) -> list[tuple[str, str, str]]:
+        """(replay_id, state, error) of the jobs in failed / needs_login."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT replay_id, state, error FROM jobs WHERE state IN ('failed', 'needs_login') ORDER BY rowid"
+            ).fetchall()
@@ -0,0 +1,262 @@
+"""
+Out-of-core training: incremental learners fitted chunk by chunk with partial_fit, for feature tables
+that do not fit in memory.
+
+The features are read `chunk_size` rows at a time, either from the features/target CSVs written by
+DataProcessing_for_YGO.py or from a memory-mapped copy of them (.npy, see write_feature_memmap), so
+memory use depends on the chunk size and the number of columns, not on the number of games.
+
+  - held-out rows are picked by a hash of their row number, so the split is the same on every pass and
+    does not depend on the chunk size (no index of the test rows is kept);
+  - a first pass fits a StandardScaler on the training rows (partial_fit), used by the SGD and MLP models;
+  - every epoch then reads the training rows again, shuffled within each chunk, and calls partial_fit on
+    every model; naive Bayes models are exact after one pass and only see the first epoch;
+  - a last pass scores the models on the held-out rows (accuracy, as train_and_score_models).
+
+Usage:
+  python scripts/ML_for_YGO.py --stream --chunk-size 50000 --epochs 5
+  python scripts/streaming_training.py --out data/features_memmap     # CSVs -> memory-mapped .npy
+  python scripts/ML_for_YGO.py --stream --memmap data/features_memmap
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import BernoulliNB, GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+from pipeline_profiling import NULL_PROFILER, Profiler
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_EPOCHS = 5
+STREAM_MODEL_NAMES = ("sgd_logistic", "sgd_svm", "naive_bayes", "bernoulli_nb", "mlp")
+# Models fitted on standardized features
+SCALED_MODELS = {"sgd_logistic", "sgd_svm", "mlp"}
+# Sufficient statistics: a second pass over the same rows would only count them twice
+ONE_PASS_MODELS = {"naive_bayes", "bernoulli_nb"}
+MEMMAP_FEATURES_FILE = "features.npy"
+MEMMAP_TARGET_FILE = "target.npy"
+MEMMAP_COLUMNS_FILE = "columns.json"
+
+# (first row number, features chunk, target chunk)
+Chunk = tuple[int, np.ndarray, np.ndarray]
+
+
+class FeatureStream:
+    """Feature table read chunk by chunk; every iteration re-reads it from the start."""
+
+    def __init__(self, columns: list[str], chunks: Callable[[], Iterator[Chunk]]):
+        self.columns = columns
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[Chunk]:
+        return self._chunks()
+
+    @classmethod
+    def from_csv(cls, features: Path, target: Path, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> "FeatureStream":
+        features = Path(features).expanduser().resolve()
+        target = Path(target).expanduser().resolve()
+        columns = [str(c) for c in pd.read_csv(features, nrows=0).columns]
+
+        def _chunks() -> Iterator[Chunk]:
+            start = 0
+            with pd.read_csv(features, chunksize=chunk_size) as X_reader, pd.read_csv(
+                target, chunksize=chunk_size
+            ) as y_reader:
+                for X_chunk, y_chunk in zip(X_reader, y_reader, strict=True):
+                    if len(X_chunk) != len(y_chunk):
+                        raise ValueError(f"{features.name} and {target.name} do not have the same number of rows")
+                    yield start, X_chunk.to_numpy(dtype=np.float32), y_chunk.iloc[:, 0].to_numpy()
+                    start += len(X_chunk)
+
+        return cls(columns, _chunks)
+
+    @classmethod
+    def from_memmap(cls, memmap_dir: Path, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> "FeatureStream":
+        memmap_dir = Path(memmap_dir).expanduser().resolve()
+        with open(memmap_dir / MEMMAP_COLUMNS_FILE, "r", encoding="utf-8") as f:
+            columns = json.load(f)["columns"]
+
+        def _chunks() -> Iterator[Chunk]:
+            X = np.load(memmap_dir / MEMMAP_FEATURES_FILE, mmap_mode="r")
+            y = np.load(memmap_dir / MEMMAP_TARGET_FILE, mmap_mode="r")
+            for start in range(0, len(X), chunk_size):
+                stop = start + chunk_size
+                yield start, np.array(X[start:stop], dtype=np.float32), np.array(y[start:stop])
+
+        return cls(columns, _chunks)
+
+
+def write_feature_memmap(
+    features: Path, target: Path, out_dir: Path, *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> tuple[Path, int]:
+    """
+    Copy the features/target CSVs into memory-mappable .npy files (float32 features), chunk by chunk;
+    returns (directory, number of rows). The directory is replaced as a whole.
+    """
+    stream = FeatureStream.from_csv(features, target, chunk_size=chunk_size)
+    n_rows = sum(len(y) for _, _, y in stream)  # first pass: size of the arrays
+
+    out_dir = Path(out_dir).expanduser().resolve()
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    X = np.lib.format.open_memmap(
+        tmp / MEMMAP_FEATURES_FILE, mode="w+", dtype=np.float32, shape=(n_rows, len(stream.columns))
+    )
+    y = None
+    for start, X_chunk, y_chunk in stream:
+        if y is None:
+            y = np.lib.format.open_memmap(tmp / MEMMAP_TARGET_FILE, mode="w+", dtype=y_chunk.dtype, shape=(n_rows,))
+        X[start : start + len(X_chunk)] = X_chunk
+        y[start : start + len(y_chunk)] = y_chunk
+    if y is None:
+        np.save(tmp / MEMMAP_TARGET_FILE, np.zeros(0, dtype=bool))
+    else:
+        y.flush()
+    X.flush()
+    del X, y
+    with open(tmp / MEMMAP_COLUMNS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"columns": stream.columns, "rows": n_rows}, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return out_dir, n_rows
+
+
+def heldout_mask(start: int, n_rows: int, *, test_size: float, random_state: int = 1) -> np.ndarray:
+    """True for the held-out rows among rows start .. start + n_rows (splitmix64 hash of the row number)."""
+    with np.errstate(over="ignore"):
+        x = np.arange(start, start + n_rows, dtype=np.uint64) + np.uint64(random_state) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+def build_stream_models(
+    *, random_state: int = 1, params: dict[str, dict[str, Any]] | None = None
+) -> dict[str, Any]:
+    """
+    The incremental learners, in reporting order. `params` (model name -> hyperparameters) overrides the
+    defaults; tuned naive_bayes / mlp parameters of ML_for_YGO.py apply to their partial_fit versions.
+    """
+    models = {
+        "sgd_logistic": SGDClassifier(loss="log_loss", alpha=1e-4, random_state=random_state),
+        "sgd_svm": SGDClassifier(loss="hinge", alpha=1e-4, random_state=random_state),
+        "naive_bayes": GaussianNB(),
+        "bernoulli_nb": BernoulliNB(binarize=0.0),  # card present in the hand / play made or not
+        "mlp": MLPClassifier(hidden_layer_sizes=(64, 32), random_state=random_state),
+    }
+    for name, overrides in (params or {}).items():
+        if name in models:
+            models[name].set_params(**overrides)
+    return models
+
+
+def train_and_score_streaming(
+    stream: FeatureStream,
+    *,
+    test_size: float = 0.2,
+    random_state: int = 1,
+    epochs: int = DEFAULT_EPOCHS,
+    params: dict[str, dict[str, Any]] | None = None,
+    models: Sequence[str] | None = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> dict[str, float]:
+    """
+    Fit the incremental learners (or only those named in `models`) on the training rows of `stream` and
+    return their accuracy on the held-out rows. Only one chunk is in memory at a time.
+    """
+    with profiler.stage("scale"):
+        scaler = StandardScaler()
+        classes = None
+        n_train = n_test = 0
+        for start, X, y in stream:
+            test = heldout_mask(start, len(y), test_size=test_size, random_state=random_state)
+            if not test.all():
+                scaler.partial_fit(X[~test])
+            classes = np.unique(y) if classes is None else np.union1d(classes, y)
+            n_test += int(test.sum())
+            n_train += int((~test).sum())
+    if n_train == 0 or n_test == 0:
+        raise ValueError(f"Not enough samples for a held-out split (train={n_train}, test={n_test}).")
+    if len(classes) < 2:
+        raise ValueError(f"Incremental learners need at least 2 classes (got {list(classes)}).")
+
+    zoo = build_stream_models(random_state=random_state, params=params)
+    selected = {name: model for name, model in zoo.items() if models is None or name in models}
+    fit_s = dict.fromkeys(selected, 0.0)
+    with profiler.stage("fit"):
+        for epoch in range(epochs):
+            rng = np.random.default_rng(random_state + epoch)
+            for start, X, y in stream:
+                train = ~heldout_mask(start, len(y), test_size=test_size, random_state=random_state)
+                if not train.any():
+                    continue
+                order = rng.permutation(int(train.sum()))
+                X_train, y_train = X[train][order], y[train][order]
+                X_scaled = scaler.transform(X_train)
+                for name, model in selected.items():
+                    if epoch > 0 and name in ONE_PASS_MODELS:
+                        continue
+                    t0 = time.perf_counter()
+                    model.partial_fit(X_scaled if name in SCALED_MODELS else X_train, y_train, classes=classes)
+                    fit_s[name] += time.perf_counter() - t0
+
+    correct = dict.fromkeys(selected, 0)
+    score_s = dict.fromkeys(selected, 0.0)
+    with profiler.stage("evaluate"):
+        for start, X, y in stream:
+            test = heldout_mask(start, len(y), test_size=test_size, random_state=random_state)
+            if not test.any():
+                continue
+            X_test, y_test = X[test], y[test]
+            X_scaled = scaler.transform(X_test)
+            for name, model in selected.items():
+                t0 = time.perf_counter()
+                correct[name] += int((model.predict(X_scaled if name in SCALED_MODELS else X_test) == y_test).sum())
+                score_s[name] += time.perf_counter() - t0
+    for name in selected:
+        profiler.record_model(name, fit_s=fit_s[name], score_s=score_s[name])
+    return {name: correct[name] / n_test for name in selected}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Copy the features/target CSVs into memory-mapped .npy arrays.")
+    parser.add_argument(
+        "--features",
+        type=Path,
+        default=_PROJECT_ROOT / "data/matches_data_features_Fryderyk Chopin.csv",
+        help="Input features CSV",
+    )
+    parser.add_argument(
+        "--target",
+        type=Path,
+        default=_PROJECT_ROOT / "data/target_variable_Fryderyk Chopin.csv",
+        help="Input target variable CSV (game1_winner)",
+    )
+    parser.add_argument("--out", type=Path, default=_PROJECT_ROOT / "data/features_memmap")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read at a time")
+    args = parser.parse_args(argv)
+
+    out, n_rows = write_feature_memmap(args.features, args.target, args.out, chunk_size=args.chunk_size)
+    size = sum(f.stat().st_size for f in out.iterdir())
+    print(f"✅ {n_rows} lignes copiées dans: {out} ({size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+"""
+Per-turn features of game 1, computed from the play stream of every replay (see play_events.py).
+
+The starting hands only describe the position before the duel; the replays also record what each player
+did with them. For each of the first `max_turns` turns of game 1 (the game the target is about), and for
+each player, the plays are aggregated into counts and sums:
+
+  turn<t>_summons_player<1|2>      Normal/Special/Tribute summons, sets, tokens, Xyz summons
+  turn<t>_to_gy_player<1|2>        cards sent to the GY (To GY, Mill)
+  turn<t>_activations_player<1|2>  spell/trap activations and effect declarations
+  turn<t>_banished_player<1|2>     cards banished (face-up or face-down)
+  turn<t>_lp_delta_player<1|2>     sum of the player's "Life points" changes (negative = damage taken)
+  turn<t>_seconds                  duel clock spent in the turn
+
+Turn 1 starts at "Pick first", every "Start turn" opens the next one and game 1 ends at the first
+"Admit defeat" or "Begin next duel". Plays are attributed to player1/player2 of the matches table by
+username (watcher and system plays are ignored). Later turns increasingly describe the result rather
+than predict it (an OTK shows up as a -8000 LP delta), hence the small default number of turns.
+
+Everything is computed in one vectorized pass over the integer codes of the event table (np.bincount),
+with no per-replay Python loop; only the plays used here are loaded (filter pushed down to the warehouse
+Parquet reader, or applied by the parsing workers for a replay directory).
+
+Usage:
+  python scripts/DataProcessing_for_YGO.py --turn-features 2
+  python scripts/DataProcessing_for_YGO.py --turn-features 3 --warehouse data/replay_warehouse
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from play_events import load_play_events, replay_id
+
+DEFAULT_MAX_TURNS = 2
+TURN_PLAY_GROUPS = {
+    "summons": [
+        "Normal Summon",
+        "SS ATK",
+        "SS DEF",
+        "OL ATK",
+        "OL DEF",
+        "Set monster",
+        "Flip Summon",
+        "Summon Token",
+    ],
+    "to_gy": ["To GY", "Mill"],
+    "activations": ["Activate ST", "Activate Field Spell", "Declare"],
+    "banished": ["Banish", "Banish FD"],
+}
+LP_PLAY = "Life points"
+# Plays that delimit turns and games; "End turn" also dates the end of a turn
+START_GAME_PLAY = "Pick first"
+START_TURN_PLAY = "Start turn"
+END_TURN_PLAY = "End turn"
+END_GAME_PLAYS = ["Admit defeat", "Begin next duel"]
+TURN_PLAYS = [
+    *(play for plays in TURN_PLAY_GROUPS.values() for play in plays),
+    LP_PLAY,
+    START_GAME_PLAY,
+    START_TURN_PLAY,
+    END_TURN_PLAY,
+    *END_GAME_PLAYS,
+]
+EVENT_COLUMNS = ["seconds", "play", "username", "amount"]
+
+
+def turn_feature_columns(max_turns: int = DEFAULT_MAX_TURNS) -> list[str]:
+    columns = []
+    for turn in range(1, max_turns + 1):
+        for metric in [*TURN_PLAY_GROUPS, "lp_delta"]:
+            columns += [f"turn{turn}_{metric}_player1", f"turn{turn}_{metric}_player2"]
+        columns.append(f"turn{turn}_seconds")
+    return columns
+
+
+def _cumsum_within(flags: np.ndarray, row_starts: np.ndarray) -> np.ndarray:
+    """Running count of `flags` restarting at every replay (row_starts: first row of each row's replay)."""
+    counts = np.cumsum(flags, dtype=np.int64)
+    return counts - (counts[row_starts] - flags[row_starts])
+
+
+def _category_codes(values: pd.Series | pd.Categorical, categories: list[str]) -> np.ndarray:
+    """Code of each category name in a categorical (-1 if absent)."""
+    return pd.Index(values.dtype.categories).get_indexer(categories)
+
+
+def compute_turn_features(
+    events: pd.DataFrame, matches: pd.DataFrame, *, max_turns: int = DEFAULT_MAX_TURNS
+) -> pd.DataFrame:
+    """
+    Features (turn_feature_columns()) of every matches row, from an event table with the EVENT_COLUMNS
+    (other plays than TURN_PLAYS are ignored). Aligned on matches.index; replays without plays get zeros.
+    """
+    columns = turn_feature_columns(max_turns)
+    n_metrics = len(TURN_PLAY_GROUPS) + 1  # + lp_delta
+    replays = matches["file"].astype(str).map(replay_id)
+    first_rows = ~replays.duplicated()
+    match_ids = pd.Index(replays[first_rows])
+    if not len(events) or not len(match_ids) or max_turns <= 0:
+        return pd.DataFrame(0, index=matches.index, columns=columns, dtype=np.int64)
+
+    # Replay codes of the event table -> row of the (deduplicated) matches ids
+    replay_codes = np.asarray(events.index.codes, dtype=np.int64)
+    match_of_replay = match_ids.get_indexer(events.index.categories)
+    match_row = match_of_replay[replay_codes]
+
+    plays = events["play"]
+    play_codes = np.asarray(plays.cat.codes, dtype=np.int64)
+    n_play_categories = len(plays.cat.categories)
+
+    def _is(play_names: list[str]) -> np.ndarray:
+        wanted = _category_codes(plays, play_names)
+        lookup = np.zeros(n_play_categories + 1, dtype=np.int64)  # last slot: missing play (-1 code)
+        lookup[wanted[wanted >= 0]] = 1
+        return lookup[play_codes]
+
+    # Metric of each play (-1 = not counted), via a lookup table over the play categories
+    metric_of_play = np.full(n_play_categories + 1, -1, dtype=np.int64)
+    for metric, play_names in enumerate(TURN_PLAY_GROUPS.values()):
+        codes = _category_codes(plays, play_names)
+        metric_of_play[codes[codes >= 0]] = metric
+    metric = metric_of_play[play_codes]
+
+    # Game 1 and turn number of every row
+    n = len(events)
+    boundaries = np.flatnonzero(np.r_[True, replay_codes[1:] != replay_codes[:-1]])
+    row_starts = np.repeat(boundaries, np.diff(np.r_[boundaries, n]))
+    started = _cumsum_within(_is([START_GAME_PLAY]), row_starts) > 0
+    ended = _cumsum_within(_is(END_GAME_PLAYS), row_starts) > 0
+    turn = _cumsum_within(_is([START_TURN_PLAY]), row_starts)  # 0-based
+    in_scope = started & ~ended & (turn < max_turns) & (match_row >= 0)
+
+    # Side of every play: 0 = player1, 1 = player2, -1 = anyone else
+    usernames = events["username"]
+    user_codes = np.asarray(usernames.cat.codes, dtype=np.int64)
+    name_codes = pd.Index(usernames.cat.categories)
+    matched = matches.loc[first_rows]
+    player1 = name_codes.get_indexer(matched["player1"].astype(str))[match_row]
+    player2 = name_codes.get_indexer(matched["player2"].astype(str))[match_row]
+    # A player name absent from the plays has code -1, like a missing username: never match those
+    known = user_codes >= 0
+    side = np.where(known & (user_codes == player1), 0, np.where(known & (user_codes == player2), 1, -1))
+
+    # Counts and LP sums per (match, turn, metric, side) in one bincount each
+    n_cells = len(match_ids) * max_turns * n_metrics * 2
+    cell = ((match_row * max_turns + turn) * n_metrics) * 2 + side
+
+    counted = in_scope & (metric >= 0) & (side >= 0)
+    values = np.bincount(cell[counted] + metric[counted] * 2, minlength=n_cells)
+
+    amounts = events["amount"].to_numpy(dtype=np.float64, na_value=0.0)
+    lp = in_scope & (_is([LP_PLAY]) > 0) & (side >= 0)
+    lp_cells = cell[lp] + (n_metrics - 1) * 2
+    values = values + np.rint(np.bincount(lp_cells, weights=amounts[lp], minlength=n_cells)).astype(np.int64)
+    values = values.reshape(len(match_ids), max_turns, n_metrics * 2)
+
+    # Seconds per (match, turn): span of the clock over the turn's plays (markers included)
+    seconds = events["seconds"].to_numpy(dtype=np.float64, na_value=np.nan)
+    timed = in_scope & ~np.isnan(seconds)
+    turn_cell = (match_row * max_turns + turn)[timed]
+    first = np.full(len(match_ids) * max_turns, np.inf)
+    last = np.full(len(match_ids) * max_turns, -np.inf)
+    np.minimum.at(first, turn_cell, seconds[timed])
+    np.maximum.at(last, turn_cell, seconds[timed])
+    spent = np.where(last >= first, last - first, 0).astype(np.int64).reshape(len(match_ids), max_turns, 1)
+
+    table = np.concatenate([values, spent], axis=2).reshape(len(match_ids), -1)
+    features = pd.DataFrame(table, index=match_ids, columns=columns)
+    return features.reindex(replays.to_numpy()).set_axis(matches.index).fillna(0).astype(np.int64)
+
+
+def build_turn_features(
+    matches: pd.DataFrame,
+    source: Path,
+    *,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Turn features of the matches rows, reading only the needed plays of their replays from `source`
+    (a replay directory or a Parquet warehouse, see load_play_events).
+    """
+    events = load_play_events(
+        source, workers=workers, replay_ids=matches["file"].astype(str), columns=EVENT_COLUMNS, plays=TURN_PLAYS
+    )
+    return compute_turn_features(events, matches, max_turns=max_turns)